@@ -0,0 +1,62 @@
+#!/bin/bash
+# startup time of listing/showing commands, wall time plus slowest imports (python -X importtime)
+# fails (exit 1) when a command takes longer than its budget or imports a module kept off the startup path
+#
+#   ./startup-bench.sh          budget per command from startup-bench.baseline + TOLERANCE[%] (default 100)
+#   ./startup-bench.sh 300      fixed budget[ms] for every command
+#   UPDATE=1 ./startup-bench.sh re-record startup-bench.baseline (best of RUNS runs) after intended changes
+budget=$1
+top=${TOP:-8}
+runs=${RUNS:-5}
+tolerance=${TOLERANCE:-100}
+python=${PYTHON:-python3}
+baseline_file=$(dirname "$0")/startup-bench.baseline
+# device, template, store, archive, daemon and export modules load on first use only
+lazy_modules="jnpr|ncclient|paramiko|lxml|jinja2|yaml|sqlite3|tarfile|lzma|gzip|socket|socketserver|csv"
+commands=(
+  "--list-profile all"
+  "--list-mprofile all"
+  "--list-template"
+  "--show-profile version"
+  "--show-mprofile sessions"
+  "--help"
+)
+failed=0
+baseline=""
+for command in "${commands[@]}"; do
+  # best of runs, first run pays for cold file cache
+  best=""
+  for run in $(seq $runs); do
+    start=$(date +%s%N)
+    imports=$($python -X importtime ./template-ops.py $command 2>&1 >/dev/null | grep '^import time:')
+    end=$(date +%s%N)
+    ms=$(( (end - start) / 1000000 ))
+    if [ -z "$best" ] || [ $ms -lt $best ]; then
+      best=$ms
+    fi
+  done
+  baseline+="$best	$command"$'\n'
+  if [ -n "$budget" ]; then
+    limit=$budget
+  else
+    recorded=$(awk -F'\t' -v command="$command" '$2 == command {print $1}' "$baseline_file" 2>/dev/null)
+    limit=${recorded:+$(( recorded * (100 + tolerance) / 100 ))}
+  fi
+  echo "== $command: ${best} ms${limit:+ (budget $limit ms)}"
+  # cumulative [us] | module, slowest top level imports first
+  echo "$imports" | awk -F'|' '$3 ~ /^ [^ ]/ {printf "  %8.1f ms %s\n", $2 / 1000, $3}' | sort -rn | head -$top
+  eager=$(echo "$imports" | awk -F'|' '{gsub(/ /, "", $3); print $3}' | grep -E "^($lazy_modules)$" | tr '\n' ' ')
+  if [ -n "$eager" ]; then
+    echo "  imported at startup: $eager"
+    failed=1
+  fi
+  if [ -z "$UPDATE" ] && [ -n "$limit" ] && [ $best -gt $limit ]; then
+    echo "  over budget $limit ms"
+    failed=1
+  fi
+done
+if [ -n "$UPDATE" ]; then
+  printf "%s" "$baseline" > "$baseline_file"
+  echo "baseline written to $baseline_file"
+fi
+exit $failed
@@ -1,6 +1,3 @@
 #!/bin/bash
-mx="10.0.0.10:/var/db/scripts/op"
-scp template-ops.py $mx 
-scp template_ops_conf.py $mx 
-scp template_ops_vars.py $mx 
-scp xtemplate/* $mx/xtemplate
+# copies changed files only, to all DEPLOY_TARGET_LIST hosts (template_ops_conf.py) or given devices, e.g. vmx-01,vmx-02
+./template-ops.py --deploy ${1:-all}
@@ -35,24 +35,84 @@ else:
     onbox = True
 
 import argparse
+import importlib
 import os
 
 if onbox:
     import sys
+
+# deployment bundle built by --build-bundle, on-box the template_ops modules and compiled templates
+# are loaded from it, copied in one file the deploy is atomic, module files edited/copied on-box
+# after the bundle make it stale, then all modules are loaded from files
+BUNDLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "template-ops.zip")
+BUNDLE_STALE = False
+if onbox and os.path.isfile(BUNDLE_PATH):
+    from template_ops_bundle import bundle_modules, bundle_stale
+
+    try:
+        BUNDLE_STALE = bundle_stale(
+            BUNDLE_PATH, bundle_modules(os.path.dirname(BUNDLE_PATH))
+        )
+    except Exception:
+        # unreadable bundle
+        BUNDLE_STALE = True
+if onbox and os.path.isfile(BUNDLE_PATH) and not BUNDLE_STALE:
+    sys.path.insert(0, BUNDLE_PATH)
+else:
+    BUNDLE_PATH = None
 import traceback
-import jinja2
 import re
+import shlex
 import warnings
 import pathlib
-import hashlib
-import shutil
-from threading import Thread
+import atexit
+import textwrap
+from contextlib import ExitStack, redirect_stdout, redirect_stderr
+from threading import Lock, Thread
 from datetime import datetime
-from jnpr.junos import Device
-from jnpr.junos.exception import ConfigLoadError, CommitError
-from jnpr.junos.utils.config import Config
-from time import sleep
+from time import sleep, time
 import template_ops_conf as template_ops_conf
+from template_ops_archive import (
+    archive_compact,
+    archive_content_put,
+    archive_read,
+    catalog_query,
+    ArchiveWriter,
+)
+from template_ops_bundle import (
+    build_bundle,
+    bundle_manifest,
+    bundle_modules,
+    bundle_loader,
+    bundle_stale,
+)
+from template_ops_filters import TEMPLATE_FILTERS
+from template_ops_inventory import inventory_files, inventory_load, inventory_stale
+from template_ops_md5 import md5_cached, md5_cache_init, md5_cache_save
+from template_ops_daemon import daemon_serve, client_submit
+from template_ops_output import OUTPUT_FORMATS, ResultWriter
+from template_ops_probe import probe_hosts, probe_forget, session_alive
+from template_ops_setcmd import set_optimize
+from template_ops_load import config_commit, config_push, del_cmds_remove, eph_settings
+from template_ops_shard import shard_push, shard_status
+from template_ops_results import (
+    history_rates,
+    store_init,
+    store_write,
+    results_query,
+)
+from template_ops_exec import (
+    EXEC_RESULT_DEFAULT,
+    RPCCacheDevice,
+    exec_step_row,
+    rpc_cache_clear,
+    rpc_fields,
+    xsum,
+    xcount,
+    xmax,
+    xsums,
+    xrows,
+)
 
 # default commit timeout
 COMMIT_TIMEOUT = 30
@@ -77,6 +137,8 @@ global TEMPLATE_OPS
 TEMPLATE_OPS = True
 
 PID = str(os.getpid())
+# identifies results of this process in the result store
+RUN_ID = datetime.now().strftime("%Y%m%d-%H%M%S") + "-" + PID
 script = "[{user}]{path}[{pid}]".format(
     path=os.path.abspath(sys.argv[0]), user=USER, pid=PID
 )
@@ -84,11 +146,34 @@ script = "[{user}]{path}[{pid}]".format(
 threads = []
 warnings.filterwarnings(action="ignore", module=".*paramiko.*")
 template_thread_data = []
+# compiled templates are kept by the shared environment, see template_env_get()
+template_env = None
+# NETCONF sessions kept open between watch mode iterations, by device name
+dev_pool = {}
+# daemon mode keeps sessions in dev_pool between jobs
+keep_sessions = False
+# --stream prints profile results as devices finish, --summary groups identical results
+result_stream = False
+result_summary = False
+# --output ndjson|csv record writer, see write_result()
+result_writer = None
+# profile device -> thread end time of current step
+device_finished = {}
+# status rows counted as failed in progress line and export records
+STATUS_ERROR_RE = re.compile(r"^(error|unreachable)|use debug on/see log|lookup error", re.I)
+# merged profile/auth records, see inventory_get()
+inventory = None
+inventory_lock = Lock()
+
+# template md5s kept between runs in sidecar file
+if MD5_CACHE_SIDECAR_ENABLE:
+    md5_cache_init(MD5_CACHE_PATH)
+    atexit.register(md5_cache_save)
 
 # variable for returning header from exec template
 header = "default"
 # variables from exec templates
-result = "use global result and optionally header variable in exec() template"
+result = EXEC_RESULT_DEFAULT
 # for purposes of passing non-string between templates in mprofile
 result_adv = None
 
@@ -154,12 +239,21 @@ def print_help():
   
     template-vars          pointer to variable gen function in template_ops_vars.py, {TEMPLATE_VARS_STR}  
     template               name of j2 template receiving variables from template-vars 
-    input                  template seeding data, e.g., sequence number 1-n (or data enclosed in " ")
+    input                  template seeding data, e.g., sequence number 1-n (or data enclosed in " "), range 1-64 renders each seq,
+                           with diff/push/exec-target all seqs go to that single device in one commit (e.g. MX side of 64 SRX)
     diff-target            device name to retrieve diff between candidate and running config
     push-target            device name for config template push
     exec-target            device name for processing template as Python code 
     profile                push to multiple SRX devices using profile [profile-name|# from list]
     mprofile               multi-profile execution defined by profile [mprofile-name|# from list]
+    sequence               run profiles in order, optional pre-delay, e.g. "p1 5:p2 p3"
+    every                  repeat profile/mprofile/sequence every N seconds in one process (watch mode)
+    stream                 [on] print profile results as devices finish, progress line on terminal
+    summary                [on] group identical results, one row with count and devices
+    output                 [ndjson|csv] one record per device result as it completes, tables go to stderr
+    output-file            append output records to file instead of stdout
+    list-archive           list archived commits/execs [all|device-name], optional since/until timestamps
+    rollback-to            with profile, re-push archived config up to timestamp (YYYYmmdd[-HHMMSS]) to profile devices
     list-profile           list push target profiles from template_ops_conf.py (any argument)
     list-mprofile          list multi-profiles from template_ops_conf.py (any argument)
     show-profile           show details of push target profile [all|profile-name|# from list]
@@ -210,12 +304,25 @@ def print_help():
   
     --template-vars          pointer to variable gen function in template_ops_vars.py, {TEMPLATE_VARS_STR}  
     --template               name of j2 template receiving variables from --template-vars 
-    --input                  template seeding data, e.g., sequence number 1-n (or data enclosed in " ")
+    --input                  template seeding data, e.g., sequence number 1-n (or data enclosed in " "), range 1-64 renders each seq,
+                             with --diff/push/exec-target all seqs go to that single device in one commit (e.g. MX side of 64 SRX)
     --diff-target            device name to retrieve diff between candidate and running config
     --push-target            device name for config template push
     --exec-target            device name for processing template as Python code
     --profile                push to multiple SRX devices using profile [profile-name|# from list]
     --mprofile               multi-profile execution defined by profile [mprofile-name|# from list]
+    --sequence               run profiles in order, optional pre-delay, e.g. "p1 5:p2 p3"
+    --every                  repeat profile/mprofile/sequence every N seconds in one process (watch mode)
+    --stream                 print profile results as devices finish, progress line on terminal
+    --summary                group identical results, one row with count and devices
+    --output                 [ndjson|csv] one record per device result as it completes, tables go to stderr
+    --output-file            append --output records to file instead of stdout
+    --list-archive           list archived commits/execs [all|device-name], optional --since/--until timestamps
+    --rollback-to            with --profile, re-push archived config up to timestamp (YYYYmmdd[-HHMMSS]) to profile devices
+    --build-bundle           build template-ops.zip (or given file) with modules and precompiled templates for on-box use
+    --deploy                 copy changed script/modules/bundle/templates to DEPLOY_TARGET_LIST hosts [all|device,device,...]
+    --daemon                 serve --client jobs on DAEMON_SOCKET, inventory, templates and sessions stay in memory
+    --client                 run the other arguments as job of running daemon (locally when no daemon runs)
     --list-profile           list push target profiles from template_ops_conf.py
     --list-mprofile          list multi-profiles from template_ops_conf.py 
     --show-profile           show details of push target profile [all|profile-name|# from list]
@@ -261,15 +368,9 @@ def print_help():
 
 
 def file_md5(path):
+    # cached per file identity, see template_ops_md5
     try:
-        with open(path, "rb") as f:
-            file_hash = hashlib.md5()
-            chunk = f.read(8192)
-            while chunk:
-                file_hash.update(chunk)
-                chunk = f.read(8192)
-
-        return file_hash.hexdigest()
+        return md5_cached(path)
     except Exception:
         traceback_msg = str(traceback.format_exc())
         emit_info(
@@ -281,7 +382,17 @@ def file_md5(path):
         return "error calculating md5"
 
 
-def parse_args():
+def positive_seconds(value):
+    # --every interval, 0 or negative would repeat runs back-to-back forever
+    seconds = float(value)
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError(
+            "interval must be > 0 seconds, got {value}".format(value=value)
+        )
+    return seconds
+
+
+def parse_args(argv=None):
     """Parse arguments"""
     parser = argparse.ArgumentParser(add_help=False)
     parser.add_argument("--template")
@@ -300,7 +411,23 @@ def parse_args():
     parser.add_argument("--show-mprofile", dest="show_mprofile")
     parser.add_argument("--show-template", dest="show_template")
     parser.add_argument("--eph-instance", dest="eph_instance")
-    parsed_args = parser.parse_args()
+    parser.add_argument("--sequence", dest="sequence")
+    parser.add_argument("--every", dest="every", type=positive_seconds)
+    parser.add_argument("--list-archive", nargs="?", const="all", dest="list_archive")
+    parser.add_argument("--since", dest="since")
+    parser.add_argument("--until", dest="until")
+    parser.add_argument("--rollback-to", dest="rollback_to")
+    parser.add_argument(
+        "--build-bundle", nargs="?", const="template-ops.zip", dest="build_bundle"
+    )
+    parser.add_argument("--deploy", nargs="?", const="all", dest="deploy")
+    parser.add_argument("--stream", nargs="?", const="on")
+    parser.add_argument("--summary", nargs="?", const="on")
+    parser.add_argument("--output", choices=OUTPUT_FORMATS)
+    parser.add_argument("--output-file", dest="output_file")
+    parser.add_argument("--daemon", action="store_true")
+    parser.add_argument("--client", action="store_true")
+    parsed_args = parser.parse_args(argv)
     return parsed_args
 
 
@@ -352,16 +479,9 @@ def show_profile(arg):
                 profile_data = []
                 for profile in template_ops_conf.push_profiles:
                     if profile == arg_profile or arg_profile == "all":
-                        profile_dict = getattr(template_ops_conf, profile)
-                        for profile_dev in profile_dict.keys():
-                            # merge with default profile, pre-python 3.9 style
-                            if "default" in profile_dict.keys():
-                                profile_dev_detail = {
-                                    **profile_dict["default"],
-                                    **profile_dict[profile_dev],
-                                }
-                            else:
-                                profile_dev_detail = profile_dict[profile_dev]
+                        # merged with default profile by inventory
+                        profile_records = inventory_get()["profiles"][profile]
+                        for profile_dev, profile_dev_detail in profile_records.items():
                             # build a list with profile settings for printing
                             if not "default" in profile_dev:
                                 profile_data.append(
@@ -379,6 +499,11 @@ def show_profile(arg):
                                         else "N",
                                         # eph_instance:format if set, N when eph_instance is not set
                                         f"{profile_dev_detail.get('eph_inst')[0]}:{profile_dev_detail.get('eph_inst')[1]}"
+                                        + (
+                                            f" x{profile_dev_detail['eph_shards'][0]}"
+                                            if profile_dev_detail.get("eph_shards")
+                                            else ""
+                                        )
                                         if bool(
                                             profile_dev_detail.get("eph_inst", [False])[
                                                 0
@@ -611,19 +736,235 @@ def show_template(arg):
             )
 
 
-def template_thread(parsed_args, profile_operation, profile, device="", timestamp=""):
-    def eph_settings(eph_param):
-        # function to set data type for load to eph, set is default, json/xml/text are loaded with overwrite = True to overcome slow delete in eph
-        if eph_param == None:
-            return None, "set", False
+def archive_error(traceback_msg):
+    emit_info(
+        "error archiving j2 template, set commands or exec code: {traceback_msg}".format(
+            traceback_msg=traceback_msg
+        ),
+        debug,
+    )
+
+
+# archive writes off the commit/exec path, flushed at end of run and before exit
+archive_writer = ArchiveWriter(archive_error)
+atexit.register(archive_writer.flush)
+
+
+def archive_put(
+    save_path, timestamp, template_file, push_target, suffix, source_file=None, data=None
+):
+    archive_content_put(
+        template_ops_conf,
+        archive_writer,
+        RUN_ID,
+        save_path,
+        timestamp,
+        template_file,
+        push_target,
+        suffix,
+        source_file,
+        data,
+    )
+
+
+def archive_retention():
+    # wait for queued archive writes, then compact content-addressed archives beyond ARCHIVE_KEEP_RUNS
+    archive_writer.flush()
+    if ARCHIVE_BACKEND == "cas":
+        for save_path in set(
+            [
+                SAVE_PATH_COMMIT_J2,
+                SAVE_PATH_COMMIT_CFG,
+                SAVE_PATH_EXEC_J2,
+                SAVE_PATH_EXEC_PY,
+            ]
+        ):
+            try:
+                archive_compact(
+                    save_path,
+                    ARCHIVE_KEEP_RUNS,
+                    ARCHIVE_SEGMENT_RUNS,
+                    ARCHIVE_KEEP_SEGMENTS,
+                )
+            except Exception:
+                traceback_msg = str(traceback.format_exc())
+                emit_info(
+                    "error compacting archive {save_path}, traceback: {traceback_msg}".format(
+                        save_path=save_path, traceback_msg=traceback_msg
+                    ),
+                    debug,
+                )
+
+
+def inventory_get():
+    # profile/auth records merged once per process, from cache when sources are unchanged
+    global inventory
+    with inventory_lock:
+        if inventory is None:
+            inventory = inventory_load(
+                template_ops_conf, INVENTORY_PATH, INVENTORY_CACHE_PATH
+            )
+            for error in inventory["errors"]:
+                emit_info("inventory: {error}".format(error=error), debug)
+    return inventory
+
+
+def inventory_refresh():
+    # long running process (daemon job, watch iteration), template_ops_conf.py and inventory files edited
+    # since they were loaded are read again, settings of this script (from template_ops_conf import *) follow
+    global inventory
+    with inventory_lock:
+        if inventory is None or not inventory_stale(
+            template_ops_conf, inventory, INVENTORY_PATH
+        ):
+            return
+        # fresh module, dicts extended by previous inventory files are gone
+        importlib.reload(template_ops_conf)
+        globals().update(
+            (name, value)
+            for name, value in vars(template_ops_conf).items()
+            if not name.startswith("_")
+        )
+        inventory = None
+    emit_info("template_ops_conf.py or inventory files changed, re-loaded", False)
+    inventory_get()
+
+
+def junos_import():
+    # PyEZ (paramiko, ncclient, lxml) takes most of the startup time, it is imported on first
+    # device operation only, listing/showing commands never load it
+    global Device, Config, ConfigLoadError, CommitError
+    from jnpr.junos import Device
+    from jnpr.junos.exception import ConfigLoadError, CommitError
+    from jnpr.junos.utils.config import Config
+
+
+def template_env_get():
+    # one environment per process, templates are compiled once and recompiled only when changed
+    global template_env
+    if template_env is None:
+        import jinja2
+
+        if BUNDLE_STALE:
+            emit_info(
+                "bundle older than module files, modules and templates loaded from files, rebuild with --build-bundle",
+                False,
+            )
+        templateLoader = jinja2.FileSystemLoader(searchpath=TEMPLATE_SEARCH_PATH)
+        if BUNDLE_PATH:
+            try:
+                templateLoader = bundle_loader(
+                    BUNDLE_PATH,
+                    bundle_manifest(BUNDLE_PATH),
+                    TEMPLATE_SEARCH_PATH,
+                    md5_cached,
+                )
+            except Exception:
+                traceback_msg = str(traceback.format_exc())
+                emit_info(
+                    "error loading templates from bundle {bundle}, using template files, traceback: {traceback_msg}".format(
+                        bundle=BUNDLE_PATH, traceback_msg=traceback_msg
+                    ),
+                    debug,
+                )
+        template_env = jinja2.Environment(loader=templateLoader)
+        # prefix_range(), host_range(), ... usable as filters and globals
+        template_env.filters.update(TEMPLATE_FILTERS)
+        template_env.globals.update(TEMPLATE_FILTERS)
+    return template_env
+
+
+def pooled_session(push_target):
+    # session kept from previous watch iteration/daemon job, device may have closed it meanwhile (idle
+    # timeout, reboot, commit of sshd settings), checked with cheap RPC, None when it has to be re-opened
+    dev = dev_pool.get(push_target)
+    if dev is None or not dev.connected:
+        return None
+    if not session_alive(dev):
+        emit_info(
+            "{push_target} pooled session closed, re-opening".format(
+                push_target=push_target
+            ),
+            False,
+        )
+        dev_pool.pop(push_target, None)
+        return None
+    return dev
 
-        eph_instance = eph_param[0]
-        eph_conf_type = eph_param[1]
-        if eph_conf_type in ["json", "xml", "text"]:
-            return eph_instance, eph_conf_type, True
 
-        return eph_instance, "set", False
+def profile_input(parsed_args, profile_dev, device):
+    # profile input override, input seq is taken from device name
+    if parsed_args.input:
+        return parsed_args.input
+    if profile_dev["input"][0] == TEMPLATE_VARS_SEQ_INPUT:
+        return device_seq(device)
+    return profile_dev["input"][0]
 
+
+def eph_shard_push(
+    push_target, dev, dev_kwargs, local_onbox_ops, eph_instance, eph_shards, set_cmd
+):
+    # returns status suffix, -del cmds re-try used, any shard failed
+
+    def session_open():
+        shard_dev = Device(**dev_kwargs)
+        if local_onbox_ops:
+            shard_dev.open()
+        else:
+            shard_dev.open(auto_probe=2)
+        return shard_dev
+
+    def error_log(instance, traceback_msg):
+        emit_info(
+            "{push_target} error during commit of ephemeral shard {instance}, traceback: {traceback_msg}".format(
+                push_target=push_target,
+                instance=instance,
+                traceback_msg=traceback_msg,
+            ),
+            debug,
+        )
+
+    try:
+        shard_result = shard_push(
+            dev,
+            session_open,
+            eph_instance,
+            eph_shards,
+            set_cmd,
+            COMMIT_TIMEOUT,
+            REMOVE_DEL_CMDS_DURING_PUSH_DIFF_ERR_ENABLE,
+            error_log,
+        )
+    except ValueError as e:
+        emit_info(
+            "{push_target} sharding of {eph_instance} rejected, {error}".format(
+                push_target=push_target, eph_instance=eph_instance, error=e
+            ),
+            debug,
+        )
+        return ", sharding rejected: {error}".format(error=e), False, True
+    failed = shard_result["failed"]
+    emit_info(
+        "{push_target} ephemeral shards {eph_instance}-0..{last} committed: {committed}, failed: {failed}, unchanged: {unchanged}".format(
+            push_target=push_target,
+            eph_instance=eph_instance,
+            last=shard_result["shards"] - 1,
+            committed=",".join(
+                instance
+                for instance in shard_result["changed"] + shard_result["stale"]
+                if instance not in failed
+            )
+            or "-",
+            failed=",".join(failed) or "-",
+            unchanged=shard_result["shards"] - len(shard_result["changed"]),
+        ),
+        False,
+    )
+    return shard_status(shard_result), shard_result["removed_del_cmds"], bool(failed)
+
+
+def template_thread(parsed_args, profile_operation, profile, device="", timestamp=""):
+    junos_import()
     # sets eph paramaters for CLI param, it is called during profile operation too
     eph_instance, eph_conf_type, eph_load_overwrite = eph_settings(
         parsed_args.eph_instance
@@ -634,11 +975,11 @@ def template_thread(parsed_args, profile_operation, profile, device="", timestam
     else:
         exec_template = False
 
-    templateLoader = jinja2.FileSystemLoader(searchpath=TEMPLATE_SEARCH_PATH)
-    templateEnv = jinja2.Environment(loader=templateLoader)
+    templateEnv = template_env_get()
 
     diff_only = False
     init_error = False
+    eph_shards = None
     template_file = ""
     status = ""
 
@@ -671,26 +1012,20 @@ def template_thread(parsed_args, profile_operation, profile, device="", timestam
     else:
         try:
             push_target = device
-            profile_dict = getattr(template_ops_conf, profile)
-
-            # merge with default profile, pre-python 3.9 style
-            if "default" in profile_dict.keys():
-                profile_dev = {**profile_dict["default"], **profile_dict[device]}
-            else:
-                profile_dev = profile_dict[device]
+            # merged with default profile by inventory, shared read-only by device threads
+            profile_dev = inventory_get()["profiles"][profile][device]
 
             template_file = profile_dev["template"][0] + ".j2"
             template_vars = profile_dev["template_vars"][0]
-            # profile input override
-            if parsed_args.input:
-                _input = parsed_args.input
-            else:
-                _input = profile_dev["input"][0]
+            _input = profile_input(parsed_args, profile_dev, device)
 
             exec_template = True if bool(profile_dev.get("exec", [False])[0]) else False
             eph_instance, eph_conf_type, eph_load_overwrite = eph_settings(
                 profile_dev.get("eph_inst", None)
             )
+            # [shards] or [shards, key tokens], set loads only
+            if eph_instance is not None and eph_conf_type == "set":
+                eph_shards = profile_dev.get("eph_shards", None)
 
             # override template render and j2 save default archival settings
             if "save_rendered_j2" in profile_dev.keys():
@@ -727,8 +1062,13 @@ def template_thread(parsed_args, profile_operation, profile, device="", timestam
         try:
             template = templateEnv.get_template(template_file)
             template_md5 = file_md5(template_abs)
-            template_vars_for_render = template_vars_get(template_vars, _input)
-            template_output = template.render(template_vars_for_render)
+            # input range renders one block per seq
+            template_output = "\n".join(
+                template.render(template_vars_for_render)
+                for template_vars_for_render in template_vars_range(
+                    template_vars, _input
+                )
+            )
         except Exception:
             traceback_msg = str(traceback.format_exc())
             emit_info(
@@ -757,14 +1097,8 @@ def template_thread(parsed_args, profile_operation, profile, device="", timestam
             if push_target != "N/A" and template_vars in DIFF_PUSH_ELIGIBLE_LIST:
                 try:
                     if not local_onbox_ops:
-                        # merge with default profile, pre-python 3.9 style
-                        if "default" in template_ops_conf.auth_profiles:
-                            netconf_param = {
-                                **template_ops_conf.auth_profiles["default"],
-                                **template_ops_conf.auth_profiles[push_target],
-                            }
-                        else:
-                            netconf_param = template_ops_conf.auth_profiles[push_target]
+                        # merged with default auth profile by inventory
+                        netconf_param = inventory_get()["auth"][push_target]
 
                 except Exception:
                     traceback_msg = str(traceback.format_exc())
@@ -781,25 +1115,43 @@ def template_thread(parsed_args, profile_operation, profile, device="", timestam
                     )
                 # no netconf lookup error
                 else:
+                    # SAX parsing of RPC replies requested with filter_xml, e.g. rpc_fields() in exec templates
+                    if RPC_SAX_FILTER_ENABLE:
+                        device_options = {"use_filter": True}
+                    else:
+                        device_options = {}
                     # localhost operation, no SSH
                     if local_onbox_ops:
-                        dev = Device(gather_facts=False)
+                        dev_kwargs = dict(gather_facts=False, **device_options)
                     # SSH operation
                     else:
-                        dev = Device(
+                        dev_kwargs = dict(
                             user=netconf_param["user"][0],
                             host=netconf_param["host"][0],
                             port=netconf_param["port"][0],
                             ssh_private_key_file=netconf_param["ssh_key"][0],
                             gather_facts=False,
+                            **device_options,
                         )
+                    # watch mode re-uses session opened during previous iteration
+                    dev = pooled_session(push_target)
+                    if dev is None:
+                        dev = Device(**dev_kwargs)
                     try:
+                        # pooled session is open already
+                        if dev.connected:
+                            pass
                         # probe doesn't work with local operation, only SSH
-                        if local_onbox_ops:
+                        elif local_onbox_ops:
                             dev.open()
                         else:
                             dev.open(auto_probe=2)
+                        if parsed_args.every or keep_sessions:
+                            dev_pool[push_target] = dev
                     except Exception:
+                        if not local_onbox_ops:
+                            # cached probe result no longer holds
+                            probe_forget(dev_kwargs["host"], dev_kwargs["port"])
                         traceback_msg = str(traceback.format_exc())
                         emit_info(
                             "{push_target} error connecting to the device, {traceback_msg}".format(
@@ -836,142 +1188,115 @@ def template_thread(parsed_args, profile_operation, profile, device="", timestam
                                 )
 
                             set_cmd = template_output
+                            # json/xml/text eph loads are not set commands
+                            set_optimize_enable = SET_OPTIMIZE_ENABLE and (
+                                eph_instance is None or eph_conf_type == "set"
+                            )
+                            if set_optimize_enable:
+                                set_cmd, set_stats = set_optimize(template_output)
+                                if set_stats["optimized"] < set_stats["lines"]:
+                                    emit_info(
+                                        "{push_target} set commands optimized {lines} -> {optimized} lines (blank: {blank}, duplicate: {duplicate}, subsumed: {subsumed}) {template_file}".format(
+                                            push_target=push_target,
+                                            template_file=template_abs,
+                                            **set_stats
+                                        ),
+                                        False,
+                                    )
                             no_exception = False
                             removed_del_cmds = False
-                            try:
+                            shard_msg = ""
+                            shard_failed = False
+                            retry_config = None
+                            # items for delete might not be present, re-try without them if configured
+                            if (
+                                REMOVE_DEL_CMDS_DURING_PUSH_DIFF_ERR_ENABLE
+                                and eph_conf_type == "set"
+                            ):
+
+                                def retry_config():
+                                    return del_cmds_remove(
+                                        template_output, set_optimize_enable
+                                    )
 
-                                def load_or_diff(eph=False):
-                                    if eph:
-                                        # overwrite with json/xml/text
-                                        cu.load(
-                                            set_cmd,
-                                            format=eph_conf_type,
-                                            overwrite=eph_load_overwrite,
-                                        )
-                                    else:
-                                        cu.load(set_cmd, format="set")
-                                    # can't happen with ephemeral, parameter check prevents that
-                                    if diff_only:
-                                        diff = cu.diff()
-                                        cu.rollback()
-                                        return diff
-                                    else:
-                                        cu.commit(timeout=COMMIT_TIMEOUT)
+                            def text_fallback():
+                                emit_info(
+                                    "{push_target} text load of converted set commands failed, loading set commands {template_file}".format(
+                                        push_target=push_target,
+                                        template_file=template_abs,
+                                    ),
+                                    False,
+                                )
 
-                                if eph_instance is not None:
-                                    with Config(
+                            try:
+                                # shards in parallel sessions, errors and -del cmds re-try handled per shard
+                                if eph_shards and not diff_only:
+                                    (
+                                        shard_msg,
+                                        removed_del_cmds,
+                                        shard_failed,
+                                    ) = eph_shard_push(
+                                        push_target,
                                         dev,
-                                        mode="ephemeral",
-                                        ephemeral_instance=eph_instance,
-                                    ) as cu:
-                                        diff = load_or_diff(eph=True)
-                                else:
-                                    with Config(dev) as cu:
-                                        diff = load_or_diff()
-
-                            # handle diff/push differently by removing delete which may not be present, if configured
-                            except (ConfigLoadError, CommitError):
-                                if eph_instance is not None:
-                                    cu.rollback()
-                                # check if removing delete commands is configured for diff/push re-try
-                                if REMOVE_DEL_CMDS_DURING_PUSH_DIFF_ERR_ENABLE:
-                                    try:
-                                        # items for delete might not be present, remove and commit without
-                                        # ^delete pattern is not used as that doesn't apply for multiple lines!!
-                                        set_cmd = re.sub(r"delete\ .*\n", "", set_cmd)
-                                        # unless repeated re-open of ephemeral, commit is to regular config
-                                        # TBD re-factor repeated code, handle exception in load_or_diff function
-                                        if eph_instance is not None:
-                                            with Config(
-                                                dev,
-                                                mode="ephemeral",
-                                                ephemeral_instance=eph_instance,
-                                            ) as cu:
-                                                diff = load_or_diff(eph=True)
-                                        else:
-                                            with Config(dev) as cu:
-                                                diff = load_or_diff()
-                                        # for purposes of console and log message
-                                        removed_del_cmds = True
-                                    # neither regular/without delete push/diff passed
-                                    except Exception:
-                                        cu.rollback()
-                                        traceback_msg = str(traceback.format_exc())
-                                        if diff_only:
-                                            template_thread_data.append(
-                                                [
-                                                    push_target,
-                                                    "error during template diff (-del cmds), rollback..., use debug on/see log",
-                                                ]
-                                            )
-                                            emit_info(
-                                                "{push_target} error during template diff (-del cmds), rollback..., {template_file} (md5: {md5}), traceback: {traceback_msg}".format(
-                                                    push_target=push_target,
-                                                    template_file=template_abs,
-                                                    md5=template_md5,
-                                                    traceback_msg=traceback_msg,
-                                                ),
-                                                debug,
-                                            )
-                                        else:
-                                            template_thread_data.append(
-                                                [
-                                                    push_target,
-                                                    "error during template commit (-del cmds), rollback..., use debug on/see log",
-                                                ]
-                                            )
-                                            emit_info(
-                                                "{push_target} error during template commit (-del cmds), rollback..., {template_file} (md5: {md5}), traceback: {traceback_msg}".format(
-                                                    push_target=push_target,
-                                                    template_file=template_abs,
-                                                    md5=template_md5,
-                                                    traceback_msg=traceback_msg,
-                                                ),
-                                                debug,
-                                            )
-                                    # no exception during push/diff without del cmds
-                                    else:
-                                        no_exception = True
-                                # exception and REMOVE_DEL_CMDS_DURING_PUSH_DIFF_ERR_ENABLE = 0
+                                        dev_kwargs,
+                                        local_onbox_ops,
+                                        eph_instance,
+                                        eph_shards,
+                                        set_cmd,
+                                    )
+                                    diff = None
                                 else:
-                                    traceback_msg = str(traceback.format_exc())
-                                    if diff_only:
-                                        template_thread_data.append(
-                                            [
-                                                push_target,
-                                                "error during template diff, rollback..., use debug on/see log",
-                                            ]
-                                        )
-                                        emit_info(
-                                            "{push_target} error during template diff, rollback..., {template_file} (md5: {md5}), traceback: {traceback_msg}".format(
-                                                push_target=push_target,
-                                                template_file=template_abs,
-                                                md5=template_md5,
-                                                traceback_msg=traceback_msg,
-                                            ),
-                                            debug,
-                                        )
-                                    else:
-                                        template_thread_data.append(
-                                            [
-                                                push_target,
-                                                "error during template commit, rollback..., use debug on/see log",
-                                            ]
-                                        )
-
-                                        emit_info(
-                                            "{push_target} error during template commit, rollback..., {template_file} (md5: {md5}), traceback: {traceback_msg}".format(
-                                                push_target=push_target,
-                                                template_file=template_abs,
-                                                md5=template_md5,
-                                                traceback_msg=traceback_msg,
-                                            ),
-                                            debug,
-                                        )
-
+                                    diff, set_cmd, removed_del_cmds = config_push(
+                                        dev,
+                                        set_cmd,
+                                        retry_config,
+                                        eph_instance=eph_instance,
+                                        conf_type=eph_conf_type,
+                                        overwrite=eph_load_overwrite,
+                                        diff_only=diff_only,
+                                        commit_timeout=COMMIT_TIMEOUT,
+                                        set_text_min_lines=SET_TEXT_MIN_LINES,
+                                        text_fallback=text_fallback,
+                                    )
+                            # neither regular nor push/diff without delete cmds (if configured) passed
+                            except Exception:
+                                traceback_msg = str(traceback.format_exc())
+                                operation = "diff" if diff_only else "commit"
+                                # failed re-try without delete cmds
+                                del_cmds_msg = " (-del cmds)" if retry_config else ""
+                                template_thread_data.append(
+                                    [
+                                        push_target,
+                                        "error during template {operation}{del_cmds_msg}, rollback..., use debug on/see log".format(
+                                            operation=operation,
+                                            del_cmds_msg=del_cmds_msg,
+                                        ),
+                                    ]
+                                )
+                                emit_info(
+                                    "{push_target} error during template {operation}{del_cmds_msg}, rollback..., {template_file} (md5: {md5}), traceback: {traceback_msg}".format(
+                                        push_target=push_target,
+                                        operation=operation,
+                                        del_cmds_msg=del_cmds_msg,
+                                        template_file=template_abs,
+                                        md5=template_md5,
+                                        traceback_msg=traceback_msg,
+                                    ),
+                                    debug,
+                                )
                             # no exception during regular push/diff
                             else:
                                 no_exception = True
+                            if shard_failed:
+                                no_exception = False
+                                template_thread_data.append(
+                                    [
+                                        push_target,
+                                        "error during sharded template commit{shard_msg}, use debug on/see log".format(
+                                            shard_msg=shard_msg
+                                        ),
+                                    ]
+                                )
 
                             if no_exception:
                                 # log if there was diff
@@ -1024,31 +1349,24 @@ def template_thread(parsed_args, profile_operation, profile, device="", timestam
                                         archive_msg = ""
                                         template_file = template_file.replace(".j2", "")
                                         if save_commit_j2_enable:
-                                            shutil.copy(
-                                                template_abs,
-                                                SAVE_PATH_COMMIT_J2
-                                                + "/"
-                                                + timestamp
-                                                + "__"
-                                                + template_file
-                                                + "__"
-                                                + push_target
-                                                + ".j2",
+                                            archive_put(
+                                                SAVE_PATH_COMMIT_J2,
+                                                timestamp,
+                                                template_file,
+                                                push_target,
+                                                ".j2",
+                                                source_file=template_abs,
                                             )
                                             archive_msg = ", j2 template archived"
                                         if save_commit_cfg_enable:
-                                            save_commit_set_file = (
-                                                SAVE_PATH_COMMIT_CFG
-                                                + "/"
-                                                + timestamp
-                                                + "__"
-                                                + template_file
-                                                + "__"
-                                                + push_target
-                                                + ".set"
+                                            archive_put(
+                                                SAVE_PATH_COMMIT_CFG,
+                                                timestamp,
+                                                template_file,
+                                                push_target,
+                                                ".set",
+                                                data=set_cmd,
                                             )
-                                            with open(save_commit_set_file, "w") as f:
-                                                f.writelines(set_cmd)
                                             archive_msg = ", set-cmd archived"
 
                                         if (
@@ -1069,8 +1387,9 @@ def template_thread(parsed_args, profile_operation, profile, device="", timestam
 
                                     # delete commands removed due to exception, commit completed
                                     if removed_del_cmds:
-                                        status = "{template_file} template commit completed (-del cmds){archive_msg}".format(
+                                        status = "{template_file} template commit completed (-del cmds){shard_msg}{archive_msg}".format(
                                             template_file=template_file,
+                                            shard_msg=shard_msg,
                                             archive_msg=archive_msg,
                                         )
                                         template_thread_data.append(
@@ -1086,8 +1405,9 @@ def template_thread(parsed_args, profile_operation, profile, device="", timestam
                                         )
                                     # no delete commands were removed due to exception, commit completed
                                     else:
-                                        status = "{template_file} template commit completed{archive_msg}".format(
+                                        status = "{template_file} template commit completed{shard_msg}{archive_msg}".format(
                                             template_file=template_file,
+                                            shard_msg=shard_msg,
                                             archive_msg=archive_msg,
                                         )
                                         template_thread_data.append(
@@ -1115,17 +1435,30 @@ def template_thread(parsed_args, profile_operation, profile, device="", timestam
                                 )
 
                                 try:
-                                    exec(template_output)
-                                    # template return data for passing between mprofiles
-                                    if result:
-                                        if result_adv:
-                                            template_thread_data.append(
-                                                [push_target, result, result_adv]
-                                            )
-                                        else:
-                                            template_thread_data.append(
-                                                [push_target, result]
-                                            )
+                                    # read-only templates reuse RPC replies of previous templates/steps
+                                    if (
+                                        RPC_CACHE_ENABLE
+                                        and template_file.replace(".j2", "")
+                                        in RPC_CACHE_TEMPLATE_LIST
+                                    ):
+                                        dev = RPCCacheDevice(
+                                            dev, push_target, RPC_CACHE_TTL
+                                        )
+                                    # names set by template without global (e.g. rate_fields) stay in template_locals
+                                    template_locals = dict(locals())
+                                    exec(template_output, globals(), template_locals)
+                                    # template return data for passing between mprofiles, history of
+                                    # repeated runs for rates, rate_fields = {index: label}
+                                    step_row = exec_step_row(
+                                        push_target,
+                                        template_file.replace(".j2", ""),
+                                        result,
+                                        result_adv,
+                                        template_locals.get("rate_fields"),
+                                        RESULT_HISTORY_SIZE,
+                                    )
+                                    if step_row:
+                                        template_thread_data.append(step_row)
 
                                 except Exception:
                                     traceback_msg = str(traceback.format_exc())
@@ -1148,31 +1481,24 @@ def template_thread(parsed_args, profile_operation, profile, device="", timestam
                                         archive_msg = ""
                                         template_file = template_file.replace(".j2", "")
                                         if save_exec_j2_enable:
-                                            shutil.copy(
-                                                template_abs,
-                                                SAVE_PATH_EXEC_J2
-                                                + "/"
-                                                + timestamp
-                                                + "__"
-                                                + template_file
-                                                + "__"
-                                                + push_target
-                                                + ".py.j2",
+                                            archive_put(
+                                                SAVE_PATH_EXEC_J2,
+                                                timestamp,
+                                                template_file,
+                                                push_target,
+                                                ".py.j2",
+                                                source_file=template_abs,
                                             )
                                             archive_msg = ", j2 exec template archived"
                                         if save_exec_py_enable:
-                                            save_commit_set_file = (
-                                                SAVE_PATH_EXEC_PY
-                                                + "/"
-                                                + timestamp
-                                                + "__"
-                                                + template_file
-                                                + "__"
-                                                + push_target
-                                                + ".py"
+                                            archive_put(
+                                                SAVE_PATH_EXEC_PY,
+                                                timestamp,
+                                                template_file,
+                                                push_target,
+                                                ".py",
+                                                data=template_output,
                                             )
-                                            with open(save_commit_set_file, "w") as f:
-                                                f.writelines(template_output)
                                             archive_msg = ", exec code archived"
 
                                         if (
@@ -1208,9 +1534,10 @@ def template_thread(parsed_args, profile_operation, profile, device="", timestam
                                 )
                                 status = "template execution not enabled"
                                 template_thread_data.append([push_target, status])
-                        # close dev
+                        # close dev, unless kept for next watch mode iteration
                         try:
-                            dev.close()
+                            if not (parsed_args.every or keep_sessions):
+                                dev.close()
                         except Exception:
                             traceback_msg = str(traceback.format_exc())
                             emit_info(
@@ -1225,11 +1552,437 @@ def template_thread(parsed_args, profile_operation, profile, device="", timestam
                 print(template_output)
 
 
-def print_results():
+def bundle(bundle_path):
+    # off-box build of deployment bundle, copied to the box next to template-ops.py
+    try:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        module_files = bundle_modules(script_dir)
+        manifest = build_bundle(
+            bundle_path, module_files, TEMPLATE_SEARCH_PATH, ver, TEMPLATE_FILTERS
+        )
+        print(
+            "bundle {bundle_path} (md5: {md5}), {modules} modules, {templates} templates, python {python}, jinja2 {jinja2}".format(
+                bundle_path=bundle_path,
+                md5=md5_cached(bundle_path),
+                modules=len(module_files),
+                templates=len(manifest["templates"]),
+                python=manifest["python"],
+                jinja2=manifest["jinja2"],
+            )
+        )
+        for template_name, error in manifest["errors"].items():
+            print(
+                "template {template_name} not bundled, {error}".format(
+                    template_name=template_name, error=error
+                )
+            )
+    except Exception:
+        traceback_msg = str(traceback.format_exc())
+        emit_info(
+            "error building bundle, traceback: {traceback_msg}".format(
+                traceback_msg=traceback_msg
+            ),
+            debug,
+        )
+        emit_info("Error building bundle, use debug on/see log", not debug, not debug)
+
+
+def list_archive(arg, since, until):
+    # archived items from catalog, arg is device name or all
+    try:
+        entries = catalog_query(
+            SAVE_PATH_COMMIT_CFG,
+            device=None if arg == "all" else arg,
+            since=since,
+            until=until,
+        )
+        table_width = 131
+        print("-" * table_width)
+        print(
+            "| {:^15} | {:^13} | {:^26} | {:^6} | {:^32} | {:>9} | {:^11} |".format(
+                "timestamp", "device", "template", "kind", "md5", "size", "backend"
+            )
+        )
+        print("-" * table_width)
+        for entry in entries:
+            print(
+                "| {:>15} | {:>13} | {:>26} | {:>6} | {:>32} | {:>9} | {:>11} |".format(
+                    entry["timestamp"],
+                    entry["device"],
+                    entry["template"],
+                    entry["kind"],
+                    entry["md5"],
+                    entry["size"],
+                    "cas" if entry["blob"] else "files",
+                )
+            )
+            print("-" * table_width)
+    except Exception:
+        traceback_msg = str(traceback.format_exc())
+        emit_info(
+            "error listing archive, traceback: {traceback_msg}".format(
+                traceback_msg=traceback_msg
+            ),
+            debug,
+        )
+        emit_info("error listing archive, use debug on/see log", not debug, not debug)
+
+
+def rollback_thread(profile, device, until, timestamp):
+    # re-push latest archived config of profile device template committed up to until timestamp
+    junos_import()
+    try:
+        profile_dev = inventory_get()["profiles"][profile][device]
+        save_commit_cfg_enable = SAVE_COMMIT_CFG_ENABLE
+        if "save_rendered_j2" in profile_dev.keys():
+            save_commit_cfg_enable = profile_dev.get("save_rendered_j2")[0]
+        entries = catalog_query(
+            SAVE_PATH_COMMIT_CFG,
+            device=device,
+            template=profile_dev["template"][0],
+            kind="set",
+            until=until,
+        )
+        if not entries:
+            template_thread_data.append(
+                [device, "no archived config up to {until}".format(until=until)]
+            )
+            return
+        entry = entries[-1]
+        config = archive_read(SAVE_PATH_COMMIT_CFG, entry).decode()
+        eph_instance, eph_conf_type, eph_load_overwrite = eph_settings(
+            profile_dev.get("eph_inst", None)
+        )
+        # sharded profile config goes back into the same <eph_inst>-N instances
+        eph_shards = None
+        if eph_instance is not None and eph_conf_type == "set":
+            eph_shards = profile_dev.get("eph_shards", None)
+        shard_msg = ""
+
+        netconf_param = inventory_get()["auth"][device]
+        local_onbox_ops = device in ["local", "localhost"]
+        if local_onbox_ops:
+            dev_kwargs = dict(gather_facts=False)
+            dev = Device(**dev_kwargs)
+            dev.open()
+        else:
+            dev_kwargs = dict(
+                user=netconf_param["user"][0],
+                host=netconf_param["host"][0],
+                port=netconf_param["port"][0],
+                ssh_private_key_file=netconf_param["ssh_key"][0],
+                gather_facts=False,
+            )
+            dev = Device(**dev_kwargs)
+            dev.open(auto_probe=2)
+        try:
+            if eph_shards:
+                shard_msg, _, shard_failed = eph_shard_push(
+                    device,
+                    dev,
+                    dev_kwargs,
+                    local_onbox_ops,
+                    eph_instance,
+                    eph_shards,
+                    config,
+                )
+                if shard_failed:
+                    raise RuntimeError(
+                        "sharded rollback failed{shard_msg}".format(shard_msg=shard_msg)
+                    )
+            else:
+                config_commit(
+                    dev,
+                    config,
+                    eph_instance,
+                    eph_conf_type,
+                    eph_load_overwrite,
+                    commit_timeout=COMMIT_TIMEOUT,
+                )
+        finally:
+            dev.close()
+
+    except Exception:
+        traceback_msg = str(traceback.format_exc())
+        emit_info(
+            "{device} error during rollback, traceback: {traceback_msg}".format(
+                device=device, traceback_msg=traceback_msg
+            ),
+            debug,
+        )
+        template_thread_data.append(
+            [device, "error during rollback, use debug on/see log"]
+        )
+    else:
+        status = "rollback to {timestamp} {template} completed (md5: {md5}){shard_msg}".format(
+            timestamp=entry["timestamp"],
+            template=entry["template"],
+            md5=entry["md5"],
+            shard_msg=shard_msg,
+        )
+        # re-pushed config is the newest commit now, next --rollback-to/--list-archive must see it
+        if save_commit_cfg_enable:
+            try:
+                archive_put(
+                    SAVE_PATH_COMMIT_CFG,
+                    timestamp,
+                    entry["template"],
+                    device,
+                    ".set",
+                    data=config,
+                )
+                status += ", set-cmd archived"
+            except Exception:
+                traceback_msg = str(traceback.format_exc())
+                emit_info(
+                    "error archiving set commands during rollback: {traceback_msg}".format(
+                        traceback_msg=traceback_msg
+                    ),
+                    debug,
+                )
+                status += ", archive error, see log"
+        template_thread_data.append([device, status])
+        emit_info("{device} {status}".format(device=device, status=status), False)
+
+
+def rollback(profile, until):
+    # all profile devices concurrently, one commit wall time
+    if profile not in template_ops_conf.push_profiles:
+        emit_info("No matching profile {profile} ".format(profile=profile), True)
+        return
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    rollback_threads = []
+    for device in inventory_get()["profile_devices"][profile]:
+        thread = Thread(
+            target=rollback_thread, args=(profile, device, until, timestamp)
+        )
+        rollback_threads.append(thread)
+        thread.start()
+    for thread in rollback_threads:
+        thread.join()
+    print_results()
+
+
+def deploy_files():
+    # [local file, remote file], script last so it never runs with modules older than itself
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    files = [
+        [str(module_file), DEPLOY_PATH + module_file.name]
+        for module_file in sorted(pathlib.Path(script_dir).glob("template_ops_*.py"))
+    ]
+    bundle_path = os.path.join(script_dir, "template-ops.zip")
+    if os.path.isfile(bundle_path):
+        # stale bundle would shadow updated modules on-box
+        if bundle_stale(bundle_path, bundle_modules(script_dir)):
+            bundle(bundle_path)
+        files.append([bundle_path, DEPLOY_PATH + "template-ops.zip"])
+    files += [
+        [str(template_file), DEPLOY_PATH + "xtemplate/" + template_file.name]
+        for template_file in list_template(True) or []
+    ]
+    files += [
+        [inventory_file, DEPLOY_PATH + "xinventory/" + os.path.basename(inventory_file)]
+        for inventory_file in inventory_files(INVENTORY_PATH)
+    ]
+    files.append([os.path.abspath(__file__), DEPLOY_PATH + "template-ops.py"])
+    return files
+
+
+def deploy_shell(sh, command):
+    # StartShell.run() doesn't return exit status, marker line is printed on success only
+    ok, output = sh.run(command + " && echo deploy-ok")
+    if not ok or "deploy-ok" not in [line.strip() for line in output.splitlines()]:
+        raise RuntimeError(
+            "shell command {command} failed: {output}".format(
+                command=command, output=output
+            )
+        )
+
+
+def deploy_thread(device, files):
+    # remote md5 per file, only missing/changed files are copied, copied under temp name and renamed,
+    # on-box runs never load partially copied module/bundle, requires 'start shell' permission
+    junos_import()
+    from jnpr.junos.utils.scp import SCP
+    from jnpr.junos.utils.start_shell import StartShell
+
+    try:
+        netconf_param = inventory_get()["auth"][device]
+        dev = Device(
+            user=netconf_param["user"][0],
+            host=netconf_param["host"][0],
+            port=netconf_param["port"][0],
+            ssh_private_key_file=netconf_param["ssh_key"][0],
+            gather_facts=False,
+        )
+        dev.open(auto_probe=2)
+        try:
+            changed = []
+            for local, remote in files:
+                try:
+                    checksum = dev.rpc.get_checksum_information(path=remote)
+                    remote_md5 = checksum.findtext(".//checksum").strip()
+                except Exception:
+                    # missing remote file
+                    remote_md5 = None
+                if remote_md5 != md5_cached(local):
+                    changed.append([local, remote])
+            if changed:
+                tmp_suffix = ".deploy-" + PID
+                with StartShell(dev) as sh:
+                    # xtemplate/ and xinventory/ don't exist on first deploy
+                    deploy_shell(
+                        sh,
+                        "mkdir -p "
+                        + " ".join(
+                            sorted(
+                                set(
+                                    shlex.quote(os.path.dirname(remote))
+                                    for local, remote in changed
+                                )
+                            )
+                        ),
+                    )
+                    with SCP(dev) as scp:
+                        for local, remote in changed:
+                            scp.put(local, remote_path=remote + tmp_suffix)
+                    # same file system, rename replaces file atomically, script is renamed last
+                    for local, remote in changed:
+                        deploy_shell(
+                            sh,
+                            "mv -f {tmp} {remote}".format(
+                                tmp=shlex.quote(remote + tmp_suffix),
+                                remote=shlex.quote(remote),
+                            ),
+                        )
+        finally:
+            dev.close()
+
+    except Exception:
+        traceback_msg = str(traceback.format_exc())
+        emit_info(
+            "{device} error during deploy, traceback: {traceback_msg}".format(
+                device=device, traceback_msg=traceback_msg
+            ),
+            debug,
+        )
+        template_thread_data.append(
+            [device, "error during deploy, use debug on/see log"]
+        )
+    else:
+        status = "deploy completed, {changed}/{total} files copied".format(
+            changed=len(changed), total=len(files)
+        )
+        # names for small fixes, full deploys would not fit the table
+        if 0 < len(changed) <= 5:
+            status += ": " + " ".join(
+                os.path.basename(local) for local, remote in changed
+            )
+        template_thread_data.append([device, status])
+        emit_info("{device} {status}".format(device=device, status=status), False)
+
+
+def deploy(arg):
+    # all hosts concurrently, hosts from DEPLOY_TARGET_LIST or comma separated auth_profiles names
+    if arg == "all":
+        devices = DEPLOY_TARGET_LIST
+    else:
+        devices = arg.split(",")
+    for device in devices:
+        if device not in inventory_get()["auth"]:
+            emit_info("No matching auth profile {device} ".format(device=device), True)
+            return
+    files = deploy_files()
+    deploy_threads = []
+    for device in devices:
+        thread = Thread(target=deploy_thread, args=(device, files))
+        deploy_threads.append(thread)
+        thread.start()
+    for thread in deploy_threads:
+        thread.join()
+    print_results()
+
+
+def result_table_width():
+    if header not in [None, "default"]:
+        return 19 + len(header)
+    return 119
+
+
+def print_result_header(multi_line):
+    # if template returns custom header, or None to avoid printing, else default
+    table_width = result_table_width()
+    if header not in [None, "default"]:
+        TEMPLATE_DATA_HEADER[0][1] = header
+    elif header in ["default"]:
+        TEMPLATE_DATA_HEADER[0][1] = TEMPLATE_DATA_HEADER_DEFAULT[0][1]
+    elif header is None:
+        return
+
+    # multi-line exec operation formatting
+    if multi_line:
+        print("|" + "-" * table_width)
+        for row in TEMPLATE_DATA_HEADER:
+            print("| {:^12} | {:^100} | ".format(*row))
+            print("|" + "-" * table_width)
+    # when custom header is set adjust table width based on result
+    elif header not in ["default"]:
+        print("-" * table_width)
+        for row in TEMPLATE_DATA_HEADER:
+            print("| {:^12} | {} | ".format(row[0], row[1]))
+            print("-" * table_width)
+    # fixed width when custom header is not used
+    else:
+        print("-" * table_width)
+        for row in TEMPLATE_DATA_HEADER:
+            print("| {:^12} | {:^100} | ".format(*row))
+            print("-" * table_width)
+
+
+def print_result_row(row, multi_line):
+    table_width = result_table_width()
+    if multi_line:
+        print("|# {:<12} {:>100}  ".format(*row))
+        print("|" + "-" * table_width)
+    elif header not in ["default"]:
+        if len(row[1]) > 0:
+            # in case of error like device unreachable
+            if header and len(row[1]) < len(header):
+                row[1] = row[1].ljust(len(header))
+            print("| {:^12} | {} | ".format(row[0], row[1]))
+            print("-" * table_width)
+    else:
+        print("| {:^12} | {:>100} | ".format(*row))
+        print("-" * table_width)
+
+
+def print_result_groups(print_data):
+    # identical results collapsed, most common first, devices wrapped below result
+    groups = {}
+    for row in print_data:
+        groups.setdefault(row[1], []).append(row[0])
+    table_width = 119
+    print("-" * table_width)
+    print("| {:>5} | {:^107} | ".format("count", "template operation output / devices"))
+    print("-" * table_width)
+    for text, devices in sorted(groups.items(), key=lambda group: -len(group[1])):
+        if len(text.splitlines()) > 1:
+            print("|# {:>5}".format(len(devices)))
+            print(text)
+        else:
+            print("| {:>5} | {:<107} | ".format(len(devices), text))
+        for line in textwrap.wrap(", ".join(devices), 107):
+            print("| {:>5} | {:<107} | ".format("", line))
+        print("-" * table_width)
+
+
+def print_results(print_rows=True):
+    # print_rows False when rows were streamed already (--stream), rates/summary only
     if len(template_thread_data) > 0:
         # diff
         if template_thread_data[0][0] == "diff":
-            print(template_thread_data[0][1])
+            if print_rows:
+                print(template_thread_data[0][1])
         # process non-diff
         else:
             # print only if the result is not dict/list and non-empty.
@@ -1249,77 +2002,460 @@ def print_results():
                 multi_line = False
 
             print_data.sort()
-            # if template returns custom header, or None to avoid printing, else default
-            print_header = True
-            table_width = 119
-            if header not in [None, "default"]:
-                TEMPLATE_DATA_HEADER[0][1] = header
-                table_width = 19 + len(header)
-            elif header in ["default"]:
-                TEMPLATE_DATA_HEADER[0][1] = TEMPLATE_DATA_HEADER_DEFAULT[0][1]
-            elif header is None:
-                print_header = False
-
-            # multi-line exec operation formatting
-            if multi_line:
-                if print_header:
-                    print("|" + "-" * table_width)
-                    for row in TEMPLATE_DATA_HEADER:
-                        print("| {:^12} | {:^100} | ".format(*row))
-                        print("|" + "-" * table_width)
-
+            if result_summary:
+                print_result_groups(print_data)
+            elif print_rows:
+                print_result_header(multi_line)
                 for row in print_data:
-                    print("|# {:<12} {:>100}  ".format(*row))
-                    print("|" + "-" * table_width)
-            # no exec multi-line or regular template output
+                    print_result_row(row, multi_line)
+
+            # rates of current step results from history of previous runs
+            if RESULT_HISTORY_SIZE:
+                print_rates(
+                    [
+                        (data[0], data[3])
+                        for data in template_thread_data
+                        if len(data) > 3 and data[1]
+                    ]
+                )
+
+
+def result_failed(data):
+    # status rows of template_thread, exec results are not errors
+    return type(data[1]) is str and bool(STATUS_ERROR_RE.search(data[1]))
+
+
+def timed_template_thread(parsed_args, profile_operation, profile, device, timestamp):
+    # completion time of profile device for export records
+    template_thread(parsed_args, profile_operation, profile, device, timestamp)
+    device_finished[device] = time()
+
+
+def row_template(row, step, device, template=None):
+    # template of template_thread_data row, from profile when exec didn't return it
+    if len(row) > 3:
+        return row[3]
+    if step:
+        return (
+            inventory_get()["profiles"][step].get(device, {}).get("template", [None])[0]
+        )
+    return template
+
+
+def store_rows(rows, step, template=None):
+    # result store rows [device, template, status, result, result_adv], diff text rows are not stored
+    return [
+        [
+            row[0],
+            row_template(row, step, row[0], template),
+            "error" if result_failed(row) else "ok",
+            row[1],
+            row[2] if len(row) > 2 else None,
+        ]
+        for row in rows
+        if row[1] and row[0] != "diff"
+    ]
+
+
+def write_result(row, step, started, device=None, template=None):
+    # export record of template_thread_data row
+    if not row[1]:
+        return
+    device = device or row[0]
+    template = row_template(row, step, device, template)
+    finished = device_finished.get(device, time())
+    result_writer.write(
+        run_id=RUN_ID,
+        step=step,
+        device=device,
+        template=template,
+        status="error" if result_failed(row) else "ok",
+        timestamp=datetime.fromtimestamp(finished).isoformat(timespec="milliseconds"),
+        seconds=round(finished - started, 3),
+        result=row[1],
+        result_adv=row[2] if len(row) > 2 else None,
+    )
+
+
+def stream_results(step_threads, total, first_row, started, step=None):
+    # rows printed (or exported with --output) as device threads finish, progress line on terminal stderr
+    progress = sys.stderr.isatty()
+    printed = first_row
+    multi_line = None
+    while True:
+        # rows of finished threads are in place before running count drops
+        running = sum(thread.is_alive() for thread in step_threads)
+        rows = template_thread_data[printed:]
+        printed += len(rows)
+        if progress:
+            sys.stderr.write("\r\033[K")
+        for row in rows:
+            if result_writer:
+                write_result(row, step, started)
+            elif row[0] == "diff":
+                print(row[1])
+            elif type(row[1]) not in [dict, list] and row[1] and not result_summary:
+                if multi_line is None:
+                    multi_line = len(row[1].splitlines()) > 1
+                    print_result_header(multi_line)
+                print_result_row(row, multi_line)
+        sys.stdout.flush()
+        if progress:
+            done = total - running
+            finished = len(step_threads) - running
+            if finished and running:
+                eta = "{eta:.0f}s".format(
+                    eta=(time() - started) / finished * running
+                )
             else:
-                # when custom header is set adjust table width based on result
-                if header not in ["default"]:
-                    if print_header:
-                        print("-" * table_width)
-                        for row in TEMPLATE_DATA_HEADER:
-                            print("| {:^12} | {} | ".format(row[0], row[1]))
-                            print("-" * table_width)
-                    for row in print_data:
-                        if len(row[1]) > 0:
-                            # in case of error like device unreachable
-                            if len(row[1]) < len(header):
-                                row[1] = row[1].ljust(len(header))
-                            print("| {:^12} | {} | ".format(row[0], row[1]))
-                            print("-" * table_width)
-
-                # fixed width when custom header is not used
-                else:
-                    if print_header:
-                        print("-" * table_width)
-                        for row in TEMPLATE_DATA_HEADER:
-                            print("| {:^12} | {:^100} | ".format(*row))
-                            print("-" * table_width)
-                    for row in print_data:
-                        print("| {:^12} | {:>100} | ".format(*row))
-                        print("-" * table_width)
+                eta = "-"
+            failed = sum(
+                result_failed(data) for data in template_thread_data[first_row:printed]
+            )
+            sys.stderr.write(
+                "done {done}/{total}, running {running}, failed {failed}, ETA {eta}".format(
+                    done=done, total=total, running=running, failed=failed, eta=eta
+                )
+            )
+            if not running:
+                sys.stderr.write("\n")
+            sys.stderr.flush()
+        if not running:
+            break
+        sleep(STREAM_INTERVAL)
+
+
+def print_rates(history_keys):
+    labels, rows = history_rates(history_keys)
+    if rows:
+        columns = []
+        for label in labels:
+            columns += [label, "avg " + label]
+        table_width = 16 + 17 * len(columns)
+        print("-" * table_width)
+        print(
+            "| {:^12} | ".format("device")
+            + " | ".join("{:^14}".format(column) for column in columns)
+            + " |"
+        )
+        print("-" * table_width)
+        for row in rows:
+            print(
+                "| {:^12} | ".format(row[0])
+                + " | ".join("{:>14,.1f}".format(value) for value in row[1:])
+                + " |"
+            )
+            print("-" * table_width)
+
+
+def profile_probe(profile, profile_devices):
+    # returns reachable devices, unreachable get status row without starting device thread,
+    # on-box local devices, pooled sessions and render-only devices are not probed
+    targets = {}
+    for device in profile_devices:
+        profile_dev = inventory_get()["profiles"][profile][device]
+        auth = inventory_get()["auth"].get(device)
+        if (
+            device in ["local", "localhost"]
+            or auth is None
+            or profile_dev["template_vars"][0] not in DIFF_PUSH_ELIGIBLE_LIST
+            or (device in dev_pool and dev_pool[device].connected)
+        ):
+            continue
+        targets[device] = (auth["host"][0], auth["port"][0])
+    probe_errors = probe_hosts(targets, PROBE_TIMEOUT, PROBE_TTL)
+    reachable = []
+    for device in profile_devices:
+        if probe_errors.get(device) is None:
+            reachable.append(device)
+            continue
+        status = "unreachable {host}:{port} ({error}), skipped".format(
+            host=targets[device][0],
+            port=targets[device][1],
+            error=probe_errors[device],
+        )
+        template_thread_data.append([device, status])
+        emit_info("{device} {status}".format(device=device, status=status), False)
+    return reachable
+
+
+def run_profile_steps(parsed_args, run_profiles):
+    # common execucution for profile/mprofile/sequence
+    for profile_dict in run_profiles:
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        for key, value in profile_dict.items():
+            profile = key
+        profile_devices = inventory_get()["profile_devices"][profile]
+        nr_profile_devices = len(profile_devices)
+
+        # MAX_PROFILE_DEV check
+        if nr_profile_devices > template_ops_conf.MAX_PROFILE_DEV:
+            emit_info(
+                "{profile} profile number of targets ({profile_dev}) > MAX_PROFILE_DEV ({MAX_PROFILE_DEV}) setting".format(
+                    profile_dev=nr_profile_devices,
+                    MAX_PROFILE_DEV=template_ops_conf.MAX_PROFILE_DEV,
+                    profile=profile,
+                ),
+                True,
+            )
+
+        # proceed profile size less than MAX_PROFILE_DEV
+        else:
+            # pre-pause for defined time, meant for mprofile
+            sleep(profile_dict[profile].get("pre-delay", 0))
+
+            started = time()
+            first_row = len(template_thread_data)
+            device_finished.clear()
+            if PROBE_ENABLE:
+                profile_devices = profile_probe(profile, profile_devices)
+            step_threads = []
+            for device in profile_devices:
+                thread = Thread(
+                    target=timed_template_thread,
+                    args=(
+                        parsed_args,
+                        True,
+                        profile,
+                        device,
+                        timestamp,
+                    ),
+                )
+                threads.append(thread)
+                step_threads.append(thread)
+                thread.start()
+
+            if result_stream or result_writer:
+                stream_results(
+                    step_threads, nr_profile_devices, first_row, started, profile
+                )
+            for thread in threads:
+                thread.join()
+
+            # post-pause for defined time, meant for mprofile
+            sleep(profile_dict[profile].get("post-delay", 0))
+
+            print_results(print_rows=not (result_stream or result_writer))
+            # dict/list rows of earlier mprofile steps stay in template_thread_data, stored once
+            store_write(
+                RUN_ID, profile, store_rows(template_thread_data[first_row:], profile)
+            )
+
+            # remove simple string output to avoid repeated print with mprofile in print_results
+            for data in template_thread_data:
+                if type(data[1]) not in [dict, list]:
+                    data[1] = ""
+
+
+def sequence_profiles(sequence):
+    # "p1 5:p2 p3" -> [{"p1": {}}, {"p2": {"pre-delay": 5}}, {"p3": {}}], same as multi-profile steps
+    run_profiles = []
+    for step in sequence.split():
+        if ":" in step:
+            pre_delay, profile = step.split(":", 1)
+            step_settings = {"pre-delay": float(pre_delay)}
+        else:
+            profile = step
+            step_settings = {}
+        if profile in template_ops_conf.push_profiles:
+            run_profiles.append({profile: step_settings})
+        else:
+            emit_info(
+                "No matching profile {profile} in sequence".format(profile=profile),
+                True,
+            )
+    return run_profiles
+
+
+def watch(parsed_args, run_profiles):
+    # repeat profile steps every parsed_args.every seconds in this process, templates and sessions stay warm
+    every = parsed_args.every
+    iteration = 0
+    next_run = time()
+    try:
+        while True:
+            iteration += 1
+            # RPC cache and data passed between steps are scoped to one iteration
+            rpc_cache_clear()
+            inventory_refresh()
+            del template_thread_data[:]
+            del threads[:]
+
+            run_profile_steps(parsed_args, run_profiles)
+            archive_retention()
+
+            next_run += every
+            # iteration overran the interval, skip missed runs instead of starting them back-to-back
+            if time() > next_run:
+                skipped_runs = int((time() - next_run) // every) + 1
+                next_run += skipped_runs * every
+                emit_info(
+                    "iteration {iteration} exceeded interval {every}s, {skipped_runs} run(s) skipped".format(
+                        iteration=iteration, every=every, skipped_runs=skipped_runs
+                    ),
+                    True,
+                )
+            sleep(max(next_run - time(), 0))
+
+    except KeyboardInterrupt:
+        emit_info(
+            "watch mode stopped after {iteration} iteration(s)".format(
+                iteration=iteration
+            )
+        )
+    finally:
+        for dev in dev_pool.values():
+            try:
+                dev.close()
+            except Exception:
+                pass
+        dev_pool.clear()
+
+
+def client_argv(argv, output_file):
+    # daemon runs in its own cwd, --output-file is sent as absolute path of client cwd
+    job_argv = []
+    skip = False
+    for arg in argv:
+        option = arg.split("=")[0]
+        if skip:
+            skip = False
+        elif arg == "--client":
+            pass
+        # argparse accepts unambiguous prefixes (--output-f)
+        elif (
+            output_file
+            and len(option) > len("--output")
+            and "--output-file".startswith(option)
+        ):
+            skip = "=" not in arg
+        else:
+            job_argv.append(arg)
+    if output_file:
+        job_argv += ["--output-file", os.path.abspath(output_file)]
+    return job_argv
+
+
+def daemon_job_check(argv):
+    # options running forever or starting other daemon/client are not jobs
+    for arg in argv:
+        if arg.split("=")[0] in ["--daemon", "--client", "--every"]:
+            return "{arg} not allowed in daemon job".format(arg=arg)
+    return None
+
+
+def daemon_job(argv, out):
+    # same as fresh CLI process, except inventory, compiled templates and sessions in dev_pool
+    global RUN_ID, header, result, result_adv
+    RUN_ID = datetime.now().strftime("%Y%m%d-%H%M%S") + "-" + PID
+    header = "default"
+    result = EXEC_RESULT_DEFAULT
+    result_adv = None
+    del template_thread_data[:]
+    del threads[:]
+    rpc_cache_clear()
+    inventory_refresh()
+    emit_info("daemon job {argv}".format(argv=" ".join(argv)), False)
+    with redirect_stdout(out), redirect_stderr(out):
+        try:
+            main(argv)
+            archive_writer.flush()
+        except SystemExit:
+            # argparse error, message already written
+            pass
+    if MD5_CACHE_SIDECAR_ENABLE:
+        md5_cache_save()
+
+
+def daemon_worker_init():
+    # forked daemon worker, own pid in run ids, tmp file names and syslog
+    global PID, script
+    PID = str(os.getpid())
+    script = "[{user}]{path}[{pid}]".format(
+        path=os.path.abspath(sys.argv[0]), user=USER, pid=PID
+    )
 
 
-def main():
+def daemon():
+    # template/exec threads share module globals of a process, jobs run one at a time per
+    # process, DAEMON_WORKERS > 1 runs jobs in forked worker processes
+    global keep_sessions
+    keep_sessions = True
+    emit_info(
+        "template-ops daemon listening on {socket}, {workers} worker(s)".format(
+            socket=DAEMON_SOCKET, workers=DAEMON_WORKERS
+        ),
+        True,
+    )
     try:
-        parsed_args = parse_args()
+        daemon_serve(
+            DAEMON_SOCKET,
+            daemon_job,
+            DAEMON_QUEUE_SIZE,
+            daemon_job_check,
+            DAEMON_WORKERS,
+            daemon_worker_init,
+        )
+    except KeyboardInterrupt:
+        emit_info("template-ops daemon stopped")
+    finally:
+        for dev in dev_pool.values():
+            try:
+                dev.close()
+            except Exception:
+                pass
+        dev_pool.clear()
+
+
+def main(argv=None):
+    global result_writer
+    # --output to stdout moves table/info output to stderr until main returns
+    output_redirect = ExitStack()
+    try:
+        parsed_args = parse_args(argv)
 
         global debug
         debug = parsed_args.debug
         if debug in ["yes", "1", "enable", "on"]:
             debug = True
+        global result_stream, result_summary
+        result_stream = parsed_args.stream in ["yes", "1", "enable", "on"]
+        result_summary = parsed_args.summary in ["yes", "1", "enable", "on"]
+        # thin client, output streamed from daemon job
+        if parsed_args.client:
+            job_argv = client_argv(argv or sys.argv[1:], parsed_args.output_file)
+            if client_submit(DAEMON_SOCKET, job_argv):
+                return
+            emit_info(
+                "no template-ops daemon on {socket}, running locally".format(
+                    socket=DAEMON_SOCKET
+                ),
+                False,
+            )
+        if parsed_args.output:
+            result_writer = ResultWriter(parsed_args.output, parsed_args.output_file)
+            if not parsed_args.output_file:
+                output_redirect.enter_context(redirect_stdout(sys.stderr))
+        # inventory files extend template_ops_conf profiles before any list/show/run
+        inventory_get()
+        if parsed_args.daemon:
+            daemon()
         # bad option for single device or multi
-        if not (
+        elif not (
             parsed_args.template and parsed_args.template_vars and parsed_args.input
         ) and not (
             parsed_args.profile
             or parsed_args.mprofile
+            or parsed_args.sequence
             or parsed_args.show_profile
             or parsed_args.show_mprofile
             or parsed_args.show_template
             or parsed_args.list_profile
             or parsed_args.list_mprofile
             or parsed_args.list_template
+            or parsed_args.list_archive
+            or parsed_args.build_bundle
+            or parsed_args.deploy
         ):
             print_help()
         # exclusive options
@@ -1350,15 +2486,51 @@ def main():
 
         elif parsed_args.show_template:
             show_template(parsed_args.show_template)
+
+        elif parsed_args.list_archive:
+            list_archive(parsed_args.list_archive, parsed_args.since, parsed_args.until)
+
+        elif parsed_args.build_bundle:
+            bundle(parsed_args.build_bundle)
+
+        elif parsed_args.deploy:
+            deploy(parsed_args.deploy)
+
+        elif parsed_args.rollback_to and parsed_args.profile:
+            rollback(parsed_args.profile, parsed_args.rollback_to)
+            archive_retention()
         # single device operation
         elif parsed_args.template and parsed_args.template_vars and parsed_args.input:
             timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            if RESULT_STORE_ENABLE:
+                store_init(RESULT_STORE_PATH)
+            started = time()
+            first_row = len(template_thread_data)
             template_thread(parsed_args, False, parsed_args.profile, None, timestamp)
-            print_results()
+            if result_writer:
+                for row in template_thread_data[first_row:]:
+                    write_result(
+                        row,
+                        None,
+                        started,
+                        # diff row is ["diff", diff]
+                        device=parsed_args.diff_target if row[0] == "diff" else None,
+                        template=parsed_args.template,
+                    )
+            else:
+                print_results()
+            archive_retention()
+            store_write(
+                RUN_ID,
+                None,
+                store_rows(
+                    template_thread_data[first_row:], None, parsed_args.template
+                ),
+            )
         # multi device operations
-        elif (parsed_args.profile or parsed_args.mprofile) and not (
-            parsed_args.template or parsed_args.template_vars
-        ):
+        elif (
+            parsed_args.profile or parsed_args.mprofile or parsed_args.sequence
+        ) and not (parsed_args.template or parsed_args.template_vars):
             by_index = True
             try:
 
@@ -1384,8 +2556,11 @@ def main():
                 by_index = False
             finally:
                 run_profiles = []
+                # profile sequence
+                if parsed_args.sequence:
+                    run_profiles = sequence_profiles(parsed_args.sequence)
                 # multi profile
-                if parsed_args.mprofile:
+                elif parsed_args.mprofile:
                     if parsed_args.mprofile in template_ops_conf.multi_profiles:
                         for push_profile in multi_profiles[parsed_args.mprofile][
                             "push_profiles"
@@ -1413,66 +2588,23 @@ def main():
                             True,
                         )
 
-                # common execucution for profile/mprofile
-                for profile_dict in run_profiles:
-                    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-                    for key, value in profile_dict.items():
-                        profile = key
-                    profile_dev = getattr(template_ops_conf, profile)
-                    if "default" in profile_dev.keys():
-                        nr_profile_devices = len(profile_dev) - 1
-                    else:
-                        nr_profile_devices = len(profile_dev)
-
-                    # MAX_PROFILE_DEV check
-                    if nr_profile_devices > template_ops_conf.MAX_PROFILE_DEV:
-                        emit_info(
-                            "{profile} profile number of targets ({profile_dev}) > MAX_PROFILE_DEV ({MAX_PROFILE_DEV}) setting".format(
-                                profile_dev=profile_dev,
-                                MAX_PROFILE_DEV=template_ops_conf.MAX_PROFILE_DEV,
-                                profile=profile,
-                            ),
-                            True,
-                        )
-
-                    # proceed profile size less than MAX_PROFILE_DEV
-                    else:
-                        # pre-pause for defined time, meant for mprofile
-                        sleep(profile_dict[profile].get("pre-delay", 0))
-
-                        for device in getattr(template_ops_conf, profile):
-                            # exclude default profile
-                            if not device in ["default"]:
-                                thread = Thread(
-                                    target=template_thread,
-                                    args=(
-                                        parsed_args,
-                                        True,
-                                        profile,
-                                        device,
-                                        timestamp,
-                                    ),
-                                )
-                                threads.append(thread)
-                                thread.start()
-
-                        for thread in threads:
-                            thread.join()
-
-                        # post-pause for defined time, meant for mprofile
-                        sleep(profile_dict[profile].get("post-delay", 0))
-
-                        print_results()
-
-                        # remove simple string output to avoid repeated print with mprofile in print_results
-                        for data in template_thread_data:
-                            if type(data[1]) not in [dict, list]:
-                                data[1] = ""
+                if RESULT_STORE_ENABLE:
+                    store_init(RESULT_STORE_PATH)
+                if parsed_args.every:
+                    watch(parsed_args, run_profiles)
+                else:
+                    run_profile_steps(parsed_args, run_profiles)
+                    archive_retention()
 
     except Exception:
         traceback_msg = str(traceback.format_exc())
         emit_info(traceback_msg, debug)
         emit_info("Error during execution, use debug on/see log", not debug, not debug)
+    finally:
+        output_redirect.close()
+        if result_writer:
+            result_writer.close()
+            result_writer = None
 
 
 if __name__ == "__main__":
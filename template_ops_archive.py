@@ -0,0 +1,548 @@
+# content-addressed archive, each unique j2/set/py content is stored once as compressed blob
+#
+# <archive>/blobs/<sha256[:2]>/<sha256>.gz|.xz   compressed content
+# <archive>/manifests/<run>.ndjson               one line per archived item of the run (timestamp)
+# <archive>/segments/<first run>__<last run>.tar.xz  runs beyond retention, manifests + referenced content
+# <archive>/catalog.db                           index of archived items for both backends
+# <archive>/.lock                                flock of writers and compaction across processes
+
+# compression, tar and sqlite3 modules are imported by the functions using them, archive writes and
+# queries are not on the startup path of listing/showing commands
+import fcntl
+import hashlib
+import io
+import json
+import os
+import queue
+import re
+import threading
+import traceback
+from contextlib import contextmanager
+
+# threads of the process, flock of ARCHIVE_LOCK_FILE serializes other processes (cron, watch, daemon)
+archive_lock = threading.Lock()
+ARCHIVE_LOCK_FILE = ".lock"
+
+COMPRESSION_SUFFIX = {"gzip": ".gz", "lzma": ".xz"}
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalog (
+    timestamp TEXT,
+    run_id TEXT,
+    device TEXT,
+    template TEXT,
+    kind TEXT,
+    md5 TEXT,
+    size INTEGER,
+    name TEXT,
+    blob TEXT,
+    compression TEXT
+);
+CREATE INDEX IF NOT EXISTS catalog_device ON catalog (device, timestamp);
+CREATE INDEX IF NOT EXISTS catalog_timestamp ON catalog (timestamp);
+CREATE INDEX IF NOT EXISTS catalog_name ON catalog (name);
+"""
+# item already indexed by catalog creation of another process is skipped, last ? is the name
+CATALOG_INSERT = """
+INSERT INTO catalog SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
+WHERE NOT EXISTS (SELECT 1 FROM catalog WHERE name = ?)
+"""
+CATALOG_COLUMNS = [
+    "timestamp",
+    "run_id",
+    "device",
+    "template",
+    "kind",
+    "md5",
+    "size",
+    "name",
+    "blob",
+    "compression",
+]
+# timestamp__template__device.kind
+ARCHIVE_NAME_RE = re.compile(r"^(\d{8}-\d{6})__(.+)__(.+?)\.(j2|set|py\.j2|py)$")
+
+
+@contextmanager
+def archive_locked(archive_path):
+    # manifest appends and compaction, flock is released by the OS when holder process dies
+    with archive_lock:
+        os.makedirs(archive_path, exist_ok=True)
+        with open(os.path.join(archive_path, ARCHIVE_LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def blob_path(archive_path, blob_hash, compression):
+    return os.path.join(
+        archive_path,
+        "blobs",
+        blob_hash[:2],
+        blob_hash + COMPRESSION_SUFFIX[compression],
+    )
+
+
+def blob_compress(data, compression="gzip"):
+    if compression == "lzma":
+        import lzma
+
+        return lzma.compress(data)
+    import gzip
+
+    return gzip.compress(data)
+
+
+def archive_blob(archive_path, data, compression="gzip", compressed=None):
+    # store data once under its hash, returns the hash, caller holds archive_locked() so compaction
+    # can't remove the blob before its manifest entry is written
+    if isinstance(data, str):
+        data = data.encode()
+    blob_hash = hashlib.sha256(data).hexdigest()
+    path = blob_path(archive_path, blob_hash, compression)
+    if not os.path.isfile(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if compressed is None:
+            compressed = blob_compress(data, compression)
+        tmp_path = "{path}.{pid}".format(path=path, pid=os.getpid())
+        with open(tmp_path, "wb") as f:
+            f.write(compressed)
+        os.replace(tmp_path, path)
+    return blob_hash
+
+
+def archive_manifest_add(archive_path, run, entry):
+    # entry: {"name": ..., "blob": ..., "size": ..., ...}, name follows timestamp__template__device.ext,
+    # caller holds archive_locked()
+    manifest_dir = os.path.join(archive_path, "manifests")
+    os.makedirs(manifest_dir, exist_ok=True)
+    with open(os.path.join(manifest_dir, run + ".ndjson"), "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def archive_item(archive_path, run, name, data, compression="gzip", **details):
+    # blob + manifest entry, details (device, template, ...) are kept in the manifest
+    # blob check/write and manifest append under one lock, compaction in between would remove the
+    # blob as unreferenced, new content is compressed before taking the lock
+    if isinstance(data, str):
+        data = data.encode()
+    compressed = None
+    if not os.path.isfile(
+        blob_path(archive_path, hashlib.sha256(data).hexdigest(), compression)
+    ):
+        compressed = blob_compress(data, compression)
+    with archive_locked(archive_path):
+        entry = {
+            "name": name,
+            "blob": archive_blob(archive_path, data, compression, compressed),
+            "size": len(data),
+            "compression": compression,
+        }
+        entry.update(details)
+        archive_manifest_add(archive_path, run, entry)
+    return entry
+
+
+def manifest_entries(manifest_file):
+    with open(manifest_file) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def archive_runs(archive_path):
+    # runs with live manifests, oldest first (run ids are sortable timestamps)
+    manifest_dir = os.path.join(archive_path, "manifests")
+    if not os.path.isdir(manifest_dir):
+        return []
+    return sorted(
+        manifest[: -len(".ndjson")]
+        for manifest in os.listdir(manifest_dir)
+        if manifest.endswith(".ndjson")
+    )
+
+
+def blob_read(archive_path, entry):
+    path = blob_path(archive_path, entry["blob"], entry.get("compression", "gzip"))
+    with open(path, "rb") as f:
+        if entry.get("compression") == "lzma":
+            import lzma
+
+            return lzma.decompress(f.read())
+        import gzip
+
+        return gzip.decompress(f.read())
+
+
+def archive_compact(archive_path, keep_runs, segment_runs, keep_segments=0):
+    # pack runs older than the newest keep_runs into tar.xz segments of segment_runs runs,
+    # then drop their manifests and blobs no longer referenced by any live manifest,
+    # keep_segments > 0 removes the oldest segments beyond that count and their catalog entries
+    import tarfile
+
+    with archive_locked(archive_path):
+        runs = archive_runs(archive_path)
+        old_runs = runs[: max(len(runs) - keep_runs, 0)]
+        # only full segments, the remainder waits for next compaction
+        old_runs = old_runs[: len(old_runs) - len(old_runs) % segment_runs]
+        if not old_runs:
+            return 0
+
+        manifest_dir = os.path.join(archive_path, "manifests")
+        segment_dir = os.path.join(archive_path, "segments")
+        os.makedirs(segment_dir, exist_ok=True)
+
+        for first in range(0, len(old_runs), segment_runs):
+            segment = old_runs[first : first + segment_runs]
+            segment_file = os.path.join(
+                segment_dir, "{}__{}.tar.xz".format(segment[0], segment[-1])
+            )
+            tmp_file = segment_file + ".tmp"
+            packed_blobs = set()
+            with tarfile.open(tmp_file, "w:xz") as tar:
+                for run in segment:
+                    manifest_file = os.path.join(manifest_dir, run + ".ndjson")
+                    tar.add(manifest_file, arcname="manifests/" + run + ".ndjson")
+                    for entry in manifest_entries(manifest_file):
+                        if entry["blob"] in packed_blobs:
+                            continue
+                        packed_blobs.add(entry["blob"])
+                        # uncompressed inside, xz over the whole segment compresses across blobs
+                        data = blob_read(archive_path, entry)
+                        info = tarfile.TarInfo("blobs/" + entry["blob"])
+                        info.size = len(data)
+                        tar.addfile(info, io.BytesIO(data))
+            os.replace(tmp_file, segment_file)
+            for run in segment:
+                os.remove(os.path.join(manifest_dir, run + ".ndjson"))
+
+        # blobs referenced by live manifests survive
+        live_blobs = set()
+        for run in archive_runs(archive_path):
+            for entry in manifest_entries(os.path.join(manifest_dir, run + ".ndjson")):
+                live_blobs.add(entry["blob"])
+        blob_dir = os.path.join(archive_path, "blobs")
+        for prefix in os.listdir(blob_dir):
+            for blob_file in os.listdir(os.path.join(blob_dir, prefix)):
+                if blob_file.split(".")[0] not in live_blobs:
+                    os.remove(os.path.join(blob_dir, prefix, blob_file))
+            if not os.listdir(os.path.join(blob_dir, prefix)):
+                os.rmdir(os.path.join(blob_dir, prefix))
+
+        if keep_segments:
+            segments = sorted(
+                segment
+                for segment in os.listdir(segment_dir)
+                if segment.endswith(".tar.xz")
+            )
+            for segment in segments[: max(len(segments) - keep_segments, 0)]:
+                os.remove(os.path.join(segment_dir, segment))
+                first_run, last_run = segment[: -len(".tar.xz")].split("__")
+                catalog_prune(archive_path, first_run, last_run)
+
+        return len(old_runs)
+
+
+def fsync_path(path):
+    # file content or directory entries to disk
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class ArchiveWriter:
+    # background archive writes, device threads queue items and return right after commit/exec,
+    # files written (paths returned by write function) and their directories are fsynced and catalog
+    # rows inserted once per flush (end of run) instead of per item, sqlite syncs the catalog itself
+    def __init__(self, on_error):
+        self.on_error = on_error
+        self.queue = queue.Queue()
+        self.thread = None
+        self.thread_lock = threading.Lock()
+        # paths to fsync at next flush, only the writer thread uses it
+        self.written = set()
+        # archive path -> catalog rows of items written since last flush
+        self.catalog_rows = {}
+        self.catalog_lock = threading.Lock()
+
+    def put(self, write_func, *vargs, **kvargs):
+        with self.thread_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+        self.queue.put((write_func, vargs, kvargs))
+
+    def run(self):
+        while True:
+            write_func, vargs, kvargs = self.queue.get()
+            try:
+                # flush marker, write_func is the Event to set
+                if isinstance(write_func, threading.Event):
+                    written, self.written = self.written, set()
+                    # files before the directories holding their entries
+                    for path in sorted(written, key=os.path.isdir):
+                        try:
+                            fsync_path(path)
+                        except OSError:
+                            self.on_error(str(traceback.format_exc()))
+                    self.catalog_flush()
+                    write_func.set()
+                else:
+                    self.written.update(write_func(*vargs, **kvargs) or [])
+            except Exception:
+                self.on_error(str(traceback.format_exc()))
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        # wait for queued writes and sync them, called at end of run and at exit
+        if self.thread is not None:
+            flushed = threading.Event()
+            self.queue.put((flushed, (), {}))
+            flushed.wait()
+        else:
+            # synchronous writes, only catalog rows are pending
+            self.catalog_flush()
+
+    def catalog_put(self, archive_path, row):
+        # row of catalog_row(), inserted with the other rows of the run by flush()
+        with self.catalog_lock:
+            self.catalog_rows.setdefault(archive_path, []).append(row)
+
+    def catalog_flush(self):
+        with self.catalog_lock:
+            catalog_rows, self.catalog_rows = self.catalog_rows, {}
+        for archive_path, rows in catalog_rows.items():
+            try:
+                catalog_add(archive_path, rows)
+            except Exception:
+                self.on_error(str(traceback.format_exc()))
+
+
+def archive_content_save(
+    settings,
+    writer,
+    run_id,
+    save_path,
+    timestamp,
+    template_file,
+    push_target,
+    suffix,
+    data,
+):
+    # timestamp__template__device<suffix>, as file (ARCHIVE_BACKEND files) or as manifest entry
+    # pointing to content-addressed compressed blob (ARCHIVE_BACKEND cas), catalog row queued in writer,
+    # returns files and directories written, synced by the writer at flush
+    name = timestamp + "__" + template_file + "__" + push_target + suffix
+    if isinstance(data, str):
+        data = data.encode()
+    if settings.ARCHIVE_BACKEND == "cas":
+        entry = archive_item(
+            save_path,
+            timestamp,
+            name,
+            data,
+            settings.ARCHIVE_COMPRESSION,
+            device=push_target,
+            template=template_file,
+        )
+        blob = entry["blob"]
+        blob_file = blob_path(save_path, blob, settings.ARCHIVE_COMPRESSION)
+        manifest_file = os.path.join(save_path, "manifests", timestamp + ".ndjson")
+        written = [
+            blob_file,
+            os.path.dirname(blob_file),
+            os.path.dirname(os.path.dirname(blob_file)),
+            manifest_file,
+            os.path.dirname(manifest_file),
+            save_path,
+        ]
+    else:
+        with open(save_path + "/" + name, "wb") as f:
+            f.write(data)
+        blob = None
+        written = [save_path + "/" + name, save_path]
+    # catalog of archived items for --list-archive and --rollback-to
+    if settings.ARCHIVE_CATALOG_ENABLE:
+        writer.catalog_put(
+            save_path,
+            catalog_row(name, data, run_id, blob, settings.ARCHIVE_COMPRESSION),
+        )
+    return written
+
+
+def archive_content_put(
+    settings,
+    writer,
+    run_id,
+    save_path,
+    timestamp,
+    template_file,
+    push_target,
+    suffix,
+    source_file=None,
+    data=None,
+):
+    # archive hook of template-ops.py and template_ops_engine.py, queued in writer (ARCHIVE_ASYNC_ENABLE)
+    # or written now, template file is read now, it may be edited before the queued write runs
+    if source_file:
+        with open(source_file, "rb") as f:
+            data = f.read()
+    vargs = (
+        settings,
+        writer,
+        run_id,
+        save_path,
+        timestamp,
+        template_file,
+        push_target,
+        suffix,
+        data,
+    )
+    if settings.ARCHIVE_ASYNC_ENABLE:
+        writer.put(archive_content_save, *vargs)
+    else:
+        archive_content_save(*vargs)
+
+
+def catalog_connect(archive_path, adding=()):
+    # first use indexes items archived before the catalog existed (except names being added), built under
+    # archive lock in temp file and moved in place, other processes never see half-built catalog
+    import sqlite3
+
+    path = os.path.join(archive_path, "catalog.db")
+    if not os.path.isfile(path):
+        with archive_locked(archive_path):
+            if not os.path.isfile(path):
+                tmp_path = "{path}.{pid}".format(path=path, pid=os.getpid())
+                db = sqlite3.connect(tmp_path)
+                try:
+                    db.executescript(CATALOG_SCHEMA)
+                    with db:
+                        db.executemany(
+                            "INSERT INTO catalog VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            [
+                                row
+                                for row in catalog_scan(archive_path)
+                                if row[7] not in adding
+                            ],
+                        )
+                finally:
+                    db.close()
+                os.replace(tmp_path, path)
+    return sqlite3.connect(path, timeout=30)
+
+
+def catalog_row(name, data, run_id=None, blob=None, compression=None):
+    timestamp, template, device, kind = ARCHIVE_NAME_RE.match(name).groups()
+    return (
+        timestamp,
+        run_id,
+        device,
+        template,
+        kind,
+        hashlib.md5(data).hexdigest(),
+        len(data),
+        name,
+        blob,
+        compression,
+    )
+
+
+def catalog_scan(archive_path):
+    # existing archive files and live cas manifests
+    rows = []
+    for name in os.listdir(archive_path):
+        if ARCHIVE_NAME_RE.match(name):
+            with open(os.path.join(archive_path, name), "rb") as f:
+                rows.append(catalog_row(name, f.read()))
+    for run in archive_runs(archive_path):
+        manifest_file = os.path.join(archive_path, "manifests", run + ".ndjson")
+        for entry in manifest_entries(manifest_file):
+            if ARCHIVE_NAME_RE.match(entry["name"]):
+                rows.append(
+                    catalog_row(
+                        entry["name"],
+                        blob_read(archive_path, entry),
+                        blob=entry["blob"],
+                        compression=entry["compression"],
+                    )
+                )
+    return rows
+
+
+def catalog_add(archive_path, rows):
+    # rows of catalog_row() in one transaction, one connection per writer flush
+    db = catalog_connect(archive_path, {row[7] for row in rows})
+    try:
+        with db:
+            # catalogs created before the name index
+            db.execute("CREATE INDEX IF NOT EXISTS catalog_name ON catalog (name)")
+            db.executemany(CATALOG_INSERT, [row + (row[7],) for row in rows])
+    finally:
+        db.close()
+
+
+def catalog_prune(archive_path, first_run, last_run):
+    # cas items of removed segment, runs are archive timestamps, files backend items are never pruned
+    import sqlite3
+
+    path = os.path.join(archive_path, "catalog.db")
+    if not os.path.isfile(path):
+        return
+    db = sqlite3.connect(path, timeout=30)
+    try:
+        with db:
+            db.execute(
+                "DELETE FROM catalog WHERE blob IS NOT NULL AND timestamp >= ? AND timestamp <= ?",
+                (first_run, last_run),
+            )
+    finally:
+        db.close()
+
+
+def catalog_query(
+    archive_path, device=None, template=None, kind=None, since=None, until=None
+):
+    # range query on timestamp (archive timestamp format, prefix like 20241001 works too), oldest first
+    query = "SELECT * FROM catalog WHERE 1 = 1"
+    params = []
+    for column, value in [("device", device), ("template", template), ("kind", kind)]:
+        if value is not None:
+            query += " AND {column} = ?".format(column=column)
+            params.append(value)
+    if since is not None:
+        query += " AND timestamp >= ?"
+        params.append(since)
+    if until is not None:
+        # "20241001" includes the whole day, "~" sorts after any timestamp character
+        query += " AND timestamp <= ?"
+        params.append(until + "~")
+    query += " ORDER BY timestamp"
+    db = catalog_connect(archive_path)
+    try:
+        return [dict(zip(CATALOG_COLUMNS, row)) for row in db.execute(query, params)]
+    finally:
+        db.close()
+
+
+def archive_read(archive_path, entry):
+    # content of catalog entry, plain file, live blob or blob packed in segment
+    if not entry["blob"]:
+        with open(os.path.join(archive_path, entry["name"]), "rb") as f:
+            return f.read()
+    if os.path.isfile(blob_path(archive_path, entry["blob"], entry["compression"])):
+        return blob_read(archive_path, entry)
+    import tarfile
+
+    segment_dir = os.path.join(archive_path, "segments")
+    for segment in sorted(os.listdir(segment_dir), reverse=True):
+        if segment.endswith(".tar.xz"):
+            with tarfile.open(os.path.join(segment_dir, segment)) as tar:
+                try:
+                    return tar.extractfile("blobs/" + entry["blob"]).read()
+                except KeyError:
+                    pass
+    raise FileNotFoundError("archived content {} not found".format(entry["name"]))
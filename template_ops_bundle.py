@@ -0,0 +1,154 @@
+# deployment bundle, one zip with the template_ops modules, precompiled Jinja2 templates and manifest
+#
+# template_ops_*.py, *.pyc       modules, zip-imported on-box (pyc used when built by the same Python version),
+#                                except user edited settings/vars generators (BUNDLE_EXCLUDE), always read from files
+# templates/tmpl_<sha1>.py, .pyc  templates compiled to Jinja2 module code (ModuleLoader layout)
+# bundle.json                    versions, sha256 of members, md5 of template sources
+
+import hashlib
+import importlib.util
+import json
+import marshal
+import os
+import pathlib
+import sys
+import zipimport
+from datetime import datetime
+
+BUNDLE_MANIFEST = "bundle.json"
+BUNDLE_TEMPLATE_DIR = "templates"
+# edited on-box, bundled copy would shadow the edits
+BUNDLE_EXCLUDE = ["template_ops_conf.py", "template_ops_vars.py"]
+
+
+def bundle_modules(script_dir):
+    # module files packed into the bundle
+    return [
+        module_file
+        for module_file in sorted(pathlib.Path(script_dir).glob("template_ops_*.py"))
+        if module_file.name not in BUNDLE_EXCLUDE
+    ]
+
+
+def pyc_data(source, filename):
+    # unchecked hash-based pyc, valid regardless of zip member mtimes
+    code = compile(source, filename, "exec", dont_inherit=True)
+    return (
+        importlib.util.MAGIC_NUMBER
+        + (0b01).to_bytes(4, "little")
+        + importlib.util.source_hash(source)
+        + marshal.dumps(code)
+    )
+
+
+def build_bundle(bundle_path, module_files, template_path, ver, filters=None):
+    # returns manifest, templates failing to compile are reported in manifest "errors" and left out,
+    # filters must match the on-box environment, Jinja2 checks filter names at compile time
+    import jinja2
+    import zipfile
+
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader(template_path))
+    env.filters.update(filters or {})
+    manifest = {
+        "ver": ver,
+        "built": datetime.now().strftime("%Y%m%d-%H%M%S"),
+        "python": "{}.{}".format(*sys.version_info[:2]),
+        "jinja2": jinja2.__version__,
+        "files": {},
+        "templates": {},
+        "errors": {},
+    }
+    members = {}
+
+    for module_file in module_files:
+        with open(module_file, "rb") as f:
+            source = f.read()
+        name = os.path.basename(module_file)
+        members[name] = source
+        members[name[: -len(".py")] + ".pyc"] = pyc_data(source, name)
+
+    for template_name in env.list_templates(extensions=["j2"]):
+        with open(os.path.join(template_path, template_name), "rb") as f:
+            source = f.read()
+        try:
+            # same as Environment.compile_templates(), defer_init binds environment at load
+            code = env.compile(
+                source.decode(), template_name, template_name, raw=True, defer_init=True
+            ).encode()
+        except jinja2.TemplateSyntaxError as e:
+            manifest["errors"][template_name] = str(e)
+            continue
+        module_name = "{dir}/{key}".format(
+            dir=BUNDLE_TEMPLATE_DIR,
+            key=jinja2.ModuleLoader.get_template_key(template_name),
+        )
+        members[module_name + ".py"] = code
+        members[module_name + ".pyc"] = pyc_data(code, template_name)
+        manifest["templates"][template_name] = hashlib.md5(source).hexdigest()
+
+    for name, data in members.items():
+        manifest["files"][name] = hashlib.sha256(data).hexdigest()
+
+    # written next to target and renamed, running scripts never see partial bundle
+    tmp_path = "{path}.{pid}".format(path=bundle_path, pid=os.getpid())
+    with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as bundle:
+        for name, data in members.items():
+            bundle.writestr(name, data)
+        bundle.writestr(BUNDLE_MANIFEST, json.dumps(manifest, indent=1))
+    os.replace(tmp_path, bundle_path)
+    return manifest
+
+
+def bundle_manifest(bundle_path):
+    # zipimport is loaded by the interpreter already, zipfile is not needed on-box
+    return json.loads(zipimport.zipimporter(bundle_path).get_data(BUNDLE_MANIFEST))
+
+
+def bundle_stale(bundle_path, module_files):
+    # on-box the bundle shadows module files, it must not be deployed or loaded older than them
+    files = bundle_manifest(bundle_path)["files"]
+    for module_file in module_files:
+        with open(module_file, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        if files.get(os.path.basename(module_file)) != digest:
+            return True
+    return False
+
+
+def bundle_loader(bundle_path, manifest, template_path, template_md5):
+    # compiled templates from bundle, template source changed on disk since build (md5 differs) or
+    # bundle built with other Jinja2 version falls back to file system loader
+    import jinja2
+
+    file_loader = jinja2.FileSystemLoader(searchpath=template_path)
+    if manifest.get("jinja2") != jinja2.__version__:
+        return file_loader
+
+    class BundleModuleLoader(jinja2.ModuleLoader):
+        def load(self, environment, name, globals=None):
+            bundle_md5 = manifest["templates"].get(name)
+            template_file = os.path.join(template_path, name)
+            if bundle_md5 is None or (
+                os.path.isfile(template_file)
+                and template_md5(template_file) != bundle_md5
+            ):
+                raise jinja2.TemplateNotFound(name)
+            template = super().load(environment, name, globals)
+
+            # environment cache re-checks it (auto_reload), template edited while watch mode/daemon
+            # runs is loaded from file by next get_template()
+            def uptodate():
+                return not (
+                    os.path.isfile(template_file)
+                    and template_md5(template_file) != bundle_md5
+                )
+
+            template._uptodate = uptodate
+            return template
+
+    return jinja2.ChoiceLoader(
+        [
+            BundleModuleLoader(os.path.join(bundle_path, BUNDLE_TEMPLATE_DIR)),
+            file_loader,
+        ]
+    )
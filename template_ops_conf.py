@@ -13,6 +13,11 @@ TEMPLATE_SEARCH_PATH = PATH + 'xtemplate'
 MAX_PROFILE_DEV = 16
 COMMIT_TIMEOUT = 30
 
+# rendered set commands optimized before load (blank/duplicate lines, lines subsumed by later deletes)
+SET_OPTIMIZE_ENABLE = 1
+# regular pushes with at least this many set lines are loaded as hierarchical text, set on load error, 0 disables
+SET_TEXT_MIN_LINES = 5000
+
 SAVE_COMMIT_J2_ENABLE = 1
 SAVE_COMMIT_CFG_ENABLE = 1
 SAVE_EXEC_J2_ENABLE = 1
@@ -21,6 +26,60 @@ SAVE_PATH_COMMIT_J2 =  PATH + 'xarchive'
 SAVE_PATH_COMMIT_CFG = PATH + 'xarchive'
 SAVE_PATH_EXEC_J2 = PATH + 'xarchive'
 SAVE_PATH_EXEC_PY = PATH + 'xarchive'
+# archive backend: 'files' one file per archived item, 'cas' content-addressed compressed blobs + per-run manifests
+ARCHIVE_BACKEND = 'files'
+# archive writes done by background writer, synced once per run
+ARCHIVE_ASYNC_ENABLE = 1
+# catalog.db index of archived items in archive folder (--list-archive, --rollback-to)
+ARCHIVE_CATALOG_ENABLE = 1
+# 'gzip' or 'lzma' for cas blobs
+ARCHIVE_COMPRESSION = 'gzip'
+# cas retention: newest runs kept as manifests/blobs, older runs packed into tar.xz segments of ARCHIVE_SEGMENT_RUNS runs
+ARCHIVE_KEEP_RUNS = 100
+ARCHIVE_SEGMENT_RUNS = 50
+# segments kept, 0 keeps all
+ARCHIVE_KEEP_SEGMENTS = 0
+
+# YAML/JSON inventory files extending profiles/groups/auth_profiles below, merged index cached when files are used
+INVENTORY_PATH = PATH + 'xinventory'
+INVENTORY_CACHE_PATH = PATH + 'inventory.cache'
+
+# --deploy hosts (auth_profiles names) running template-ops on-box, remote script folder
+DEPLOY_TARGET_LIST = ['vmx-01']
+DEPLOY_PATH = '/var/db/scripts/op/'
+
+# template md5s keyed on (path, inode, size, mtime_ns) kept in sidecar file across runs
+MD5_CACHE_SIDECAR_ENABLE = 1
+MD5_CACHE_PATH = PATH + 'md5cache.json'
+
+# TCP pre-probe of profile devices before device threads start, unreachable devices are skipped,
+# results kept PROBE_TTL[s] across mprofile steps and watch mode iterations
+PROBE_ENABLE = 1
+PROBE_TIMEOUT = 2
+PROBE_TTL = 30
+
+# --stream progress line refresh[s]
+STREAM_INTERVAL = 0.5
+
+# --daemon UNIX socket for --client jobs, jobs waiting beyond DAEMON_QUEUE_SIZE are rejected
+DAEMON_SOCKET = PATH + 'template-ops.sock'
+DAEMON_QUEUE_SIZE = 16
+# --daemon jobs run in parallel, > 1 forks worker processes, each with own inventory, templates and sessions
+DAEMON_WORKERS = 1
+
+# RPC reply memoization for read-only exec templates (opt-in), replies are reused within TTL[s] during the run
+RPC_CACHE_ENABLE = 0
+RPC_CACHE_TTL = 60
+# static data only, counter/state templates (sessions, load, filter, bgp, alarm, ...) must query the device every run
+RPC_CACHE_TEMPLATE_LIST = ['version']
+# streaming SAX parse of RPC replies with filter_xml (rpc_fields() in exec templates), requires PyEZ use_filter support
+RPC_SAX_FILTER_ENABLE = 1
+
+# samples of exec result_adv kept per device/template for rates in repeated runs (watch mode), 0 disables
+RESULT_HISTORY_SIZE = 360
+# exec/profile results written to SQLite per step, queried by templates with results_query()
+RESULT_STORE_ENABLE = 0
+RESULT_STORE_PATH = PATH + 'results.db'
 
 # groups
 vsrx = { 'vsrx-01':{}, 'vsrx-02':{}, 'vsrx-03':{}, 'vsrx-04':{}, }
@@ -38,6 +97,7 @@ push_profiles = {
   'sessions':      { 'comment':['retrieve sessions for specific source IP'] }, 
   'pl_1_add_json': { 'comment':['loads prefix list pl-1 into eph instance pl, json fmt'] },
   'pl_1_add_set':  { 'comment':['loads prefix list pl-1 into eph instance pl, set fmt'] },
+  'pl_1_add_shard':{ 'comment':['loads prefix list pl-1 split over eph instances pl-0..pl-3, set fmt'] },
   'pl_1_del':      { 'comment':['empty prefix list pl-1 in ephemeral instance pl'] },
   'filter':        { 'comment':['displays counters from FF counters'] },
   'version':       { 'comment':['show Junos versions'] },
@@ -187,6 +247,15 @@ pl_1_add_set = {
   'vsrx-04':{},
 }
 
+# eph_shards: [shards] or [shards, key tokens], prefix-list entries only (order-insensitive), [4, 3] keeps each list in one instance
+pl_1_add_shard = {
+  'default':{ 'template_vars':['vsrx'], 'template':['pl_1_add_shard'], 'input':['1'], 'eph_inst':['pl','set'], 'eph_shards':[4] },
+  'vsrx-01':{},
+  'vsrx-02':{},
+  'vsrx-03':{},
+  'vsrx-04':{},
+}
+
 filter = {
   'default':{ 'template_vars':['exec1'], 'template':['filter'], 'input':['accept'], 'exec':[True], 'save_rendered_j2':[True, False] },
   'vsrx-01':{ },
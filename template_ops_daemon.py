@@ -0,0 +1,212 @@
+# template-ops daemon, jobs (command line arguments) submitted over local UNIX socket are queued and run
+# one by one in the daemon process, inventory, compiled templates and NETCONF sessions stay in memory
+# workers > 1 forks worker processes, jobs share module globals so parallel jobs need own processes,
+# each worker keeps own inventory, templates and sessions
+#
+# request: one JSON line {"argv": ["--profile", "version"]}
+# reply:   job output streamed as printed, connection closed when job is done
+# worker:  JSON lines, argv list to worker, {"output": text} ... {"done": true} back
+
+import json
+import os
+import queue
+import sys
+import threading
+import traceback
+
+
+class JobOutput:
+    # job stdout, client may disconnect while job runs, output is dropped then
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.connected = True
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        with self.lock:
+            if self.connected:
+                try:
+                    self.wfile.write(text.encode())
+                    self.wfile.flush()
+                except OSError:
+                    self.connected = False
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class WorkerOutput:
+    # job stdout of worker process, sent to daemon process which streams it to the client
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.lock = threading.Lock()
+
+    def send(self, message):
+        with self.lock:
+            self.wfile.write((json.dumps(message) + "\n").encode())
+            self.wfile.flush()
+
+    def write(self, text):
+        self.send({"output": text})
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def job_run(run_job, argv, out):
+    # job errors go to the client, worker keeps serving
+    try:
+        run_job(argv, out)
+    except Exception:
+        out.write(traceback.format_exc())
+
+
+def worker_fork(run_job, worker_init=None):
+    # returns (pid, daemon end of socketpair), forked worker runs jobs received over it until closed
+    import socket
+
+    daemon_end, worker_end = socket.socketpair()
+    pid = os.fork()
+    if pid:
+        worker_end.close()
+        return pid, daemon_end
+    daemon_end.close()
+    try:
+        if worker_init:
+            worker_init()
+        out = WorkerOutput(worker_end.makefile("wb"))
+        for line in worker_end.makefile("rb"):
+            job_run(run_job, json.loads(line), out)
+            out.send({"done": True})
+    except (KeyboardInterrupt, OSError):
+        pass
+    finally:
+        # never return into the daemon code of the parent
+        os._exit(0)
+
+
+def daemon_serve(
+    socket_path, run_job, queue_size, job_check=None, workers=1, worker_init=None
+):
+    # blocks, run_job(argv, out) runs in single worker thread or in worker processes (workers > 1),
+    # job_check(argv) returns rejection text or None, worker_init() runs first in each worker process
+    import signal
+    import socket
+    import socketserver
+
+    jobs = queue.Queue(maxsize=queue_size)
+
+    def worker():
+        while True:
+            argv, out, done = jobs.get()
+            try:
+                job_run(run_job, argv, out)
+            finally:
+                done.set()
+                jobs.task_done()
+
+    def worker_remote(pid, conn):
+        # feeds jobs to one worker process, streams its output
+        reader = conn.makefile("rb")
+        while True:
+            argv, out, done = jobs.get()
+            try:
+                conn.sendall((json.dumps(argv) + "\n").encode())
+                for line in reader:
+                    message = json.loads(line)
+                    if "output" not in message:
+                        break
+                    out.write(message["output"])
+                else:
+                    out.write("daemon worker {pid} exited\n".format(pid=pid))
+                    return
+            finally:
+                done.set()
+                jobs.task_done()
+
+    class JobHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            out = JobOutput(self.wfile)
+            try:
+                argv = json.loads(self.rfile.readline())["argv"]
+            except (ValueError, KeyError, TypeError):
+                out.write("invalid job request\n")
+                return
+            rejection = job_check(argv) if job_check else None
+            if rejection:
+                out.write(rejection + "\n")
+                return
+            done = threading.Event()
+            try:
+                jobs.put_nowait([argv, out, done])
+            except queue.Full:
+                out.write(
+                    "daemon job queue full ({size} jobs), try later\n".format(
+                        size=queue_size
+                    )
+                )
+                return
+            done.wait()
+
+    if os.path.exists(socket_path):
+        # stale socket of stopped daemon, running daemon still answers
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.connect(socket_path)
+            raise RuntimeError("daemon already running on " + socket_path)
+        except ConnectionRefusedError:
+            os.unlink(socket_path)
+
+    server = socketserver.ThreadingUnixStreamServer(socket_path, JobHandler)
+    server.daemon_threads = True
+    # jobs run with daemon user privileges, owner only
+    os.chmod(socket_path, 0o600)
+    worker_processes = []
+    try:
+        # forked before any thread starts
+        if workers > 1:
+            for _ in range(workers):
+                worker_processes.append(worker_fork(run_job, worker_init))
+            for pid, conn in worker_processes:
+                threading.Thread(
+                    target=worker_remote, args=(pid, conn), daemon=True
+                ).start()
+        else:
+            threading.Thread(target=worker, daemon=True).start()
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+        for pid, conn in worker_processes:
+            conn.close()
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except OSError:
+                pass
+
+
+def client_submit(socket_path, argv, out=None):
+    # streams job output to out (stdout), False when no daemon listens on socket_path
+    import socket
+
+    out = out or sys.stdout
+    try:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        client.close()
+        return False
+    with client:
+        client.sendall((json.dumps({"argv": argv}) + "\n").encode())
+        reader = client.makefile("rb")
+        try:
+            for line in reader:
+                out.write(line.decode())
+                out.flush()
+        except BrokenPipeError:
+            # reader of client output is gone (e.g. | head), job keeps running in daemon
+            pass
+    return True
@@ -0,0 +1,63 @@
+# external data sources for vars generators and exec templates, parsed once per process and shared
+# by device threads, cache is keyed on path and invalidated when size/mtime changes
+#
+# .yml/.yaml/.json  parsed document
+# .csv              rows as dicts (header line gives the keys)
+# other             lines
+
+import copy
+import json
+import os
+import threading
+
+# key: absolute path, value: [size, mtime_ns, data]
+data_cache = {}
+data_cache_lock = threading.Lock()
+# per path, threads asking for the same file wait for the first parse instead of parsing it too
+data_path_locks = {}
+
+
+def data_parse(path):
+    with open(path, newline="" if path.endswith(".csv") else None) as f:
+        if path.endswith((".yml", ".yaml")):
+            import yaml
+
+            # libyaml based loader parses several times faster when available
+            return yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+        if path.endswith(".json"):
+            return json.load(f)
+        if path.endswith(".csv"):
+            import csv
+
+            return list(csv.DictReader(f))
+        return f.read().splitlines()
+
+
+def data_load(path):
+    # data_load("xdata/data1.yml")["list1"], parsed once, every caller gets own copy of plain dicts/lists
+    # (tojson, json.dumps and append work, changes don't leak into other threads)
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    identity = [stat.st_size, stat.st_mtime_ns]
+    with data_cache_lock:
+        path_lock = data_path_locks.setdefault(path, threading.Lock())
+    with path_lock:
+        cached = data_cache.get(path)
+        if cached and cached[:2] == identity:
+            return copy.deepcopy(cached[2])
+        data = data_parse(path)
+        with data_cache_lock:
+            data_cache[path] = identity + [data]
+    return copy.deepcopy(data)
+
+
+def data_stream(path):
+    # one pass over very large csv/line files without keeping them in memory, nothing is cached
+    with open(path, newline="" if path.endswith(".csv") else None) as f:
+        if path.endswith(".csv"):
+            import csv
+
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                yield line.rstrip("\n")
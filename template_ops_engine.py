@@ -0,0 +1,489 @@
+# importable template-ops engine, render/diff/push/exec and profile/mprofile runs without argparse or
+# template-ops.py globals, each Engine keeps own settings (copy, inventory files are merged into it),
+# inventory, template environment, NETCONF sessions, archive writer and step data, engines in one
+# process don't share state
+#
+#   from template_ops_engine import Engine
+#   with Engine() as engine:
+#       print(engine.render("pl_1_add_set", "vsrx", "1"))
+#       record = engine.push("vsrx-01", "pl_1_add_set", "vsrx", "1", eph_inst=["pl", "set"])
+#       steps = engine.run_mprofile("sessions")
+#
+# records are dicts: device, template, operation (diff|push|exec), status (ok|error), message, diff,
+# result, result_adv, header, output (print() of exec template), seconds, archive_errors (queued
+# archive writes failed)
+# load, -del cmds re-try, sharding (template_ops_load.py, template_ops_shard.py), exec namespace
+# (template_ops_exec.py), archiving of pushed config/exec code (template_ops_archive.py, listed by
+# --list-archive, restored by --rollback-to) and the dead session check (template_ops_probe.py) are the
+# ones of template-ops.py, exec templates run in own namespace dict per device, "global result" doesn't
+# leak between threads, process-wide RPC cache and rate history of the CLI are not used, archive
+# retention (compaction) is left to CLI runs
+
+import threading
+import traceback
+from datetime import datetime
+from time import sleep, time
+
+import template_ops_conf
+from template_ops_archive import ArchiveWriter, archive_content_put
+from template_ops_exec import EXEC_RESULT_DEFAULT, exec_namespace, exec_step_row
+from template_ops_filters import TEMPLATE_FILTERS
+from template_ops_inventory import conf_copy, inventory_load
+from template_ops_load import config_push, del_cmds_remove, eph_settings
+from template_ops_probe import session_alive
+from template_ops_setcmd import set_optimize
+from template_ops_shard import shard_push, shard_status
+from template_ops_vars import (
+    DIFF_PUSH_ELIGIBLE_LIST,
+    TEMPLATE_VARS_SEQ_INPUT,
+    device_seq,
+    template_vars_range,
+)
+
+
+class Engine:
+    def __init__(self, settings=None, inventory=None, template_path=None, debug=False):
+        # settings: object with template_ops_conf names (default the module itself), used as copy,
+        # inventory: index as returned by inventory_load(), loaded from settings when not given
+        self.settings = conf_copy(settings or template_ops_conf)
+        if inventory is None:
+            inventory = inventory_load(
+                self.settings,
+                self.setting("INVENTORY_PATH"),
+                self.setting("INVENTORY_CACHE_PATH"),
+            )
+        self.inventory = inventory
+        self.template_path = template_path or self.setting("TEMPLATE_SEARCH_PATH")
+        self.debug = debug
+        self.template_env = None
+        self.template_env_lock = threading.Lock()
+        # device -> open Device, closed by close()
+        self.sessions = {}
+        self.sessions_lock = threading.Lock()
+        # [device, result(, result_adv, template)] rows of current run, template_thread_data of exec templates
+        self.step_data = []
+        # archive errors of queued writes, reported with the records of next flush
+        self.archive_errors = []
+        self.archive_writer = ArchiveWriter(self.archive_errors.append)
+        # archive timestamp of profile runs, one per run as CLI, single operations use their own
+        self.timestamp = None
+        # identifies archived items of this engine in the catalog
+        self.run_id = datetime.now().strftime("%Y%m%d-%H%M%S") + "-engine-" + str(id(self))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def setting(self, name, default=None):
+        return getattr(self.settings, name, default)
+
+    def close(self):
+        self.archive_writer.flush()
+        with self.sessions_lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+        for dev in sessions:
+            try:
+                dev.close()
+            except Exception:
+                pass
+
+    def environment(self):
+        import jinja2
+
+        with self.template_env_lock:
+            if self.template_env is None:
+                template_env = jinja2.Environment(
+                    loader=jinja2.FileSystemLoader(searchpath=self.template_path)
+                )
+                template_env.filters.update(TEMPLATE_FILTERS)
+                template_env.globals.update(TEMPLATE_FILTERS)
+                self.template_env = template_env
+        return self.template_env
+
+    def render(self, template, template_vars, _input):
+        # input range (1-64) renders one block per seq, same as CLI
+        template = self.environment().get_template(template + ".j2")
+        return "\n".join(
+            template.render(template_vars_for_render)
+            for template_vars_for_render in template_vars_range(template_vars, _input)
+        )
+
+    def session(self, device):
+        # one session per device kept for engine lifetime
+        with self.sessions_lock:
+            dev = self.sessions.get(device)
+        # device may have closed it since last use, re-opened then
+        if dev is not None and session_alive(dev):
+            return dev
+        dev = self.connect(device)
+        with self.sessions_lock:
+            self.sessions[device] = dev
+        return dev
+
+    def connect(self, device):
+        # new open session, local/localhost without SSH
+        from jnpr.junos import Device
+
+        if self.setting("RPC_SAX_FILTER_ENABLE"):
+            device_options = {"use_filter": True}
+        else:
+            device_options = {}
+        if device in ["local", "localhost"]:
+            dev = Device(gather_facts=False, **device_options)
+            dev.open()
+        else:
+            auth = self.inventory["auth"][device]
+            dev = Device(
+                user=auth["user"][0],
+                host=auth["host"][0],
+                port=auth["port"][0],
+                ssh_private_key_file=auth["ssh_key"][0],
+                gather_facts=False,
+                **device_options,
+            )
+            dev.open(auto_probe=2)
+        return dev
+
+    def diff(self, device, template, template_vars, _input, eph_inst=None):
+        return self.run("diff", device, template, template_vars, _input, eph_inst)
+
+    def push(
+        self, device, template, template_vars, _input, eph_inst=None, eph_shards=None
+    ):
+        return self.archive_flush(
+            [
+                self.run(
+                    "push", device, template, template_vars, _input, eph_inst, eph_shards
+                )
+            ]
+        )[0]
+
+    def exec(self, device, template, template_vars, _input):
+        return self.archive_flush(
+            [self.run("exec", device, template, template_vars, _input)]
+        )[0]
+
+    def record(self, device, template, operation):
+        return {
+            "device": device,
+            "template": template,
+            "operation": operation,
+            "status": "ok",
+            "message": "",
+            "diff": None,
+            "result": None,
+            "result_adv": None,
+            "header": None,
+            "output": "",
+            "seconds": 0.0,
+        }
+
+    def run(
+        self,
+        operation,
+        device,
+        template,
+        template_vars,
+        _input,
+        eph_inst=None,
+        eph_shards=None,
+        profile=None,
+    ):
+        # one record, errors are reported in it, not raised
+        started = time()
+        record = self.record(device, template, operation)
+        stage = "render"
+        try:
+            config = self.render(template, template_vars, _input)
+            if template_vars not in DIFF_PUSH_ELIGIBLE_LIST:
+                raise ValueError(
+                    "template vars {template_vars} not eligible for diff/push/exec".format(
+                        template_vars=template_vars
+                    )
+                )
+            if operation == "exec" and not self.setting("TEMPLATE_EXEC_ENABLE"):
+                raise ValueError("template execution not enabled")
+            stage = "connect"
+            dev = self.session(device)
+            stage = operation
+            if operation == "exec":
+                record.update(
+                    self.exec_template(dev, device, template, config, profile)
+                )
+                record["message"] = "exec completed"
+                record["message"] += self.archive(
+                    operation, device, template, config, profile
+                )
+            else:
+                record["diff"], removed_del_cmds, shard_msg, loaded = self.load(
+                    dev, device, config, eph_inst, operation == "diff", eph_shards
+                )
+                if operation == "diff":
+                    record["message"] = "diff" if record["diff"] else "no diff"
+                else:
+                    record["message"] = "commit completed"
+                if removed_del_cmds:
+                    record["message"] += " (-del cmds)"
+                record["message"] += shard_msg
+                if operation == "push":
+                    record["message"] += self.archive(
+                        operation, device, template, loaded, profile
+                    )
+        except Exception as e:
+            record["status"] = "error"
+            record["message"] = "{stage} error: {error}".format(
+                stage=stage, error=str(e) or type(e).__name__
+            )
+            if self.debug:
+                record["traceback"] = traceback.format_exc()
+        record["seconds"] = round(time() - started, 3)
+        return record
+
+    def load(self, dev, device, config, eph_inst, diff_only, eph_shards=None):
+        # returns (diff, delete cmds removed, shard status), load, conversion and re-try of CLI
+        eph_instance, eph_conf_type, eph_load_overwrite = eph_settings(eph_inst)
+        # json/xml/text eph loads are not set commands
+        optimize = eph_conf_type == "set" and self.setting("SET_OPTIMIZE_ENABLE")
+        set_cmd = set_optimize(config)[0] if optimize else config
+        retry_del_cmds = eph_conf_type == "set" and self.setting(
+            "REMOVE_DEL_CMDS_DURING_PUSH_DIFF_ERR_ENABLE"
+        )
+        commit_timeout = self.setting("COMMIT_TIMEOUT", 30)
+        # [shards] or [shards, key tokens], set loads only, diff of the whole load as CLI
+        if (
+            eph_shards
+            and eph_instance is not None
+            and eph_conf_type == "set"
+            and not diff_only
+        ):
+            errors = []
+            shard_result = shard_push(
+                dev,
+                lambda: self.connect(device),
+                eph_instance,
+                eph_shards,
+                set_cmd,
+                commit_timeout,
+                retry_del_cmds,
+                lambda instance, traceback_msg: errors.append(
+                    "{instance}: {error}".format(
+                        instance=instance,
+                        error=traceback_msg.strip().splitlines()[-1],
+                    )
+                ),
+            )
+            if shard_result["failed"]:
+                raise RuntimeError(
+                    "{status} ({errors})".format(
+                        status=shard_status(shard_result)[2:], errors="; ".join(errors)
+                    )
+                )
+            return (
+                None,
+                shard_result["removed_del_cmds"],
+                shard_status(shard_result),
+                set_cmd,
+            )
+        diff, loaded, removed_del_cmds = config_push(
+            dev,
+            set_cmd,
+            (lambda: del_cmds_remove(config, optimize)) if retry_del_cmds else None,
+            eph_instance=eph_instance,
+            conf_type=eph_conf_type,
+            overwrite=eph_load_overwrite,
+            diff_only=diff_only,
+            commit_timeout=commit_timeout,
+            set_text_min_lines=self.setting("SET_TEXT_MIN_LINES", 0),
+        )
+        return diff, removed_del_cmds, "", loaded
+
+    def archive(self, operation, device, template, rendered, profile=None):
+        # j2 template and pushed set commands (exec: rendered code) as CLI, same settings and profile
+        # save_rendered_j2 override, returns status suffix, errors don't fail the record
+        if operation == "exec":
+            save_j2 = self.setting("SAVE_EXEC_J2_ENABLE")
+            save_rendered = self.setting("SAVE_EXEC_PY_ENABLE")
+            j2_path, rendered_path = "SAVE_PATH_EXEC_J2", "SAVE_PATH_EXEC_PY"
+            j2_suffix, rendered_suffix = ".py.j2", ".py"
+        else:
+            save_j2 = self.setting("SAVE_COMMIT_J2_ENABLE")
+            save_rendered = self.setting("SAVE_COMMIT_CFG_ENABLE")
+            j2_path, rendered_path = "SAVE_PATH_COMMIT_J2", "SAVE_PATH_COMMIT_CFG"
+            j2_suffix, rendered_suffix = ".j2", ".set"
+        if profile:
+            save_rendered_j2 = self.inventory["profiles"][profile][device].get(
+                "save_rendered_j2"
+            )
+            if save_rendered_j2:
+                save_rendered, save_j2 = save_rendered_j2[0], save_rendered_j2[1]
+        timestamp = self.timestamp or datetime.now().strftime("%Y%m%d-%H%M%S")
+        archived = []
+        try:
+            if save_j2:
+                archive_content_put(
+                    self.settings,
+                    self.archive_writer,
+                    self.run_id,
+                    self.setting(j2_path),
+                    timestamp,
+                    template,
+                    device,
+                    j2_suffix,
+                    source_file=self.template_path + "/" + template + ".j2",
+                )
+                archived.append("j2")
+            if save_rendered:
+                archive_content_put(
+                    self.settings,
+                    self.archive_writer,
+                    self.run_id,
+                    self.setting(rendered_path),
+                    timestamp,
+                    template,
+                    device,
+                    rendered_suffix,
+                    data=rendered,
+                )
+                archived.append("code" if operation == "exec" else "set-cmd")
+        except Exception as e:
+            return ", archive error: {error}".format(error=str(e) or type(e).__name__)
+        if not archived:
+            return ""
+        return ", {archived} archived".format(archived="+".join(archived))
+
+    def archive_flush(self, records):
+        # queued archive writes and catalog rows of the run are on disk before records are returned,
+        # errors of queued writes are added to the records
+        self.archive_writer.flush()
+        errors, self.archive_errors[:] = list(self.archive_errors), []
+        if errors:
+            for record in records:
+                record["archive_errors"] = errors
+        return records
+
+    def exec_template(self, dev, device, template, code, profile=None):
+        # template globals are this dict, print() and emit_info() stdout output collected per device
+        output = []
+
+        def capture_print(*args, sep=" ", end="\n", **kvargs):
+            output.append(sep.join(str(arg) for arg in args) + end)
+
+        def emit_info(msg, use_stdout=True, use_syslog=True, use_snmp=False):
+            if use_stdout:
+                output.append(msg + "\n")
+
+        namespace = exec_namespace(
+            self.settings,
+            dev=dev,
+            push_target=device,
+            device=device,
+            profile=profile,
+            template_file=template + ".j2",
+            template_thread_data=self.step_data,
+            debug=self.debug,
+            print=capture_print,
+            emit_info=emit_info,
+        )
+        exec(code, namespace)
+        # rows read by later mprofile steps, same shape as CLI template_thread_data
+        step_row = exec_step_row(
+            device, template, namespace["result"], namespace["result_adv"]
+        )
+        if step_row:
+            self.step_data.append(step_row)
+        return {
+            "result": namespace["result"],
+            "result_adv": namespace["result_adv"],
+            "header": namespace["header"],
+            "output": "".join(output),
+        }
+
+    def profile_step(self, profile, _input=None):
+        # all profile devices concurrently, records in profile order
+        profile_devices = self.inventory["profile_devices"][profile]
+        max_profile_dev = self.setting("MAX_PROFILE_DEV")
+        if max_profile_dev and len(profile_devices) > max_profile_dev:
+            raise ValueError(
+                "{profile} profile number of targets ({count}) > MAX_PROFILE_DEV ({max_profile_dev})".format(
+                    profile=profile,
+                    count=len(profile_devices),
+                    max_profile_dev=max_profile_dev,
+                )
+            )
+        records = {}
+
+        def device_thread(device):
+            # profile errors (missing keys, bad input seq) are reported in the device record
+            try:
+                profile_dev = self.inventory["profiles"][profile][device]
+                if _input:
+                    device_input = _input
+                elif profile_dev["input"][0] == TEMPLATE_VARS_SEQ_INPUT:
+                    device_input = device_seq(device)
+                else:
+                    device_input = profile_dev["input"][0]
+                records[device] = self.run(
+                    "exec" if profile_dev.get("exec", [False])[0] else "push",
+                    device,
+                    profile_dev["template"][0],
+                    profile_dev["template_vars"][0],
+                    device_input,
+                    profile_dev.get("eph_inst"),
+                    profile_dev.get("eph_shards"),
+                    profile,
+                )
+            except Exception as e:
+                record = self.record(device, None, None)
+                record["status"] = "error"
+                record["message"] = "profile error: {error}".format(
+                    error=str(e) or type(e).__name__
+                )
+                if self.debug:
+                    record["traceback"] = traceback.format_exc()
+                records[device] = record
+
+        threads = [
+            threading.Thread(target=device_thread, args=(device,))
+            for device in profile_devices
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return [records[device] for device in profile_devices]
+
+    def run_profile(self, profile, _input=None):
+        del self.step_data[:]
+        self.timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        try:
+            return self.archive_flush(self.profile_step(profile, _input))
+        finally:
+            self.timestamp = None
+
+    def run_mprofile(self, mprofile):
+        # [{"profile": ..., "records": [...]}] per step, result_adv of exec steps passed to later steps
+        del self.step_data[:]
+        self.timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        try:
+            steps = self.mprofile_steps(mprofile)
+        finally:
+            self.timestamp = None
+        self.archive_flush([record for step in steps for record in step["records"]])
+        return steps
+
+    def mprofile_steps(self, mprofile):
+        steps = []
+        for step in self.setting("multi_profiles")[mprofile]["push_profiles"]:
+            for profile, step_settings in step.items():
+                sleep(step_settings.get("pre-delay", 0))
+                records = self.profile_step(profile)
+                sleep(step_settings.get("post-delay", 0))
+                steps.append({"profile": profile, "records": records})
+                # simple string results are not passed on, same as CLI
+                for data in self.step_data:
+                    if type(data[1]) not in [dict, list]:
+                        data[1] = ""
+        return steps
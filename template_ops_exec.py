@@ -0,0 +1,244 @@
+# helpers available to exec templates, template-ops.py imports them into the exec() namespace,
+# template_ops_engine.py builds the same namespace with exec_namespace()
+
+import copy
+import threading
+from time import time
+
+from template_ops_results import history_record
+
+# result of exec template that doesn't set one, no template_thread_data row then
+EXEC_RESULT_DEFAULT = "use global result and optionally header variable in exec() template"
+# namespaces available in helper XPath expressions, EXSLT math provides max/min
+XPATH_NAMESPACES = {"math": "http://exslt.org/math"}
+NAN = float("nan")
+
+# RPC replies re-used by read-only exec templates across threads and mprofile steps of one run,
+# readers get copies, key: (device, rpc name, args), value: (timestamp, reply)
+rpc_cache = {}
+rpc_cache_lock = threading.Lock()
+# compiled XPath expressions, lxml serializes evaluation of one XPath object so they can be shared
+xpath_cache = {}
+xpath_cache_lock = threading.Lock()
+
+
+def rpc_cache_arg(arg):
+    # lxml elements (filter_xml) by content, their repr() holds the object address
+    from lxml import etree
+
+    if etree.iselement(arg):
+        return etree.tostring(arg)
+    return repr(arg)
+
+
+class RPCCache:
+    # dev.rpc stand-in, replies younger than ttl are returned without asking the device again
+    def __init__(self, rpc, device, ttl):
+        self._rpc = rpc
+        self._device = device
+        self._ttl = ttl
+
+    def __getattr__(self, rpc_name):
+        rpc_call = getattr(self._rpc, rpc_name)
+
+        def cached_rpc(*vargs, **kvargs):
+            key = (
+                self._device,
+                rpc_name,
+                tuple(rpc_cache_arg(arg) for arg in vargs),
+                tuple(
+                    (name, rpc_cache_arg(arg)) for name, arg in sorted(kvargs.items())
+                ),
+            )
+            with rpc_cache_lock:
+                cached = rpc_cache.get(key)
+            # every reader gets own copy, a template changing its reply doesn't change later ones
+            if cached and time() - cached[0] < self._ttl:
+                return copy.deepcopy(cached[1])
+
+            rpc_output = rpc_call(*vargs, **kvargs)
+            with rpc_cache_lock:
+                rpc_cache[key] = (time(), copy.deepcopy(rpc_output))
+            return rpc_output
+
+        return cached_rpc
+
+
+class RPCCacheDevice:
+    # Device proxy handed to read-only exec templates, only rpc is cached, the rest goes to Device
+    def __init__(self, dev, device, ttl):
+        object.__setattr__(self, "_dev", dev)
+        object.__setattr__(self, "rpc", RPCCache(dev.rpc, device, ttl))
+
+    def __getattr__(self, name):
+        return getattr(self._dev, name)
+
+    def __setattr__(self, name, value):
+        # e.g. dev.huge_tree = True must reach the real Device
+        setattr(self._dev, name, value)
+
+
+def rpc_cache_clear():
+    with rpc_cache_lock:
+        rpc_cache.clear()
+
+
+def fields_filter_xml(fields):
+    # ["a/b/c", "a/b/d"] -> "<a><b><c/><d/></b></a>"
+    tree = {}
+    for field in fields:
+        node = tree
+        for tag in field.strip("/").split("/"):
+            node = node.setdefault(tag, {})
+
+    def to_xml(node):
+        return "".join(
+            "<{tag}>{children}</{tag}>".format(tag=tag, children=to_xml(child))
+            if child
+            else "<{tag}/>".format(tag=tag)
+            for tag, child in node.items()
+        )
+
+    return to_xml(tree)
+
+
+def rpc_fields(dev, rpc_name, fields, **kvargs):
+    # RPC with field projection, fields are reply paths starting at the reply root element, e.g.
+    # ["interface-information/physical-interface/traffic-statistics/input-bps"], or a filter_xml string
+    # with Device(use_filter=True) the reply is SAX-parsed as it streams in and only requested leaves are kept
+    if isinstance(fields, str):
+        filter_xml = fields
+    else:
+        filter_xml = fields_filter_xml(fields)
+    return getattr(dev.rpc, rpc_name)(filter_xml=filter_xml, **kvargs)
+
+
+def xpath(expr):
+    # compile once per process, reuse across devices and steps
+    compiled = xpath_cache.get(expr)
+    if compiled is None:
+        from lxml import etree
+
+        compiled = etree.XPath(expr, namespaces=XPATH_NAMESPACES)
+        with xpath_cache_lock:
+            xpath_cache[expr] = compiled
+    return compiled
+
+
+def xnumber(value):
+    # XPath numbers are floats, keep integral results int for formatting
+    if isinstance(value, float) and value == value and value.is_integer():
+        return int(value)
+    return value
+
+
+def xvalues(node, path):
+    # numbers of the nodes path selects, counters as int (64-bit counters exceed double precision),
+    # non-numeric text is NaN like XPath number()
+    values = []
+    for selected in xpath(path)(node):
+        text = selected if isinstance(selected, str) else "".join(selected.itertext())
+        try:
+            values.append(int(text))
+        except ValueError:
+            try:
+                values.append(float(text))
+            except ValueError:
+                values.append(NAN)
+    return values
+
+
+def xsum(node, path):
+    # xsum(rpc_output, ".//concurrent-hits"), summed in Python, XPath sum() rounds above 2^53
+    return xnumber(sum(xvalues(node, path)))
+
+
+def xcount(node, path):
+    # xcount(rpc_output, ".//peer-state[. != 'Established']")
+    return int(xpath("count({path})".format(path=path))(node))
+
+
+def xmax(node, path):
+    # NaN when nothing matches
+    return xnumber(max(xvalues(node, path), default=NAN))
+
+
+def xsums(node, paths):
+    # several sums, returned in the order of paths
+    return [xsum(node, path) for path in paths]
+
+
+def xrows(node, row_path, fields):
+    # multi-field extraction, one list of field strings per row element
+    # xrows(rpc_output, ".//peer", ["peer-address", "peer-state"])
+    field_xpaths = [xpath("string({field})".format(field=field)) for field in fields]
+    return [
+        [field_xpath(row) for field_xpath in field_xpaths]
+        for row in xpath(row_path)(node)
+    ]
+
+
+def exec_namespace(settings, **names):
+    # exec() globals outside template-ops.py with the names the CLI exec() sees, settings and template
+    # vars (star imported by template-ops.py), helpers, result/header/result_adv defaults, then names
+    # (dev, push_target, template_thread_data, ...)
+    import template_ops_vars
+    from jnpr.junos import Device
+    from jnpr.junos.exception import ConfigLoadError, CommitError
+    from jnpr.junos.utils.config import Config
+    from template_ops_data import data_load, data_stream
+    from template_ops_results import history_rates, results_query
+
+    namespace = {
+        name: value
+        for name, value in vars(template_ops_vars).items()
+        if not name.startswith("_")
+    }
+    namespace.update(
+        {
+            name: getattr(settings, name)
+            for name in dir(settings)
+            if not name.startswith("_")
+        }
+    )
+    namespace.update(
+        {
+            "rpc_fields": rpc_fields,
+            "xsum": xsum,
+            "xcount": xcount,
+            "xmax": xmax,
+            "xsums": xsums,
+            "xrows": xrows,
+            "data_load": data_load,
+            "data_stream": data_stream,
+            "results_query": results_query,
+            "history_rates": history_rates,
+            # bound by junos_import() of template-ops.py
+            "Device": Device,
+            "Config": Config,
+            "ConfigLoadError": ConfigLoadError,
+            "CommitError": CommitError,
+            "TEMPLATE_OPS": True,
+            "result": EXEC_RESULT_DEFAULT,
+            "header": "default",
+            "result_adv": None,
+        }
+    )
+    namespace.update(names)
+    return namespace
+
+
+def exec_step_row(
+    push_target, template_name, result, result_adv, rate_fields=None, history_size=0
+):
+    # template_thread_data row of exec template, None without result, result_adv samples kept for
+    # rates of repeated runs when history_size is set
+    if not result:
+        return None
+    if not result_adv:
+        return [push_target, result]
+    if history_size:
+        history_record(
+            push_target, template_name, time(), result_adv, rate_fields, history_size
+        )
+    return [push_target, result, result_adv, template_name]
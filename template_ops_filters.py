@@ -0,0 +1,68 @@
+# Jinja2 filters/globals generating addresses and prefixes from compact specs, registered in the
+# template environment, generators yield as rendering consumes them (ipaddress integer arithmetic)
+#
+# {% for prefix in prefix_range("1.1.0.0/16", 24) %}   1.1.0.0/24 ... 1.1.255.0/24
+# {% for ip in host_range("1.1.0.0", "1.1.80.255") %}  1.1.0.0 ... 1.1.80.255
+# {{ "100.65.0.10" | ip_offset(seq|int * 256) }}
+
+import ipaddress
+
+
+def prefix_range(network, prefixlen, count=None):
+    # subnets of network with prefixlen, optionally only first count of them
+    network = ipaddress.ip_network(network, strict=False)
+    step = 1 << (network.max_prefixlen - prefixlen)
+    first = int(network.network_address)
+    last = int(network.broadcast_address)
+    if count is not None:
+        last = min(last, first + count * step - 1)
+    address = type(network.network_address)
+    for value in range(first, last + 1, step):
+        yield "{address}/{prefixlen}".format(address=address(value), prefixlen=prefixlen)
+
+
+def host_range(first, last):
+    # addresses first..last inclusive
+    first = ipaddress.ip_address(first)
+    address = type(first)
+    for value in range(int(first), int(ipaddress.ip_address(last)) + 1):
+        yield str(address(value))
+
+
+def network_hosts(network):
+    # usable hosts of network without building the list (ip_network().hosts() equivalent)
+    network = ipaddress.ip_network(network, strict=False)
+    first = int(network.network_address)
+    last = int(network.broadcast_address)
+    if network.num_addresses > 2:
+        first, last = first + 1, last - 1
+    address = type(network.network_address)
+    for value in range(first, last + 1):
+        yield str(address(value))
+
+
+def pool_split(network, parts):
+    # address pool split into parts equal subnets (parts rounded up to power of 2), e.g. per-SRX pools
+    network = ipaddress.ip_network(network, strict=False)
+    prefixlen = network.prefixlen + (int(parts) - 1).bit_length()
+    return list(prefix_range(network, prefixlen))
+
+
+def ip_offset(ip, offset):
+    # "10.0.0.1" | ip_offset(5) -> "10.0.0.6", prefix length is kept
+    if "/" in str(ip):
+        interface = ipaddress.ip_interface(ip)
+        return "{address}/{prefixlen}".format(
+            address=interface.ip + int(offset), prefixlen=interface.network.prefixlen
+        )
+    return str(ipaddress.ip_address(ip) + int(offset))
+
+
+# same names as filters and globals
+TEMPLATE_FILTERS = {
+    "prefix_range": prefix_range,
+    "host_range": host_range,
+    "network_hosts": network_hosts,
+    "pool_split": pool_split,
+    "ip_offset": ip_offset,
+}
@@ -0,0 +1,216 @@
+# inventory index, profiles/groups/auth data from template_ops_conf plus optional YAML/JSON files,
+# validated once and kept as fully merged ({**default, **device}) per-device records
+#
+# inventory file: top-level names like template_ops_conf.py, e.g.
+#   push_profiles: {pl_2_add: {comment: [...]}}      entries added to template_ops_conf dicts
+#   auth_profiles: {mx-02: {host: [10.0.0.20]}}
+#   vsrx_dc2: {vsrx-101: {}, vsrx-102: {}}            group
+#   pl_2_add: {default: {...}, groups: [vsrx_dc2]}    profile, group devices added, own entries win
+
+import json
+import os
+from types import SimpleNamespace
+
+# dicts of template_ops_conf extended entry by entry, other names are replaced as a whole
+INVENTORY_SECTIONS = ["push_profiles", "multi_profiles", "auth_profiles"]
+INVENTORY_EXTENSIONS = (".yml", ".yaml", ".json")
+# profile keys every merged device record needs
+PROFILE_RECORD_KEYS = ["template", "template_vars", "input"]
+AUTH_RECORD_KEYS = ["user", "host", "port", "ssh_key"]
+# bump when the index layout changes, older caches are rebuilt
+INVENTORY_CACHE_VERSION = 2
+
+
+def conf_copy(conf):
+    # private settings namespace, inventory_load() into it leaves conf untouched (Engine instances),
+    # dicts inventory files extend are copied
+    copied = SimpleNamespace(
+        **{name: getattr(conf, name) for name in dir(conf) if not name.startswith("_")}
+    )
+    for name in INVENTORY_SECTIONS:
+        if isinstance(getattr(copied, name, None), dict):
+            setattr(copied, name, dict(getattr(copied, name)))
+    copied.__file__ = getattr(conf, "__file__", None)
+    return copied
+
+
+def inventory_files(inventory_path):
+    if not inventory_path or not os.path.isdir(inventory_path):
+        return []
+    return sorted(
+        os.path.join(inventory_path, name)
+        for name in os.listdir(inventory_path)
+        if name.endswith(INVENTORY_EXTENSIONS)
+    )
+
+
+def source_identity(path):
+    # modules loaded from bundle have zip member paths, the zip file stands for them
+    while path and not os.path.exists(path):
+        path = os.path.dirname(path)
+    stat = os.stat(path)
+    return [path, stat.st_size, stat.st_mtime_ns]
+
+
+def inventory_signature(conf, inventory_path):
+    # inventory files and identity of every source, cache and loaded index are valid for it only
+    files = inventory_files(inventory_path)
+    return files, [INVENTORY_CACHE_VERSION, source_identity(conf.__file__)] + [
+        source_identity(path) for path in files
+    ]
+
+
+def inventory_stale(conf, index, inventory_path):
+    # template_ops_conf.py or inventory files changed since index was loaded, long running processes
+    # (daemon, watch mode) re-load then
+    try:
+        return inventory_signature(conf, inventory_path)[1] != index["signature"]
+    except OSError:
+        return True
+
+
+def inventory_read(files):
+    data = {}
+    for path in files:
+        with open(path) as f:
+            if path.endswith(".json"):
+                file_data = json.load(f)
+            else:
+                import yaml
+
+                file_data = yaml.safe_load(f)
+        for name, value in (file_data or {}).items():
+            data.setdefault(name, {}).update(value)
+    return data
+
+
+def conf_data(conf):
+    return {
+        name: value
+        for name, value in vars(conf).items()
+        if isinstance(value, dict) and not name.startswith("_")
+    }
+
+
+def expand_groups(name, profile_dict, conf):
+    # devices of listed groups first, then profile own entries, e.g. {**load, **vsrx} in template_ops_conf
+    expanded = {}
+    for group in profile_dict["groups"]:
+        if not isinstance(getattr(conf, group, None), dict):
+            raise ValueError(
+                "inventory {name} unknown group {group}".format(name=name, group=group)
+            )
+        expanded.update(getattr(conf, group))
+    expanded.update(
+        (device, entry) for device, entry in profile_dict.items() if device != "groups"
+    )
+    return expanded
+
+
+def merge_profile(profile_dict):
+    default = profile_dict.get("default", {})
+    return {
+        device: {**default, **entry}
+        for device, entry in profile_dict.items()
+        if device != "default"
+    }
+
+
+def inventory_build(data):
+    errors = []
+    profiles = {}
+    # multi-profile steps may use profiles not listed in push_profiles (e.g. mp_sessions_sum)
+    step_profiles = [
+        profile
+        for mprofile_dict in data["multi_profiles"].values()
+        for step in mprofile_dict.get("push_profiles", [])
+        for profile in step
+    ]
+    for profile in dict.fromkeys(list(data["push_profiles"]) + step_profiles):
+        if not isinstance(data.get(profile), dict):
+            errors.append("profile {profile} has no device dict".format(profile=profile))
+            continue
+        profiles[profile] = merge_profile(data[profile])
+        for device, record in profiles[profile].items():
+            missing = [key for key in PROFILE_RECORD_KEYS if key not in record]
+            if missing:
+                errors.append(
+                    "profile {profile} device {device} missing {missing}".format(
+                        profile=profile, device=device, missing=",".join(missing)
+                    )
+                )
+
+    auth_profiles = dict(data["auth_profiles"])
+    default = auth_profiles.pop("default", {})
+    auth = {device: {**default, **entry} for device, entry in auth_profiles.items()}
+    for device, record in auth.items():
+        missing = [key for key in AUTH_RECORD_KEYS if key not in record]
+        if missing:
+            errors.append(
+                "auth profile {device} missing {missing}".format(
+                    device=device, missing=",".join(missing)
+                )
+            )
+
+    return {
+        "profiles": profiles,
+        "profile_devices": {
+            profile: list(records) for profile, records in profiles.items()
+        },
+        "auth": auth,
+        "errors": errors,
+    }
+
+
+def inventory_load(conf, inventory_path=None, cache_path=None):
+    # index from cache when neither template_ops_conf nor inventory files changed, else rebuilt,
+    # inventory file dicts are put into template_ops_conf so profile/list/show lookups see them,
+    # re-load after change needs freshly imported template_ops_conf (importlib.reload)
+    files, signature = inventory_signature(conf, inventory_path)
+    cached = None
+    if cache_path and os.path.isfile(cache_path):
+        try:
+            # plain JSON, cache file can't run code when loaded
+            with open(cache_path) as f:
+                cached = json.load(f)
+            if not isinstance(cached, dict) or cached.get("signature") != signature:
+                cached = None
+        except (OSError, ValueError):
+            # unreadable cache is rebuilt
+            cached = None
+    if cached:
+        file_data = cached["file_data"]
+    else:
+        file_data = inventory_read(files)
+
+    for name, value in file_data.items():
+        if name in INVENTORY_SECTIONS:
+            getattr(conf, name).update(value)
+        else:
+            setattr(conf, name, value)
+    # groups may come from any file or template_ops_conf, expanded once all are in place
+    for name, value in file_data.items():
+        if name not in INVENTORY_SECTIONS and "groups" in value:
+            setattr(conf, name, expand_groups(name, value, conf))
+
+    if cached:
+        return cached["index"]
+
+    index = inventory_build(conf_data(conf))
+    index["signature"] = signature
+    # template_ops_conf alone builds in well under a millisecond, cache pays off with files
+    if cache_path and files:
+        tmp_path = "{path}.{pid}".format(path=cache_path, pid=os.getpid())
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(
+                    {"signature": signature, "file_data": file_data, "index": index}, f
+                )
+            os.replace(tmp_path, cache_path)
+        except (OSError, TypeError, ValueError):
+            # read-only script folder or non-JSON values in template_ops_conf, index is rebuilt next time
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    return index
@@ -0,0 +1,113 @@
+# configuration load/diff/commit of rendered templates, shared by template-ops.py, template_ops_shard.py
+# and template_ops_engine.py so CLI and Engine load, convert and re-try the same way
+#
+# errors of the last try are raised (ConfigLoadError, CommitError), candidate is rolled back first
+
+import re
+
+from template_ops_setcmd import set_optimize, set_to_text
+
+
+def eph_settings(eph_param):
+    # function to set data type for load to eph, set is default, json/xml/text are loaded with overwrite = True to overcome slow delete in eph
+    if eph_param == None:
+        return None, "set", False
+
+    eph_instance = eph_param[0]
+    eph_conf_type = eph_param[1]
+    if eph_conf_type in ["json", "xml", "text"]:
+        return eph_instance, eph_conf_type, True
+
+    return eph_instance, "set", False
+
+
+def del_cmds_remove(set_cmd, optimize=False):
+    # items for delete might not be present, remove and re-try without
+    # ^delete pattern is not used as that doesn't apply for multiple lines!!
+    # from rendered commands, lines dropped by the optimizer under deletes come back
+    set_cmd = re.sub(r"delete\ .*\n", "", set_cmd)
+    if optimize:
+        set_cmd = set_optimize(set_cmd)[0]
+    return set_cmd
+
+
+def config_load(
+    cu,
+    config,
+    conf_type="set",
+    overwrite=False,
+    set_text_min_lines=0,
+    text_fallback=None,
+):
+    # json/xml/text as given, large set loads converted to hierarchical text, fewer statements for mgd
+    # to parse, set commands when the device rejects the conversion (text_fallback() called then)
+    from jnpr.junos.exception import ConfigLoadError
+
+    if conf_type != "set":
+        cu.load(config, format=conf_type, overwrite=overwrite)
+        return
+    set_text = None
+    if set_text_min_lines and config.count("\n") >= set_text_min_lines:
+        set_text = set_to_text(config)
+    if set_text is not None:
+        try:
+            cu.load(set_text, format="text")
+            return
+        except ConfigLoadError:
+            # conversion is schema-less, device may not accept it
+            cu.rollback()
+            if text_fallback:
+                text_fallback()
+    cu.load(config, format="set")
+
+
+def config_commit(
+    dev,
+    config,
+    eph_instance=None,
+    conf_type="set",
+    overwrite=False,
+    diff_only=False,
+    commit_timeout=30,
+    set_text_min_lines=0,
+    text_fallback=None,
+):
+    # one load and diff (rolled back) or commit, returns diff (None for commit)
+    from jnpr.junos.utils.config import Config
+    from jnpr.junos.exception import ConfigLoadError, CommitError
+
+    if eph_instance is not None:
+        config_args = {"mode": "ephemeral", "ephemeral_instance": eph_instance}
+        # ephemeral set loads are not converted
+        set_text_min_lines = 0
+    else:
+        config_args = {}
+    with Config(dev, **config_args) as cu:
+        try:
+            config_load(
+                cu, config, conf_type, overwrite, set_text_min_lines, text_fallback
+            )
+            # can't happen with ephemeral, parameter check prevents that
+            if diff_only:
+                diff = cu.diff()
+                cu.rollback()
+                return diff
+            cu.commit(timeout=commit_timeout)
+            return None
+        except (ConfigLoadError, CommitError):
+            cu.rollback()
+            raise
+
+
+def config_push(dev, config, retry_config=None, **commit_args):
+    # returns (diff, config loaded, delete cmds removed), retry_config() returns config for the re-try
+    # after load/commit error (REMOVE_DEL_CMDS_DURING_PUSH_DIFF_ERR_ENABLE), None doesn't re-try
+    from jnpr.junos.exception import ConfigLoadError, CommitError
+
+    try:
+        return config_commit(dev, config, **commit_args), config, False
+    except (ConfigLoadError, CommitError):
+        if retry_config is None:
+            raise
+    config = retry_config()
+    return config_commit(dev, config, **commit_args), config, True
@@ -0,0 +1,93 @@
+# md5 of templates and archived files keyed on file identity (path, inode, size, mtime_ns),
+# unchanged files are only stat()ed, optional JSON sidecar keeps the hashes across runs
+
+import hashlib
+import json
+import os
+import threading
+from time import time
+
+# files modified less than this many seconds ago are hashed but not cached,
+# a rewrite within mtime granularity with the same size would otherwise go unnoticed
+MD5_CACHE_MIN_AGE = 2
+
+# key: absolute path, value: [inode, size, mtime_ns, md5]
+md5_cache = {}
+md5_cache_lock = threading.Lock()
+# sidecar file set by md5_cache_init(), loaded on first lookup
+md5_cache_path = None
+md5_cache_loaded = False
+md5_cache_dirty = False
+
+
+def md5_cache_init(path):
+    global md5_cache_path, md5_cache_loaded
+    md5_cache_path = path
+    md5_cache_loaded = False
+
+
+def md5_cache_load():
+    global md5_cache_loaded
+    md5_cache_loaded = True
+    if md5_cache_path is None or not os.path.isfile(md5_cache_path):
+        return
+    try:
+        with open(md5_cache_path) as f:
+            md5_cache.update(json.load(f))
+    except (OSError, ValueError):
+        # unreadable or corrupted sidecar, rebuilt on save
+        pass
+
+
+def md5_cache_save():
+    # atomic replace, nothing written when no hash was added since load
+    global md5_cache_dirty
+    if md5_cache_path is None or not md5_cache_dirty:
+        return
+    with md5_cache_lock:
+        # drop entries of removed files
+        entries = {
+            path: entry for path, entry in md5_cache.items() if os.path.isfile(path)
+        }
+        md5_cache_dirty = False
+    tmp_path = "{path}.{pid}".format(path=md5_cache_path, pid=os.getpid())
+    # runs from atexit, read-only script folder (bundle, on-box) or full disk skips the sidecar quietly
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, md5_cache_path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def md5_file(path):
+    with open(path, "rb") as f:
+        file_hash = hashlib.md5()
+        chunk = f.read(65536)
+        while chunk:
+            file_hash.update(chunk)
+            chunk = f.read(65536)
+    return file_hash.hexdigest()
+
+
+def md5_cached(path):
+    global md5_cache_dirty
+    path = os.path.abspath(str(path))
+    stat = os.stat(path)
+    identity = [stat.st_ino, stat.st_size, stat.st_mtime_ns]
+    with md5_cache_lock:
+        if not md5_cache_loaded:
+            md5_cache_load()
+        entry = md5_cache.get(path)
+    if entry and entry[:3] == identity:
+        return entry[3]
+
+    digest = md5_file(path)
+    if stat.st_mtime < time() - MD5_CACHE_MIN_AGE:
+        with md5_cache_lock:
+            md5_cache[path] = identity + [digest]
+            md5_cache_dirty = True
+    return digest
@@ -0,0 +1,70 @@
+# machine-readable result export (--output ndjson|csv), one record per device result written and
+# flushed as it completes, nothing is buffered for the whole run
+#
+# record: run_id, step (profile, empty for single device), device, template, status (ok|error),
+#         timestamp (completion), seconds (since step start), result, result_adv
+# csv: result/result_adv that are not strings are JSON encoded
+
+import json
+import sys
+import threading
+from datetime import datetime
+
+OUTPUT_FORMATS = ["ndjson", "csv"]
+OUTPUT_FIELDS = [
+    "run_id",
+    "step",
+    "device",
+    "template",
+    "status",
+    "timestamp",
+    "seconds",
+    "result",
+    "result_adv",
+]
+
+
+def json_value(value):
+    # result_adv may hold values json doesn't know (e.g. Decimal, lxml text), written as strings
+    return json.dumps(value, default=str)
+
+
+class ResultWriter:
+    def __init__(self, output_format, path=None):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(
+                "unknown output format {output_format}, use {formats}".format(
+                    output_format=output_format, formats="|".join(OUTPUT_FORMATS)
+                )
+            )
+        self.output_format = output_format
+        self.path = path
+        # stdout taken now, callers may redirect human readable output elsewhere
+        self.file = open(path, "a", newline="") if path else sys.stdout
+        self.lock = threading.Lock()
+        self.csv_writer = None
+        if output_format == "csv":
+            import csv
+
+            self.csv_writer = csv.DictWriter(self.file, fieldnames=OUTPUT_FIELDS)
+            # appended file has header already
+            if not path or self.file.tell() == 0:
+                self.csv_writer.writeheader()
+
+    def write(self, **record):
+        record = {field: record.get(field) for field in OUTPUT_FIELDS}
+        if record["timestamp"] is None:
+            record["timestamp"] = datetime.now().isoformat(timespec="milliseconds")
+        with self.lock:
+            if self.csv_writer:
+                for field in ["result", "result_adv"]:
+                    if record[field] is not None and not isinstance(record[field], str):
+                        record[field] = json_value(record[field])
+                self.csv_writer.writerow(record)
+            else:
+                self.file.write(json.dumps(record, default=str) + "\n")
+            self.file.flush()
+
+    def close(self):
+        if self.path:
+            self.file.close()
@@ -0,0 +1,72 @@
+# TCP reachability pre-probe of profile devices, all hosts probed concurrently before device threads
+# start, results kept for PROBE_TTL seconds across mprofile steps and watch mode iterations,
+# session_alive() checks NETCONF sessions kept between runs (template-ops.py dev_pool, Engine)
+
+import threading
+from time import time
+
+# key: (host, port), value: [checked, error], error None for reachable host
+probe_cache = {}
+probe_cache_lock = threading.Lock()
+
+
+def tcp_probe(host, port, timeout):
+    # None when connect succeeds, else short error text
+    import socket
+
+    try:
+        with socket.create_connection((host, int(port)), timeout=timeout):
+            return None
+    except socket.timeout:
+        return "timeout {timeout}s".format(timeout=timeout)
+    except OSError as e:
+        return e.strerror or str(e)
+
+
+def probe_thread(host, port, timeout):
+    error = tcp_probe(host, port, timeout)
+    with probe_cache_lock:
+        probe_cache[(host, port)] = [time(), error]
+
+
+def probe_hosts(targets, timeout, ttl):
+    # targets {device: (host, port)} -> {device: error}, error None for reachable device
+    now = time()
+    with probe_cache_lock:
+        expired = {
+            address
+            for address in targets.values()
+            if address not in probe_cache or now - probe_cache[address][0] > ttl
+        }
+    threads = [
+        threading.Thread(target=probe_thread, args=(host, port, timeout))
+        for host, port in expired
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with probe_cache_lock:
+        return {device: probe_cache[address][1] for device, address in targets.items()}
+
+
+def probe_forget(host, port):
+    # device failed after the probe passed, probed again next time
+    with probe_cache_lock:
+        probe_cache.pop((host, port), None)
+
+
+def session_alive(dev):
+    # kept session may have been closed by the device meanwhile (idle timeout, reboot, commit of sshd
+    # settings), checked with cheap RPC, dead session is closed
+    if not dev.connected:
+        return False
+    try:
+        dev.rpc.get_system_uptime_information()
+    except Exception:
+        try:
+            dev.close()
+        except Exception:
+            pass
+        return False
+    return True
@@ -0,0 +1,219 @@
+# exec template results kept across repeated runs (watch mode), used for rates in print_results()
+
+import json
+import threading
+from array import array
+from time import time
+
+NAN = float("nan")
+
+RESULT_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    run_id TEXT,
+    timestamp REAL,
+    profile TEXT,
+    device TEXT,
+    template TEXT,
+    result TEXT,
+    result_adv TEXT,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS results_device_template ON results (device, template, timestamp);
+CREATE INDEX IF NOT EXISTS results_template ON results (template, timestamp);
+CREATE INDEX IF NOT EXISTS results_profile ON results (profile, timestamp);
+CREATE INDEX IF NOT EXISTS results_run ON results (run_id);
+"""
+
+# sqlite file set by store_init(), None when the result store is disabled
+result_store_path = None
+
+# key: (device, template), value: ResultHistory
+result_history = {}
+result_history_lock = threading.Lock()
+
+
+def result_adv_values(result_adv):
+    # flatten [[a, b, ...]] used by load-style templates, non-numeric values (N/A) become NaN
+    if len(result_adv) == 1 and isinstance(result_adv[0], (list, tuple)):
+        result_adv = result_adv[0]
+    values = []
+    for value in result_adv:
+        try:
+            values.append(float(value))
+        except (TypeError, ValueError):
+            values.append(NAN)
+    return values
+
+
+class ResultHistory:
+    # fixed-size ring buffer, one array of doubles per result_adv field plus timestamps
+    def __init__(self, size, nr_fields, rate_fields):
+        self.size = size
+        self.rate_fields = rate_fields
+        self.count = 0
+        # next write position
+        self.pos = 0
+        self.timestamps = array("d", [NAN]) * size
+        self.fields = [array("d", [NAN]) * size for field in range(nr_fields)]
+
+    def append(self, timestamp, values):
+        self.timestamps[self.pos] = timestamp
+        for field, value in zip(self.fields, values):
+            field[self.pos] = value
+        self.pos = (self.pos + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def index(self, age):
+        # age 0 is the latest sample
+        return (self.pos - 1 - age) % self.size
+
+    def delta(self, field):
+        last, prev = self.index(0), self.index(1)
+        return self.fields[field][last] - self.fields[field][prev]
+
+    def rate(self, field):
+        # per second between the last two samples
+        if self.count < 2:
+            return NAN
+        last, prev = self.index(0), self.index(1)
+        return self.delta(field) / (self.timestamps[last] - self.timestamps[prev])
+
+    def rate_avg(self, field):
+        # moving average rate over the whole buffer, constant cost regardless of buffer size
+        if self.count < 2:
+            return NAN
+        last, first = self.index(0), self.index(self.count - 1)
+        return (self.fields[field][last] - self.fields[field][first]) / (
+            self.timestamps[last] - self.timestamps[first]
+        )
+
+
+def history_record(device, template, timestamp, result_adv, rate_fields, size):
+    values = result_adv_values(result_adv)
+    with result_history_lock:
+        history = result_history.get((device, template))
+        # new device/template or template changed number of fields
+        if history is None or len(history.fields) != len(values):
+            history = ResultHistory(size, len(values), rate_fields)
+            result_history[(device, template)] = history
+        history.rate_fields = rate_fields
+        history.append(timestamp, values)
+    return history
+
+
+def history_rates(keys):
+    # rows [device, rate, avg rate, rate, avg rate, ...] plus fleet-wide sum row, labels from rate_fields
+    labels = []
+    rows = []
+    with result_history_lock:
+        for key in sorted(keys):
+            history = result_history.get(key)
+            if history is None or not history.rate_fields or history.count < 2:
+                continue
+            fields = sorted(history.rate_fields)
+            if not labels:
+                labels = [history.rate_fields[field] for field in fields]
+            row = [key[0]]
+            for field in fields:
+                row += [history.rate(field), history.rate_avg(field)]
+            if len(row) == 2 * len(labels) + 1:
+                rows.append(row)
+    if len(rows) > 1:
+        fleet = ["fleet"]
+        for column in range(1, len(rows[0])):
+            # devices without valid sample (NaN) are left out of the sum
+            values = [row[column] for row in rows if row[column] == row[column]]
+            fleet.append(sum(values) if values else NAN)
+        rows.append(fleet)
+    return labels, rows
+
+
+def store_init(path):
+    global result_store_path
+    # sqlite3 is imported by runs using the store only
+    import sqlite3
+
+    db = sqlite3.connect(path)
+    try:
+        # readers (exec templates of other runs) don't block the writer
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(RESULT_STORE_SCHEMA)
+        # stores created before the status column
+        columns = [row[1] for row in db.execute("PRAGMA table_info(results)")]
+        if "status" not in columns:
+            db.execute("ALTER TABLE results ADD COLUMN status TEXT")
+    finally:
+        db.close()
+    result_store_path = path
+
+
+def store_write(run_id, profile, step_data):
+    # one transaction per step, called after device threads joined so they are never slowed down
+    # step_data rows: [device, template, status (ok|error), result, result_adv], result and result_adv
+    # that are not strings are JSON encoded
+    if result_store_path is None:
+        return
+    timestamp = time()
+    rows = []
+    for device, template, status, result, result_adv in step_data:
+        rows.append(
+            (
+                run_id,
+                timestamp,
+                profile,
+                device,
+                template,
+                result if isinstance(result, str) else json.dumps(result, default=str),
+                json.dumps(result_adv, default=str) if result_adv is not None else None,
+                status,
+            )
+        )
+    import sqlite3
+
+    db = sqlite3.connect(result_store_path)
+    try:
+        with db:
+            db.executemany(
+                "INSERT INTO results (run_id, timestamp, profile, device, template, result, result_adv, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+    finally:
+        db.close()
+
+
+def results_query(template, seconds=3600, device=None, profile=None):
+    # history for exec templates/aggregators, e.g. results_query("sessions", 3600)
+    # returns [timestamp, device, result_adv, result, status] oldest first
+    if result_store_path is None:
+        return []
+    query = (
+        "SELECT timestamp, device, result_adv, result, status FROM results "
+        "WHERE template = ? AND timestamp >= ?"
+    )
+    params = [template, time() - seconds]
+    if device is not None:
+        query += " AND device = ?"
+        params.append(device)
+    if profile is not None:
+        query += " AND profile = ?"
+        params.append(profile)
+    query += " ORDER BY timestamp"
+    import sqlite3
+
+    db = sqlite3.connect(result_store_path)
+    try:
+        return [
+            [
+                timestamp,
+                device,
+                json.loads(result_adv) if result_adv else None,
+                result,
+                status,
+            ]
+            for timestamp, device, result_adv, result, status in db.execute(
+                query, params
+            )
+        ]
+    finally:
+        db.close()
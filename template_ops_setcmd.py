@@ -0,0 +1,228 @@
+# set-command optimizer, applied to rendered set config before cu.load(), final configuration is
+# the same as loading the rendered commands
+#
+# - blank lines and surrounding whitespace are removed
+# - repeated set lines are dropped, unless a delete of the hierarchy came in between
+# - delete covered by an earlier delete (same or parent hierarchy) is dropped together with the
+#   set/delete lines under it issued after that earlier delete (hierarchy is empty either way)
+# - other commands (activate, deactivate, insert, rename, ...) are kept in place and end the
+#   optimization window, nothing is moved across them
+
+import re
+
+
+def path_prefixes(path):
+    # "a b c" -> ["a", "a b", "a b c"]
+    prefixes = []
+    position = path.find(" ")
+    while position != -1:
+        prefixes.append(path[:position])
+        position = path.find(" ", position + 1)
+    prefixes.append(path)
+    return prefixes
+
+
+def set_optimize(set_cmd):
+    # returns optimized commands and stats {lines, optimized, blank, duplicate, subsumed}
+    lines = set_cmd.splitlines()
+    stats = {"lines": len(lines), "blank": 0, "duplicate": 0, "subsumed": 0}
+    has_delete = any(line.lstrip().startswith("delete ") for line in lines)
+    # optimized lines, None for lines dropped later
+    out = []
+    # parallel to out: ("set"|"delete"|None, path)
+    kinds = []
+    # set path -> index in out, for duplicates
+    set_index = {}
+    # delete path -> index in out
+    delete_index = {}
+    # path prefix -> indexes of set/delete lines under it
+    prefix_index = {}
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            stats["blank"] += 1
+            continue
+        command, _, path = line.partition(" ")
+
+        if command == "set":
+            if path in set_index:
+                stats["duplicate"] += 1
+                continue
+            set_index[path] = len(out)
+            if has_delete:
+                for prefix in path_prefixes(path):
+                    prefix_index.setdefault(prefix, []).append(len(out))
+            out.append(line)
+            kinds.append(("set", path))
+
+        elif command == "delete":
+            # latest earlier delete of this or a parent hierarchy
+            covering = max(
+                (
+                    delete_index[prefix]
+                    for prefix in path_prefixes(path)
+                    if prefix in delete_index
+                ),
+                default=None,
+            )
+            if covering is not None:
+                stats["subsumed"] += 1
+                for index in prefix_index.get(path, []):
+                    if index > covering and out[index] is not None:
+                        out[index] = None
+                        stats["subsumed"] += 1
+                        kind, dropped_path = kinds[index]
+                        if kind == "set" and set_index.get(dropped_path) == index:
+                            del set_index[dropped_path]
+                continue
+            # set lines under deleted hierarchy may be repeated afterwards
+            for index in prefix_index.get(path, []):
+                kind, deleted_path = kinds[index]
+                if kind == "set" and set_index.get(deleted_path) == index:
+                    del set_index[deleted_path]
+            delete_index[path] = len(out)
+            for prefix in path_prefixes(path):
+                prefix_index.setdefault(prefix, []).append(len(out))
+            out.append(line)
+            kinds.append(("delete", path))
+
+        else:
+            # comments pass through, any other command closes the window
+            if not line.startswith("#"):
+                set_index.clear()
+                delete_index.clear()
+                prefix_index.clear()
+            out.append(line)
+            kinds.append((None, line))
+
+    optimized = [line for line in out if line is not None]
+    stats["optimized"] = len(optimized)
+    return "\n".join(optimized) + "\n", stats
+
+
+# --- set -> hierarchical text ---
+#
+# schema-less conversion: common paths become blocks, a block opens at a branch after an identifier
+# (pl-1, ge-0/0/0) or when the next tokens look like statement keywords, a keyword followed by
+# identifiers stays on the line of each of them (prefix-list pl-1, prefix-list pl-2),
+# delete X before sets under X becomes replace: X, a delete alone becomes delete: X, paths above a
+# replace:/delete: are not joined so the tag stays in front of the statement it applies to,
+# set-only unit shorthand (interfaces ge-0/0/1.0) is spelled out as ge-0/0/1 unit 0,
+# commands the device rejects in text format are loaded as set commands again
+
+TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*"|\S+')
+KEYWORD_RE = re.compile(r"^[a-z][a-z0-9-]*$")
+# pl-1, vsrx-01, ge-0 are names, inet6/ospf3 are keywords
+NAME_SUFFIX_RE = re.compile(r"-\d+$")
+UNIT_SHORTHAND_RE = re.compile(r"^(\S+)\.(\d+)$")
+
+
+class SetNode:
+    __slots__ = ["children", "terminal", "marker", "marked"]
+
+    def __init__(self):
+        self.children = {}
+        self.terminal = False
+        # None, "replace" or "delete"
+        self.marker = None
+        # node or a node below carries a marker
+        self.marked = False
+
+
+def keyword_like(token):
+    return bool(KEYWORD_RE.match(token)) and not NAME_SUFFIX_RE.search(token)
+
+
+def statement_tokens(tokens):
+    # interfaces ge-0/0/1.0 -> interfaces ge-0/0/1 unit 0, shorthand is valid in set commands only
+    expanded = []
+    for token in tokens:
+        unit = UNIT_SHORTHAND_RE.match(token)
+        if unit and expanded and expanded[-1] == "interfaces":
+            expanded.extend([unit.group(1), "unit", unit.group(2)])
+        else:
+            expanded.append(token)
+    return expanded
+
+
+def marker_path(path):
+    # replace:/delete: applies to one statement, a single token or keyword with its name
+    return len(path) == 1 or (
+        len(path) == 2 and keyword_like(path[0]) and not keyword_like(path[1])
+    )
+
+
+def set_tree(lines):
+    # None when commands can't be expressed as one merge (other commands, set before delete)
+    root = SetNode()
+    deletes = []
+    seen_set = False
+    for line in lines:
+        command, _, path = line.partition(" ")
+        tokens = statement_tokens(TOKEN_RE.findall(path))
+        if command == "delete" and not seen_set and tokens:
+            deletes.append(tokens)
+            continue
+        if command != "set" or not tokens:
+            return None
+        seen_set = True
+        node = root
+        for token in tokens:
+            node = node.children.setdefault(token, SetNode())
+        node.terminal = True
+    for tokens in deletes:
+        node = root
+        for token in tokens:
+            node = node.children.setdefault(token, SetNode())
+            node.marked = True
+        node.marker = "replace" if node.children or node.terminal else "delete"
+    return root
+
+
+def set_tree_text(node, path, indent, out):
+    # ValueError when a marker would not come directly before its statement
+    if node.marker and not marker_path(path):
+        raise ValueError("{marker}: {line}".format(marker=node.marker, line=" ".join(path)))
+    marker = node.marker + ": " if node.marker else ""
+    line = " ".join(path)
+    if not node.children:
+        out.append("{indent}{marker}{line};".format(indent=indent, marker=marker, line=line))
+        return
+    # single child chains stay on one line, e.g. policy-options prefix-list pl-1, above a marker
+    # only a keyword and its name (replace: prefix-list pl-1)
+    if len(node.children) == 1 and not node.terminal and not node.marker:
+        token, child = next(iter(node.children.items()))
+        if not node.marked or (marker_path(path + [token]) and len(path) == 1):
+            set_tree_text(child, path + [token], indent, out)
+            return
+    # node set on its own and with children is a leaf value, paths below are spelled out
+    if not node.terminal and (
+        node.marker
+        or not keyword_like(path[-1])
+        or all(keyword_like(token) for token in node.children)
+    ):
+        out.append("{indent}{marker}{line} {{".format(indent=indent, marker=marker, line=line))
+        for token, child in node.children.items():
+            set_tree_text(child, [token], indent + "    ", out)
+        out.append(indent + "}")
+        return
+    if node.terminal:
+        out.append("{indent}{line};".format(indent=indent, line=line))
+    for token, child in node.children.items():
+        set_tree_text(child, path + [token], indent, out)
+
+
+def set_to_text(set_cmd):
+    # hierarchical text for cu.load(format="text"), None when the commands can't be converted
+    lines = [line.strip() for line in set_cmd.splitlines() if line.strip()]
+    root = set_tree(lines)
+    if root is None:
+        return None
+    out = []
+    try:
+        for token, child in root.children.items():
+            set_tree_text(child, [token], "", out)
+    except ValueError:
+        return None
+    return "\n".join(out) + "\n"
@@ -0,0 +1,225 @@
+# sharded ephemeral loads, rendered set commands split by key hash over instances <eph_inst>-0..N-1,
+# each shard committed over its own session, shards the device already holds are skipped
+#
+# profile entry 'eph_shards':[4] or [4, 3], second item is number of path tokens forming the key,
+# default whole path (one prefix-list entry), 3 keeps "policy-options prefix-list pl-1" in one instance
+# only order-insensitive prefix-list lines are sharded, ephemeral instances merge by priority so lines
+# whose order matters (e.g. firewall filter terms, policy-statement terms) are rejected
+# delete lines go to every shard, instances must exist on the device
+# (set system configuration-database ephemeral instance pl-0 ...)
+# shard_push() is used by template-ops.py and template_ops_engine.py
+
+import re
+import traceback
+import zlib
+from threading import Thread
+
+from template_ops_load import config_commit, config_push, del_cmds_remove
+
+SHARD_LINE_RE = re.compile(r"^(set|delete) policy-options prefix-list \S+( \S+)?$")
+# ephemeral instances of the device, instances beyond shard count are cleared
+SHARD_INSTANCES_FILTER = (
+    "<configuration><system><configuration-database><ephemeral/>"
+    "</configuration-database></system></configuration>"
+)
+
+
+def shard_instances(instance, shards):
+    return [
+        "{instance}-{index}".format(instance=instance, index=index)
+        for index in range(shards)
+    ]
+
+
+def shard_split(set_cmd, shards, key_tokens=None):
+    # list of shard commands, crc32 is stable across processes unlike hash()
+    shard_lines = [[] for _ in range(shards)]
+    for line in set_cmd.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if not SHARD_LINE_RE.match(line):
+            raise ValueError(
+                "'{line}' can't be sharded, order-insensitive prefix-list lines only".format(
+                    line=line
+                )
+            )
+        command, _, path = line.partition(" ")
+        if command != "set":
+            for lines in shard_lines:
+                lines.append(line)
+            continue
+        key = " ".join(path.split(" ")[:key_tokens]) if key_tokens else path
+        shard_lines[zlib.crc32(key.encode()) % shards].append(line)
+    return ["\n".join(lines) + "\n" for lines in shard_lines]
+
+
+def shard_stale(configured, instance, shards):
+    # <instance>-<index> instances left by a larger shard count
+    stale_re = re.compile(re.escape(instance) + r"-(\d+)$")
+    return sorted(
+        name
+        for name in configured
+        if stale_re.match(name) and int(stale_re.match(name).group(1)) >= shards
+    )
+
+
+def shard_set_lines(text):
+    # set lines of "show configuration | display set" output
+    return set(
+        line.strip() for line in text.splitlines() if line.startswith("set ")
+    )
+
+
+def shard_unchanged(shard_cmd, device_lines):
+    # device content (set lines) already matches shard, shards with delete lines replace content,
+    # shards without only add lines
+    shard_lines = shard_set_lines(shard_cmd)
+    if any(line.startswith("delete ") for line in shard_cmd.splitlines()):
+        return device_lines == shard_lines
+    return shard_lines <= device_lines
+
+
+def shard_lines_get(dev, instance):
+    # set lines the ephemeral instance holds, None when unreadable
+    try:
+        reply = dev.rpc.get_config(
+            options={
+                "database": "ephemeral",
+                "ephemeral-instance": instance,
+                "format": "set",
+            }
+        )
+        return shard_set_lines("".join(reply.itertext()))
+    except Exception:
+        return None
+
+
+def shard_thread(
+    dev,
+    session_open,
+    instance,
+    shard_cmd,
+    commit_timeout,
+    retry_del_cmds,
+    shard_data,
+    error_log,
+):
+    # one ephemeral instance per session, dev None opens own session, shard_cmd None clears instance
+    own_session = dev is None
+    try:
+        if own_session:
+            dev = session_open()
+        removed_del_cmds = False
+        if shard_cmd is None:
+            config_commit(
+                dev,
+                "<configuration/>",
+                instance,
+                "xml",
+                True,
+                commit_timeout=commit_timeout,
+            )
+        else:
+            # errors and -del cmds re-try same as unsharded push
+            _, _, removed_del_cmds = config_push(
+                dev,
+                shard_cmd,
+                (lambda: del_cmds_remove(shard_cmd)) if retry_del_cmds else None,
+                eph_instance=instance,
+                commit_timeout=commit_timeout,
+            )
+        shard_data.append([instance, True, removed_del_cmds])
+    except Exception:
+        if error_log:
+            error_log(instance, str(traceback.format_exc()))
+        shard_data.append([instance, False, False])
+    finally:
+        if own_session and dev is not None and dev.connected:
+            dev.close()
+
+
+def shard_push(
+    dev,
+    session_open,
+    eph_instance,
+    eph_shards,
+    set_cmd,
+    commit_timeout=30,
+    retry_del_cmds=False,
+    error_log=None,
+):
+    # changed shards committed in parallel, first over dev, others over session_open() sessions,
+    # error_log(instance, traceback) per failed shard, ValueError when set_cmd can't be sharded
+    # returns {"shards": N, "changed": [...], "stale": [...], "failed": [...], "removed_del_cmds": bool}
+    shards = int(eph_shards[0])
+    key_tokens = int(eph_shards[1]) if len(eph_shards) > 1 else None
+    instances = shard_instances(eph_instance, shards)
+    shard_cmds = shard_split(set_cmd, shards, key_tokens)
+    # device content is compared, not a local record, so shards cleared by reboot or by hand
+    # are pushed again
+    changed = [
+        [instance, shard_cmd]
+        for instance, shard_cmd in zip(instances, shard_cmds)
+        if not shard_unchanged(shard_cmd, shard_lines_get(dev, instance) or set())
+    ]
+    # instances left by a larger shard count would still merge their lines
+    try:
+        configured = [
+            name.text
+            for name in dev.rpc.get_config(
+                filter_xml=SHARD_INSTANCES_FILTER
+            ).findall(".//ephemeral/instance/name")
+        ]
+    except Exception:
+        configured = []
+    stale = [
+        instance
+        for instance in shard_stale(configured, eph_instance, shards)
+        if shard_lines_get(dev, instance) != set()
+    ]
+    shard_data = []
+    shard_threads = []
+    for index, [instance, shard_cmd] in enumerate(
+        changed + [[instance, None] for instance in stale]
+    ):
+        # first shard re-uses opened session
+        shard_thread_run = Thread(
+            target=shard_thread,
+            args=(
+                dev if index == 0 else None,
+                session_open,
+                instance,
+                shard_cmd,
+                commit_timeout,
+                retry_del_cmds,
+                shard_data,
+                error_log,
+            ),
+        )
+        shard_thread_run.start()
+        shard_threads.append(shard_thread_run)
+    for shard_thread_run in shard_threads:
+        shard_thread_run.join()
+
+    return {
+        "shards": shards,
+        "changed": [instance for instance, _ in changed],
+        "stale": stale,
+        "failed": [instance for instance, ok, _ in shard_data if not ok],
+        "removed_del_cmds": any(removed for _, _, removed in shard_data),
+    }
+
+
+def shard_status(shard_result):
+    # status suffix of sharded push
+    if shard_result["failed"]:
+        return ", shards failed: {failed}".format(
+            failed=",".join(shard_result["failed"])
+        )
+    shard_msg = ", {changed}/{shards} shards changed".format(
+        changed=len(shard_result["changed"]), shards=shard_result["shards"]
+    )
+    if shard_result["stale"]:
+        shard_msg += ", {stale} cleared".format(stale=",".join(shard_result["stale"]))
+    return shard_msg
@@ -1,4 +1,8 @@
-# TEMPLATE_VARSx_LIST are referred by template_vars_get function below, update accordingly
+import re
+
+from template_ops_data import data_load, data_stream
+
+# TEMPLATE_VARSx_LIST are mapped to generators in TEMPLATE_VARS_REGISTRY at the end of this file, update accordingly
 TEMPLATE_VARS1_LIST = ["vsrx"]
 TEMPLATE_VARS2_LIST = ["ptx", "mx"]
 TEMPLATE_VARS3_LIST = ["exec1"]
@@ -9,19 +13,64 @@ TEMPLATE_VARS4_LIST = ["srx_yaml1"]
 DIFF_PUSH_ELIGIBLE_LIST = ["mx", "vsrx", "exec1"]
 # template types for print_help (does not contain the VARS3 sample above), update Junos config for context help too
 TEMPLATE_VARS_STR = "[vsrx|srx4600|mx|ptx|exec1]"
+# profile input taken from trailing number of device name, e.g. vsrx-07 -> 7
+TEMPLATE_VARS_SEQ_INPUT = "seq"
+# trust interface per seq of template_vars2, seq 1..len(TRUST_INT_LIST)
+TRUST_INT_LIST = [2, 4, 6, 8, 10, 12, 14, 16]
+# generators taking seq input, --input range (1-64, 1-4,8) renders one block per seq
+TEMPLATE_VARS_RANGE_LIST = TEMPLATE_VARS1_LIST + TEMPLATE_VARS2_LIST
+
+INPUT_RANGE_RE = re.compile(r"^\d+(-\d+)?(,\d+(-\d+)?)+$|^\d+-\d+$")
+DEVICE_SEQ_RE = re.compile(r"(\d+)$")
 
 
 def template_vars_get(template_vars_arg, _input):
-    if template_vars_arg in TEMPLATE_VARS1_LIST:
-        return template_vars1(_input)
-    elif template_vars_arg in TEMPLATE_VARS2_LIST:
-        return template_vars2(_input)
-    elif template_vars_arg in TEMPLATE_VARS3_LIST:
-        return template_vars3(_input)
-    elif template_vars_arg in TEMPLATE_VARS4_LIST:
-        return template_vars4(_input)
-    else:
+    if template_vars_arg not in TEMPLATE_VARS_REGISTRY:
         raise ValueError("UNKNOWN device-type")
+    return TEMPLATE_VARS_REGISTRY[template_vars_arg](_input)
+
+
+def template_vars_range(template_vars_arg, _input):
+    # variable dicts of input range, one per seq, [dict] for other inputs
+    return [
+        template_vars_get(template_vars_arg, seq_input)
+        for seq_input in input_range(template_vars_arg, _input)
+    ]
+
+
+def seq_range(_input):
+    # "1-4,8" -> [1, 2, 3, 4, 8], reversed range ("2-1") is an error, not an empty render
+    seqs = []
+    for part in _input.split(","):
+        first, _, last = part.partition("-")
+        first, last = int(first), int(last or first)
+        if last < first:
+            raise ValueError("input range {part} is reversed".format(part=part))
+        seqs += range(first, last + 1)
+    return seqs
+
+
+def input_range(template_vars_arg, _input):
+    # "1-64" or "1-4,8" -> ["1", ..., "64"] for seq generators, else [_input],
+    # with diff/push/exec target all rendered blocks go to that one device in one commit
+    if template_vars_arg in TEMPLATE_VARS_RANGE_LIST and INPUT_RANGE_RE.match(
+        str(_input)
+    ):
+        return [str(seq) for seq in seq_range(_input)]
+    return [_input]
+
+
+def device_seq(device):
+    # vsrx-07 -> "7"
+    match = DEVICE_SEQ_RE.search(device)
+    if not match:
+        raise ValueError("no sequence number in device name {}".format(device))
+    return str(int(match.group(1)))
+
+
+def device_range(name_format, _input):
+    # group of devices for profiles using input seq, e.g. device_range("vsrx-{:02d}", "1-64")
+    return {name_format.format(seq): {} for seq in seq_range(_input)}
 
 
 def template_vars1(_input):
@@ -37,9 +86,15 @@ def template_vars1(_input):
 
 def template_vars2(_input):
     # ptx/mx template variable generator
-    trust_int_list = [2, 4, 6, 8, 10, 12, 14, 16]
     seq = int(_input)
-    trust_int = trust_int_list[seq - 1]
+    # seq 0 would wrap to the last entry
+    if not 1 <= seq <= len(TRUST_INT_LIST):
+        raise ValueError(
+            "seq {seq} out of range 1-{last} (TRUST_INT_LIST)".format(
+                seq=seq, last=len(TRUST_INT_LIST)
+            )
+        )
+    trust_int = TRUST_INT_LIST[seq - 1]
     untrust_int = trust_int + 1
     aut_sys = 65000 + seq
 
@@ -62,9 +117,8 @@ def template_vars3(_input):
 
 
 def template_vars4(_input):
-    import yaml
-    with open(_input, 'r') as file:
-      data = yaml.safe_load(file)
+    # parsed once per process, shared by device threads
+    data = data_load(_input)
 
     template_vars = {
         "list1": data['list1']
@@ -76,3 +130,12 @@ def template_vars5(_input):
     # sample method to split input "x, y" into list
     input_list = _input.split(",")
     return template_vars
+
+
+# template-vars name -> generator
+TEMPLATE_VARS_REGISTRY = {
+    **dict.fromkeys(TEMPLATE_VARS1_LIST, template_vars1),
+    **dict.fromkeys(TEMPLATE_VARS2_LIST, template_vars2),
+    **dict.fromkeys(TEMPLATE_VARS3_LIST, template_vars3),
+    **dict.fromkeys(TEMPLATE_VARS4_LIST, template_vars4),
+}
@@ -0,0 +1,137 @@
+import os
+import threading
+from types import SimpleNamespace
+
+import template_ops_archive
+
+from template_ops_archive import (
+    ArchiveWriter,
+    archive_compact,
+    archive_content_put,
+    archive_item,
+    archive_locked,
+    archive_read,
+    archive_runs,
+    catalog_add,
+    catalog_query,
+    catalog_row,
+)
+
+RUNS = ["2026010{day}-000000".format(day=day) for day in range(1, 6)]
+
+
+def archive_fill(archive_path):
+    # per run one item of its own and one identical in every run (one blob)
+    rows = []
+    for run in RUNS:
+        for template, data in [("pl", "set a " + run + "\n"), ("common", "set b\n")]:
+            name = "{run}__{template}__d1.set".format(run=run, template=template)
+            entry = archive_item(archive_path, run, name, data)
+            rows.append(catalog_row(name, data.encode(), run, entry["blob"], "gzip"))
+    catalog_add(archive_path, rows)
+
+
+def blob_files(archive_path):
+    return [
+        name
+        for _, _, names in os.walk(os.path.join(archive_path, "blobs"))
+        for name in names
+    ]
+
+
+def test_compact(tmp_path):
+    archive_path = str(tmp_path)
+    archive_fill(archive_path)
+    assert len(blob_files(archive_path)) == 6
+
+    assert archive_compact(archive_path, keep_runs=1, segment_runs=2) == 4
+    assert archive_runs(archive_path) == RUNS[-1:]
+    assert sorted(os.listdir(tmp_path / "segments")) == [
+        "{}__{}.tar.xz".format(RUNS[0], RUNS[1]),
+        "{}__{}.tar.xz".format(RUNS[2], RUNS[3]),
+    ]
+    # blobs of the live run only
+    assert len(blob_files(archive_path)) == 2
+    # packed items are still readable through the catalog
+    entries = catalog_query(archive_path, template="pl")
+    assert [archive_read(archive_path, entry) for entry in entries] == [
+        ("set a " + run + "\n").encode() for run in RUNS
+    ]
+    # nothing left to pack
+    assert archive_compact(archive_path, keep_runs=1, segment_runs=2) == 0
+
+
+def test_compact_remainder_waits(tmp_path):
+    archive_path = str(tmp_path)
+    archive_fill(archive_path)
+    # 4 old runs, segments of 3, the 4th run waits for a full segment
+    assert archive_compact(archive_path, keep_runs=1, segment_runs=3) == 3
+    assert archive_runs(archive_path) == RUNS[3:]
+
+
+def test_compact_keep_segments(tmp_path):
+    archive_path = str(tmp_path)
+    archive_fill(archive_path)
+    archive_compact(archive_path, keep_runs=1, segment_runs=2, keep_segments=1)
+    assert os.listdir(tmp_path / "segments") == [
+        "{}__{}.tar.xz".format(RUNS[2], RUNS[3])
+    ]
+    # catalog rows of the removed segment are gone
+    entries = catalog_query(archive_path, template="pl")
+    assert [entry["timestamp"] for entry in entries] == RUNS[2:]
+
+
+def test_item_blob_and_manifest_under_lock(tmp_path):
+    # compaction holding the lock sees neither the new blob nor its manifest entry
+    archive_path = str(tmp_path)
+    with archive_locked(archive_path):
+        writer = threading.Thread(
+            target=archive_item,
+            args=(archive_path, RUNS[0], RUNS[0] + "__pl__d1.set", "set a\n"),
+        )
+        writer.start()
+        writer.join(0.2)
+        assert writer.is_alive()
+        assert blob_files(archive_path) == []
+        assert archive_runs(archive_path) == []
+    writer.join()
+    assert len(blob_files(archive_path)) == 1
+    assert archive_runs(archive_path) == RUNS[:1]
+
+
+def test_writer_fsyncs_written_files(tmp_path, monkeypatch):
+    # written files and their directories are synced at flush, not the whole host
+    archive_path = str(tmp_path)
+    synced = []
+    monkeypatch.setattr(template_ops_archive, "fsync_path", synced.append)
+    monkeypatch.setattr(os, "sync", None)
+    settings = SimpleNamespace(
+        ARCHIVE_BACKEND="cas",
+        ARCHIVE_COMPRESSION="gzip",
+        ARCHIVE_CATALOG_ENABLE=1,
+        ARCHIVE_ASYNC_ENABLE=1,
+    )
+    errors = []
+    writer = ArchiveWriter(errors.append)
+    archive_content_put(
+        settings,
+        writer,
+        "run-1",
+        archive_path,
+        RUNS[0],
+        "pl",
+        "d1",
+        ".set",
+        data="set a\n",
+    )
+    writer.flush()
+    assert errors == []
+    manifest_file = os.path.join(archive_path, "manifests", RUNS[0] + ".ndjson")
+    assert manifest_file in synced
+    assert os.path.join(archive_path, "manifests") in synced
+    assert [path for path in synced if "/blobs/" in path and path.endswith(".gz")]
+    # files before their directories
+    assert synced.index(manifest_file) < synced.index(os.path.dirname(manifest_file))
+    assert [entry["name"] for entry in catalog_query(archive_path)] == [
+        RUNS[0] + "__pl__d1.set"
+    ]
@@ -0,0 +1,45 @@
+import importlib.util
+import os
+
+import pytest
+
+SCRIPT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "template-ops.py"
+)
+
+
+@pytest.fixture(scope="module")
+def template_ops():
+    # script name isn't importable, loaded from file, no login terminal under pytest
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(os, "getlogin", lambda: "tester")
+        spec = importlib.util.spec_from_file_location("template_ops_cli", SCRIPT)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return module
+
+
+def test_client_argv_output_file(template_ops, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    output_file = str(tmp_path / "out.ndjson")
+    for argv in [
+        ["--client", "--profile", "p1", "--output-file", "out.ndjson"],
+        ["--profile", "p1", "--output-file=out.ndjson", "--client"],
+        # unambiguous prefix of --output-file
+        ["--profile", "p1", "--output-f", "out.ndjson"],
+    ]:
+        assert template_ops.client_argv(argv, "out.ndjson") == [
+            "--profile",
+            "p1",
+            "--output-file",
+            output_file,
+        ]
+    # --output isn't --output-file
+    assert template_ops.client_argv(["--output", "csv"], None) == ["--output", "csv"]
+
+
+def test_daemon_job_check(template_ops):
+    assert template_ops.daemon_job_check(["--profile", "p1"]) is None
+    assert template_ops.daemon_job_check(["--every=5"]) == (
+        "--every=5 not allowed in daemon job"
+    )
@@ -0,0 +1,34 @@
+import json
+import os
+
+import template_ops_data
+from template_ops_data import data_load, data_stream
+
+
+def test_data_load_returns_copies(tmp_path, monkeypatch):
+    monkeypatch.setattr(template_ops_data, "data_cache", {})
+    path = tmp_path / "data1.json"
+    path.write_text(json.dumps({"list1": [1, 2]}))
+    data = data_load(str(path))
+    data["list1"].append(3)
+    # change of one caller doesn't reach the cache or other callers
+    assert data_load(str(path)) == {"list1": [1, 2]}
+    assert data_load(str(path)) is not data_load(str(path))
+
+
+def test_data_load_reparsed_on_change(tmp_path, monkeypatch):
+    monkeypatch.setattr(template_ops_data, "data_cache", {})
+    path = tmp_path / "data1.csv"
+    path.write_text("ip,name\n10.0.0.1,a\n")
+    assert data_load(str(path)) == [{"ip": "10.0.0.1", "name": "a"}]
+    path.write_text("ip,name\n10.0.0.1,a\n10.0.0.2,b\n")
+    stat = os.stat(path)
+    # size changed, mtime may not have with coarse timestamps
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert len(data_load(str(path))) == 2
+
+
+def test_data_stream_lines(tmp_path):
+    path = tmp_path / "prefixes.txt"
+    path.write_text("10.0.0.0/24\n10.0.1.0/24\n")
+    assert list(data_stream(str(path))) == ["10.0.0.0/24", "10.0.1.0/24"]
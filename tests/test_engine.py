@@ -0,0 +1,137 @@
+import json
+
+import pytest
+
+pytest.importorskip("jnpr.junos")
+pytest.importorskip("jinja2")
+
+import jnpr.junos
+import jnpr.junos.utils.config
+
+import template_ops_conf
+from template_ops_archive import archive_read, catalog_query
+from template_ops_engine import Engine
+from template_ops_inventory import conf_copy
+
+
+class FakeRPC:
+    def __init__(self, dev):
+        self.dev = dev
+
+    def get_system_uptime_information(self):
+        if self.dev.dead:
+            raise ConnectionError("session closed by device")
+
+
+class FakeDevice:
+    opened = []
+
+    def __init__(self, **kvargs):
+        self.host = kvargs.get("host")
+        self.connected = False
+        self.dead = False
+        self.rpc = FakeRPC(self)
+
+    def open(self, **kvargs):
+        self.connected = True
+        FakeDevice.opened.append(self)
+
+    def close(self):
+        self.connected = False
+
+
+class FakeConfig:
+    loads = []
+
+    def __init__(self, dev, **kvargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def load(self, config, **kvargs):
+        FakeConfig.loads.append(config)
+
+    def commit(self, **kvargs):
+        pass
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(jnpr.junos, "Device", FakeDevice)
+    monkeypatch.setattr(jnpr.junos.utils.config, "Config", FakeConfig)
+    monkeypatch.setattr(FakeDevice, "opened", [])
+    monkeypatch.setattr(FakeConfig, "loads", [])
+    settings = conf_copy(template_ops_conf)
+    archive_path = str(tmp_path / "xarchive")
+    (tmp_path / "xarchive").mkdir()
+    for name in [
+        "SAVE_PATH_COMMIT_J2",
+        "SAVE_PATH_COMMIT_CFG",
+        "SAVE_PATH_EXEC_J2",
+        "SAVE_PATH_EXEC_PY",
+    ]:
+        setattr(settings, name, archive_path)
+    settings.INVENTORY_PATH = str(tmp_path / "xinventory")
+    settings.INVENTORY_CACHE_PATH = None
+    return settings
+
+
+def test_push_archived(settings):
+    with Engine(settings) as engine:
+        record = engine.push("vsrx-01", "pl_1_add_set", "vsrx", "1")
+    assert record["status"] == "ok"
+    assert record["message"] == "commit completed, j2+set-cmd archived"
+    # listed by --list-archive, content restored by --rollback-to
+    entries = catalog_query(
+        settings.SAVE_PATH_COMMIT_CFG, device="vsrx-01", kind="set"
+    )
+    assert [entry["template"] for entry in entries] == ["pl_1_add_set"]
+    assert (
+        archive_read(settings.SAVE_PATH_COMMIT_CFG, entries[0]).decode()
+        == FakeConfig.loads[-1]
+    )
+
+
+def test_dead_session_reopened(settings):
+    with Engine(settings) as engine:
+        dev = engine.session("vsrx-01")
+        assert engine.session("vsrx-01") is dev
+        dev.dead = True
+        reopened = engine.session("vsrx-01")
+    assert reopened is not dev
+    assert not dev.connected
+    assert len(FakeDevice.opened) == 2
+
+
+def test_inventory_per_engine(settings, tmp_path):
+    (tmp_path / "xinventory").mkdir()
+    (tmp_path / "xinventory" / "dc2.json").write_text(
+        json.dumps(
+            {
+                "push_profiles": {"pl_dc2": {}},
+                "pl_dc2": {
+                    "default": {
+                        "template": ["pl_1_add_set"],
+                        "template_vars": ["vsrx"],
+                        "input": ["1"],
+                    },
+                    "vsrx-01": {},
+                },
+            }
+        )
+    )
+    engine = Engine(settings)
+    # inventory file entries stay in the engine, conf module and other engines don't see them
+    assert "pl_dc2" in engine.inventory["profiles"]
+    assert "pl_dc2" in engine.settings.push_profiles
+    assert "pl_dc2" not in template_ops_conf.push_profiles
+    assert not hasattr(template_ops_conf, "pl_dc2")
+    settings.INVENTORY_PATH = None
+    assert "pl_dc2" not in Engine(settings).inventory["profiles"]
@@ -0,0 +1,118 @@
+import math
+
+from lxml import etree
+
+import template_ops_exec
+from template_ops_exec import (
+    RPCCacheDevice,
+    fields_filter_xml,
+    rpc_fields,
+    xmax,
+    xsum,
+    xsums,
+)
+
+
+class FakeRPC:
+    # records RPC calls, returns the call as reply
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, rpc_name):
+        def rpc_call(*vargs, **kvargs):
+            self.calls.append((rpc_name, vargs, kvargs))
+            return (rpc_name, vargs, kvargs)
+
+        return rpc_call
+
+
+class FakeDevice:
+    def __init__(self):
+        self.rpc = FakeRPC()
+
+
+class ReplyRPC(FakeRPC):
+    # lxml reply per call
+    def __getattr__(self, rpc_name):
+        def rpc_call(*vargs, **kvargs):
+            self.calls.append((rpc_name, vargs, kvargs))
+            return etree.fromstring(
+                "<software-information><host-name>r1</host-name>"
+                "</software-information>"
+            )
+
+        return rpc_call
+
+
+def test_fields_filter_xml_merges_paths():
+    assert fields_filter_xml(
+        [
+            "interface-information/physical-interface/name",
+            "/interface-information/physical-interface/traffic-statistics/input-bps/",
+            "interface-information/physical-interface/traffic-statistics/output-bps",
+        ]
+    ) == (
+        "<interface-information><physical-interface><name/><traffic-statistics>"
+        "<input-bps/><output-bps/></traffic-statistics></physical-interface>"
+        "</interface-information>"
+    )
+
+
+def test_rpc_fields_filter_xml():
+    dev = FakeDevice()
+    rpc_fields(
+        dev,
+        "get_interface_information",
+        ["interface-information/physical-interface/name"],
+        terse=True,
+    )
+    # filter string is passed as is
+    rpc_fields(dev, "get_route_information", "<route-information/>")
+    assert dev.rpc.calls == [
+        (
+            "get_interface_information",
+            (),
+            {
+                "filter_xml": "<interface-information><physical-interface><name/>"
+                "</physical-interface></interface-information>",
+                "terse": True,
+            },
+        ),
+        ("get_route_information", (), {"filter_xml": "<route-information/>"}),
+    ]
+
+
+def test_xsum_int_precision():
+    # 2^53 + 1, XPath sum() as double gives 9007199254740992
+    reply = etree.fromstring(
+        "<r><c>\n9007199254740993\n</c><c>0</c><e>1.5</e><e>2.5</e><f>N/A</f></r>"
+    )
+    assert xsum(reply, ".//c") == 9007199254740993
+    assert xsums(reply, [".//c", ".//e", ".//missing"]) == [
+        9007199254740993,
+        4,
+        0,
+    ]
+    assert xmax(reply, ".//c") == 9007199254740993
+    assert math.isnan(xsum(reply, ".//f"))
+    assert math.isnan(xmax(reply, ".//missing"))
+
+
+def test_rpc_cache_copies_and_element_keys(monkeypatch):
+    monkeypatch.setattr(template_ops_exec, "rpc_cache", {})
+    dev = FakeDevice()
+    dev.rpc = ReplyRPC()
+    cached_dev = RPCCacheDevice(dev, "r1", 60)
+    first = cached_dev.rpc.get_software_information()
+    # template changing its reply doesn't change what later readers get
+    first.find("host-name").text = "changed"
+    second = cached_dev.rpc.get_software_information()
+    assert second.findtext("host-name") == "r1"
+    second.clear()
+    assert cached_dev.rpc.get_software_information().findtext("host-name") == "r1"
+    assert len(dev.rpc.calls) == 1
+    # filter_xml elements of equal content hit the same entry
+    for _ in range(2):
+        cached_dev.rpc.get_config(filter_xml=etree.fromstring("<system/>"))
+    cached_dev.rpc.get_config(filter_xml=etree.fromstring("<interfaces/>"))
+    assert len(dev.rpc.calls) == 3
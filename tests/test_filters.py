@@ -0,0 +1,28 @@
+from template_ops_filters import host_range, ip_offset, prefix_range
+
+
+def test_prefix_range():
+    assert list(prefix_range("10.0.0.0/22", 24)) == [
+        "10.0.0.0/24",
+        "10.0.1.0/24",
+        "10.0.2.0/24",
+        "10.0.3.0/24",
+    ]
+    assert list(prefix_range("10.0.0.0/16", 24, 2)) == ["10.0.0.0/24", "10.0.1.0/24"]
+    assert list(prefix_range("2001:db8::/62", 64))[-1] == "2001:db8:0:3::/64"
+
+
+def test_host_range():
+    assert list(host_range("1.1.0.254", "1.1.1.1")) == [
+        "1.1.0.254",
+        "1.1.0.255",
+        "1.1.1.0",
+        "1.1.1.1",
+    ]
+    assert list(host_range("1.1.0.2", "1.1.0.1")) == []
+
+
+def test_ip_offset():
+    assert ip_offset("100.65.0.10", 256) == "100.65.1.10"
+    assert ip_offset("10.0.0.1/24", "5") == "10.0.0.6/24"
+    assert ip_offset("2001:db8::1", 1) == "2001:db8::2"
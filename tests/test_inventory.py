@@ -0,0 +1,94 @@
+import importlib.util
+import json
+import os
+
+from template_ops_inventory import inventory_load, inventory_stale
+
+CONF = """
+push_profiles = {'p1': {'comment': ['conf profile']}}
+multi_profiles = {}
+auth_profiles = {
+  'default': {'user': ['u'], 'port': [830], 'ssh_key': ['k']},
+  'd1': {'host': ['10.0.0.1']},
+}
+p1 = {
+  'default': {'template': ['t'], 'template_vars': ['v'], 'input': ['1']},
+  'd1': {'input': ['2']},
+}
+"""
+
+INVENTORY = {
+    "push_profiles": {"p2": {"comment": ["file profile"]}},
+    "auth_profiles": {"d2": {"host": ["10.0.0.2"], "user": ["other"]}},
+    "grp": {"d2": {}, "d3": {"input": ["3"]}},
+    "p2": {
+        "default": {"template": ["t2"], "template_vars": ["v"], "input": ["1"]},
+        "groups": ["grp"],
+        "d3": {"input": ["9"]},
+    },
+}
+
+
+def conf_import(tmp_path):
+    # fresh template_ops_conf stand-in per test, inventory_load() extends it
+    path = tmp_path / "conf.py"
+    # unchanged conf file keeps the cache valid
+    if not path.exists():
+        path.write_text(CONF)
+    spec = importlib.util.spec_from_file_location("conf", str(path))
+    conf = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(conf)
+    return conf
+
+
+def inventory_write(tmp_path, data):
+    inventory_path = tmp_path / "inventory"
+    inventory_path.mkdir(exist_ok=True)
+    (inventory_path / "dc2.json").write_text(json.dumps(data))
+    return str(inventory_path)
+
+
+def test_merge(tmp_path):
+    conf = conf_import(tmp_path)
+    index = inventory_load(conf, inventory_write(tmp_path, INVENTORY))
+    assert index["errors"] == []
+    # default merged into device records, device entries win
+    assert index["profiles"]["p1"]["d1"]["input"] == ["2"]
+    assert index["profiles"]["p1"]["d1"]["template"] == ["t"]
+    # group devices added to file profile, own entries win over group entries
+    assert index["profile_devices"]["p2"] == ["d2", "d3"]
+    assert index["profiles"]["p2"]["d3"]["input"] == ["9"]
+    assert index["profiles"]["p2"]["d2"]["template"] == ["t2"]
+    # file sections extend conf dicts
+    assert set(conf.push_profiles) == {"p1", "p2"}
+    assert index["auth"]["d2"] == {
+        "user": ["other"],
+        "port": [830],
+        "ssh_key": ["k"],
+        "host": ["10.0.0.2"],
+    }
+
+
+def test_missing_keys_reported(tmp_path):
+    conf = conf_import(tmp_path)
+    data = dict(INVENTORY, p2={"d4": {"template": ["t2"]}})
+    index = inventory_load(conf, inventory_write(tmp_path, data))
+    assert index["errors"] == ["profile p2 device d4 missing template_vars,input"]
+
+
+def test_cache_and_stale(tmp_path):
+    cache_path = str(tmp_path / "inventory.cache")
+    inventory_path = inventory_write(tmp_path, INVENTORY)
+    index = inventory_load(conf_import(tmp_path), inventory_path, cache_path)
+    assert os.path.isfile(cache_path)
+    conf = conf_import(tmp_path)
+    assert inventory_load(conf, inventory_path, cache_path) == index
+    # file dicts come from the cache too
+    assert "p2" in conf.push_profiles
+    assert not inventory_stale(conf, index, inventory_path)
+
+    data = dict(INVENTORY, push_profiles={"p3": {"comment": []}})
+    inventory_write(tmp_path, dict(data, p3=INVENTORY["p2"]))
+    assert inventory_stale(conf, index, inventory_path)
+    index = inventory_load(conf_import(tmp_path), inventory_path, cache_path)
+    assert "p3" in index["profiles"]
@@ -0,0 +1,74 @@
+import hashlib
+import os
+
+import template_ops_md5
+from template_ops_md5 import md5_cache_init, md5_cache_save, md5_cached
+
+
+def cache_reset(monkeypatch, path):
+    monkeypatch.setattr(template_ops_md5, "md5_cache", {})
+    monkeypatch.setattr(template_ops_md5, "md5_cache_dirty", False)
+    md5_cache_init(str(path))
+
+
+def test_cached_and_saved(tmp_path, monkeypatch):
+    cache_reset(monkeypatch, tmp_path / "md5cache.json")
+    template = tmp_path / "t.j2"
+    template.write_text("set a b\n")
+    # older than MD5_CACHE_MIN_AGE, cached
+    os.utime(template, (1, 1))
+    digest = hashlib.md5(b"set a b\n").hexdigest()
+    assert md5_cached(template) == digest
+    assert str(template) in template_ops_md5.md5_cache
+    md5_cache_save()
+    assert (tmp_path / "md5cache.json").is_file()
+
+    # sidecar is loaded by a fresh process
+    cache_reset(monkeypatch, tmp_path / "md5cache.json")
+    md5_cached(template)
+    assert template_ops_md5.md5_cache[str(template)][3] == digest
+
+
+def test_changed_file_rehashed(tmp_path, monkeypatch):
+    cache_reset(monkeypatch, tmp_path / "md5cache.json")
+    template = tmp_path / "t.j2"
+    template.write_text("set a b\n")
+    os.utime(template, (1, 1))
+    md5_cached(template)
+    template.write_text("set a c\n")
+    os.utime(template, (2, 2))
+    assert md5_cached(template) == hashlib.md5(b"set a c\n").hexdigest()
+
+
+def test_recent_file_not_cached(tmp_path, monkeypatch):
+    cache_reset(monkeypatch, tmp_path / "md5cache.json")
+    template = tmp_path / "t.j2"
+    template.write_text("set a b\n")
+    md5_cached(template)
+    assert str(template) not in template_ops_md5.md5_cache
+
+
+def test_save_unwritable_skipped(tmp_path, monkeypatch):
+    # sidecar folder missing (or read-only), saved from atexit without raising
+    cache_reset(monkeypatch, tmp_path / "missing" / "md5cache.json")
+    template = tmp_path / "t.j2"
+    template.write_text("set a b\n")
+    os.utime(template, (1, 1))
+    md5_cached(template)
+    md5_cache_save()
+    assert not (tmp_path / "missing").exists()
+
+
+def test_save_failed_replace_removes_tmp(tmp_path, monkeypatch):
+    cache_reset(monkeypatch, tmp_path / "md5cache.json")
+    template = tmp_path / "t.j2"
+    template.write_text("set a b\n")
+    os.utime(template, (1, 1))
+    md5_cached(template)
+
+    def replace_failed(src, dst):
+        raise PermissionError(dst)
+
+    monkeypatch.setattr(os, "replace", replace_failed)
+    md5_cache_save()
+    assert sorted(os.listdir(tmp_path)) == ["t.j2"]
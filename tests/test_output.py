@@ -0,0 +1,46 @@
+import csv
+import json
+
+import pytest
+
+from template_ops_output import ResultWriter
+
+
+def test_ndjson_records(tmp_path):
+    path = str(tmp_path / "results.ndjson")
+    writer = ResultWriter("ndjson", path)
+    writer.write(
+        run_id="run-1",
+        device="vsrx-01",
+        template="load",
+        status="ok",
+        result="ok",
+        result_adv=[[1, "N/A"]],
+    )
+    writer.write(run_id="run-1", device="vsrx-02", status="error", result="error")
+    writer.close()
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert [record["device"] for record in records] == ["vsrx-01", "vsrx-02"]
+    assert records[0]["result_adv"] == [[1, "N/A"]]
+    # fields not given are null, timestamp is filled in
+    assert records[1]["template"] is None
+    assert records[1]["timestamp"]
+
+
+def test_csv_header_once_and_json_values(tmp_path):
+    path = str(tmp_path / "results.csv")
+    for device in ["vsrx-01", "vsrx-02"]:
+        # appended file keeps its header
+        writer = ResultWriter("csv", path)
+        writer.write(device=device, status="ok", result={"sessions": 10})
+        writer.close()
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["device"] for row in rows] == ["vsrx-01", "vsrx-02"]
+    assert json.loads(rows[0]["result"]) == {"sessions": 10}
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        ResultWriter("xml")
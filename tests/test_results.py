@@ -0,0 +1,61 @@
+import math
+import sqlite3
+
+import template_ops_results
+from template_ops_results import ResultHistory, history_rates, history_record
+
+
+def test_history_rates():
+    history = ResultHistory(3, 1, {0: "pps"})
+    assert math.isnan(history.rate(0))
+    for timestamp, value in [(0, 0), (10, 100), (20, 300), (30, 600)]:
+        history.append(timestamp, [value])
+    # ring buffer of 3 holds samples 10..30
+    assert history.count == 3
+    assert history.rate(0) == 30
+    assert history.rate_avg(0) == 25
+
+
+def test_history_record_and_fleet(monkeypatch):
+    monkeypatch.setattr(template_ops_results, "result_history", {})
+    for device, step in [("d1", 10), ("d2", 20)]:
+        for timestamp in [0, 1]:
+            history_record(
+                device, "load", timestamp, [[step * timestamp, "N/A"]], {0: "pps"}, 4
+            )
+    labels, rows = history_rates([("d1", "load"), ("d2", "load")])
+    assert labels == ["pps"]
+    assert rows == [["d1", 10, 10], ["d2", 20, 20], ["fleet", 30, 30]]
+
+
+def test_store_rows_and_query(tmp_path, monkeypatch):
+    path = str(tmp_path / "results.db")
+    # store of an earlier version without status column
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE results (run_id TEXT, timestamp REAL, profile TEXT, device TEXT, "
+        "template TEXT, result TEXT, result_adv TEXT)"
+    )
+    db.commit()
+    db.close()
+    monkeypatch.setattr(template_ops_results, "result_store_path", None)
+    template_ops_results.store_init(path)
+    template_ops_results.store_write(
+        "run-1",
+        "p1",
+        [
+            ["d1", "sessions", "ok", "1000 sessions", [1000]],
+            ["d2", "sessions", "error", "Error executing code sessions", None],
+            ["d3", "pl_1_add", "ok", "pl_1_add template commit completed", None],
+        ],
+    )
+    rows = template_ops_results.results_query("sessions")
+    assert [row[1:] for row in rows] == [
+        ["d1", [1000], "1000 sessions", "ok"],
+        ["d2", None, "Error executing code sessions", "error"],
+    ]
+    # push rows carry their template too
+    assert template_ops_results.results_query("pl_1_add", device="d3")[0][3:] == [
+        "pl_1_add template commit completed",
+        "ok",
+    ]
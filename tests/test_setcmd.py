@@ -0,0 +1,101 @@
+from template_ops_setcmd import set_optimize, set_to_text
+
+
+def test_optimize_blank_and_duplicate():
+    set_cmd, stats = set_optimize("set a b 1\n\n  set a b 1\nset a c 2\n")
+    assert set_cmd == "set a b 1\nset a c 2\n"
+    assert stats == {
+        "lines": 4,
+        "blank": 1,
+        "duplicate": 1,
+        "subsumed": 0,
+        "optimized": 2,
+    }
+
+
+def test_optimize_repeat_after_delete_kept():
+    # set after delete of its hierarchy is not a duplicate
+    set_cmd, stats = set_optimize("set a b 1\ndelete a\nset a b 1\n")
+    assert set_cmd == "set a b 1\ndelete a\nset a b 1\n"
+    assert stats["duplicate"] == 0
+
+
+def test_optimize_subsumed_delete():
+    # delete a b after delete a is dropped together with set lines under it issued in between
+    set_cmd, stats = set_optimize("delete a\nset a b 1\ndelete a b\nset a c 2\n")
+    assert set_cmd == "delete a\nset a c 2\n"
+    assert stats["subsumed"] == 2
+
+
+def test_optimize_other_command_ends_window():
+    set_cmd, _ = set_optimize("set a b 1\ndeactivate a b\nset a b 1\n")
+    assert set_cmd == "set a b 1\ndeactivate a b\nset a b 1\n"
+
+
+def test_to_text_prefix_list():
+    text = set_to_text(
+        "set policy-options prefix-list pl-1 1.1.0.0/32\n"
+        "set policy-options prefix-list pl-1 1.1.0.1/32\n"
+    )
+    assert text == (
+        "policy-options prefix-list pl-1 {\n"
+        "    1.1.0.0/32;\n"
+        "    1.1.0.1/32;\n"
+        "}\n"
+    )
+
+
+def test_to_text_delete_becomes_replace():
+    text = set_to_text(
+        "delete policy-options prefix-list pl-1\n"
+        "set policy-options prefix-list pl-1 1.1.0.0/32\n"
+        "set policy-options prefix-list pl-1 1.1.0.1/32\n"
+    )
+    # marker directly before the replaced statement, not in front of policy-options
+    assert text == (
+        "policy-options {\n"
+        "    replace: prefix-list pl-1 {\n"
+        "        1.1.0.0/32;\n"
+        "        1.1.0.1/32;\n"
+        "    }\n"
+        "}\n"
+    )
+
+
+def test_to_text_delete_alone():
+    text = set_to_text(
+        "delete policy-options prefix-list pl-2\n"
+        "set policy-options prefix-list pl-1 1.1.0.0/32\n"
+    )
+    assert text == (
+        "policy-options {\n"
+        "    prefix-list pl-1 1.1.0.0/32;\n"
+        "    delete: prefix-list pl-2;\n"
+        "}\n"
+    )
+
+
+def test_to_text_unit_shorthand():
+    # ge-0/0/1.0 is set-only shorthand
+    text = set_to_text(
+        "delete interfaces ge-0/0/1.0 family inet\n"
+        "set interfaces ge-0/0/1.0 family inet address 10.0.0.1/24\n"
+    )
+    assert "ge-0/0/1.0" not in text
+    assert text == (
+        "interfaces ge-0/0/1 {\n"
+        "    unit 0 {\n"
+        "        family {\n"
+        "            replace: inet {\n"
+        "                address 10.0.0.1/24;\n"
+        "            }\n"
+        "        }\n"
+        "    }\n"
+        "}\n"
+    )
+
+
+def test_to_text_not_convertible():
+    # other commands and set before delete can't be one merge
+    assert set_to_text("set a b\ndeactivate a b\n") is None
+    assert set_to_text("set a b\ndelete a c\n") is None
@@ -0,0 +1,70 @@
+import pytest
+
+from template_ops_shard import (
+    shard_instances,
+    shard_split,
+    shard_stale,
+    shard_unchanged,
+)
+
+PREFIX_LIST = "".join(
+    "set policy-options prefix-list pl-1 1.1.0.{host}/32\n".format(host=host)
+    for host in range(64)
+)
+
+
+def test_instances():
+    assert shard_instances("pl", 3) == ["pl-0", "pl-1", "pl-2"]
+
+
+def test_split_keeps_every_line_once():
+    shards = shard_split(PREFIX_LIST, 4)
+    assert len(shards) == 4
+    lines = [line for shard in shards for line in shard.splitlines() if line]
+    assert sorted(lines) == sorted(PREFIX_LIST.splitlines())
+    # crc32 key, same split in every process
+    assert shard_split(PREFIX_LIST, 4) == shards
+
+
+def test_split_delete_goes_to_every_shard():
+    shards = shard_split("delete policy-options prefix-list pl-1\n" + PREFIX_LIST, 3)
+    for shard in shards:
+        assert shard.startswith("delete policy-options prefix-list pl-1\n")
+
+
+def test_split_key_tokens_keep_list_together():
+    set_cmd = PREFIX_LIST + PREFIX_LIST.replace("pl-1", "pl-2")
+    for shard in shard_split(set_cmd, 4, 3):
+        lists = {line.split(" ")[3] for line in shard.splitlines() if line}
+        assert len(lists) <= 1
+
+
+def test_split_rejects_order_sensitive_lines():
+    with pytest.raises(ValueError):
+        shard_split(
+            "set firewall family inet filter protect-1 term 1 then accept\n", 2
+        )
+
+
+def test_stale_instances():
+    configured = ["pl-0", "pl-1", "pl-4", "pl-6", "pl-x", "other-5"]
+    assert shard_stale(configured, "pl", 2) == ["pl-4", "pl-6"]
+
+
+def test_unchanged():
+    shard_cmd = (
+        "delete policy-options prefix-list pl-1\n"
+        "set policy-options prefix-list pl-1 1.1.0.1/32\n"
+    )
+    lines = {"set policy-options prefix-list pl-1 1.1.0.1/32"}
+    assert shard_unchanged(shard_cmd, lines)
+    # cleared out of band or holding more than the shard replaces it with
+    assert not shard_unchanged(shard_cmd, set())
+    assert not shard_unchanged(
+        shard_cmd, lines | {"set policy-options prefix-list pl-1 1.1.0.2/32"}
+    )
+    # without delete lines shard only adds
+    assert shard_unchanged(
+        "set policy-options prefix-list pl-1 1.1.0.1/32\n",
+        lines | {"set policy-options prefix-list pl-1 1.1.0.2/32"},
+    )
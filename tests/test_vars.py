@@ -0,0 +1,50 @@
+import pytest
+
+from template_ops_vars import (
+    TRUST_INT_LIST,
+    device_range,
+    device_seq,
+    input_range,
+    seq_range,
+    template_vars2,
+    template_vars_range,
+)
+
+
+def test_seq_range():
+    assert seq_range("1-4,8") == [1, 2, 3, 4, 8]
+    assert seq_range("3") == [3]
+    with pytest.raises(ValueError):
+        seq_range("2-1")
+
+
+def test_input_range_seq_generators_only():
+    assert input_range("vsrx", "1-3") == ["1", "2", "3"]
+    # other generators get their input as is
+    assert input_range("exec1", "1-3") == ["1-3"]
+    assert input_range("vsrx", "7") == ["7"]
+
+
+def test_template_vars_range():
+    assert [
+        template_vars["trust_int"] for template_vars in template_vars_range("ptx", "1,3")
+    ] == ["2", "6"]
+    assert template_vars_range("exec1", "10.0.0.1") == [{"ip": "10.0.0.1"}]
+
+
+def test_template_vars2_bounds():
+    assert template_vars2(str(len(TRUST_INT_LIST)))["trust_int"] == str(
+        TRUST_INT_LIST[-1]
+    )
+    for seq in ["0", str(len(TRUST_INT_LIST) + 1)]:
+        with pytest.raises(ValueError):
+            template_vars2(seq)
+    with pytest.raises(ValueError):
+        template_vars_range("ptx", "1-64")
+
+
+def test_device_seq_and_range():
+    assert device_seq("vsrx-07") == "7"
+    with pytest.raises(ValueError):
+        device_seq("vsrx")
+    assert list(device_range("vsrx-{:02d}", "1-2")) == ["vsrx-01", "vsrx-02"]